@@ -0,0 +1,238 @@
+"""
+Offline batch processing of JSONL request files through AIService.
+
+Each input line is a JSON object holding the fields of a `/write_message`
+(MessageRequest) or `/respond_message` (EmailRequest) request. The request
+kind is taken from an optional "kind" key and otherwise inferred from the
+fields present. An optional "id" key is copied to the output record.
+
+Results are appended to the output JSONL as they complete, one record per
+input line. The output file doubles as the checkpoint: rerunning with the
+same output skips lines that already succeeded or failed permanently (a
+4xx other than 408/429), so a crashed run resumes where it stopped and
+lines that hit transient upstream errors are tried again. A retried line
+gets a new record; the last record for a line is its outcome.
+
+Usage:
+    python -m app.cli requests.jsonl results.jsonl --concurrency 16
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import time
+from typing import Iterator, Set, Tuple
+
+from app.config import get_settings
+from app.logging_config import configure_logging
+from app.models.model import EmailRequest, EmailWriter, MessageRequest, Response
+from app.services.batch import run_batch
+from app.services.resilience import RETRYABLE_STATUS_CODES
+from app.services.services import AIService
+from app.services.tenants import DEFAULT_TENANT, tenant_var
+
+logger = logging.getLogger(__name__)
+
+WRITE_MESSAGE = "write_message"
+RESPOND_MESSAGE = "respond_message"
+
+
+def is_final(status_code) -> bool:
+    """Whether a line with this outcome is done: it succeeded or would fail the same way again."""
+    if not isinstance(status_code, int):
+        return False
+    return status_code < 500 and status_code not in RETRYABLE_STATUS_CODES and status_code != 408
+
+
+def load_completed_lines(output_path: str) -> Set[int]:
+    """
+    Collect the input line numbers whose latest record in the output file is final.
+
+    A partially written trailing record left by a crash is truncated away so
+    new records are appended on a clean line boundary. Unreadable records
+    elsewhere are skipped with a warning and their lines run again.
+    """
+    completed: Set[int] = set()
+    if not os.path.exists(output_path):
+        return completed
+
+    valid_end = 0
+    with open(output_path, "rb") as f:
+        for raw in f:
+            if not raw.endswith(b"\n"):
+                # Only the last line can lack its newline: a torn write
+                break
+            valid_end += len(raw)
+            try:
+                record = json.loads(raw)
+                line = record["line"]
+            except (ValueError, TypeError, KeyError):
+                if raw.strip():
+                    logger.warning("Skipping unreadable record in %s: %.80r", output_path, raw)
+                continue
+            if is_final(record.get("status_code")):
+                completed.add(line)
+            else:
+                completed.discard(line)
+
+    if valid_end != os.path.getsize(output_path):
+        logger.warning("Truncating incomplete trailing record in %s", output_path)
+        with open(output_path, "r+b") as f:
+            f.truncate(valid_end)
+    return completed
+
+
+def iter_pending(input_path: str, completed: Set[int]) -> Iterator[Tuple[int, str]]:
+    """Lazily yield (line number, raw line) pairs that still need processing."""
+    with open(input_path, "r", encoding="utf-8") as f:
+        for line_number, raw in enumerate(f, start=1):
+            if line_number in completed or not raw.strip():
+                continue
+            yield line_number, raw
+
+
+def _request_kind(record: dict) -> str:
+    kind = record.pop("kind", None)
+    if kind is not None:
+        return kind
+    return RESPOND_MESSAGE if "email_address" in record else WRITE_MESSAGE
+
+
+async def process_record(service: AIService, raw: str, use_cache: bool = True) -> dict:
+    """Validate one input line and run it through the matching service method."""
+    return await run_request(service, json.loads(raw), use_cache)
+
+
+async def run_request(service: AIService, record: dict, use_cache: bool = True) -> dict:
+    """Validate one request record and run it through the matching service method."""
+    record = dict(record)
+    kind = _request_kind(record)
+
+    if kind == WRITE_MESSAGE:
+        request = MessageRequest(**record)
+        response = await service.generate_response(
+            request.type,
+            request.user_message,
+            request.email,
+            request.user_name,
+            use_cache=use_cache
+        )
+        return EmailWriter(
+            email=request.email or "user@example.com",
+            subject=response["subject"],
+            body=response["body"],
+            user_name=request.user_name
+        ).model_dump()
+
+    if kind == RESPOND_MESSAGE:
+        request = EmailRequest(**record)
+        response_message = await service.email_responder(
+            request.email_address,
+            request.email,
+            request.prompt,
+            request.type,
+            request.user_name,
+            use_cache=use_cache,
+            thread_id=request.thread_id
+        )
+        return Response(
+            email=request.email_address,
+            response=response_message,
+            user_name=request.user_name
+        ).model_dump()
+
+    raise ValueError(f"Unknown request kind: {kind}")
+
+
+def _record_id(raw: str):
+    try:
+        return json.loads(raw).get("id")
+    except (ValueError, AttributeError):
+        return None
+
+
+async def process_file(
+    input_path: str,
+    output_path: str,
+    concurrency: int,
+    use_cache: bool = True,
+    service: AIService = None
+) -> dict:
+    """Process every pending line of ``input_path``, appending results to ``output_path``."""
+    completed = load_completed_lines(output_path)
+    if completed:
+        logger.info("Resuming: %d lines already processed", len(completed))
+
+    service = service or AIService()
+    pending = iter_pending(input_path, completed)
+    # run_batch reports positions within the pending stream; remember the
+    # input line numbers of in-flight items so results can be labelled.
+    line_numbers = {}
+
+    def numbered():
+        for index, (line_number, raw) in enumerate(pending):
+            line_numbers[index] = (line_number, raw)
+            yield raw
+
+    counts = {"processed": 0, "failed": 0, "skipped": len(completed)}
+    started = time.perf_counter()
+    try:
+        with open(output_path, "a", encoding="utf-8") as out:
+            async for result in run_batch(
+                numbered(),
+                lambda raw: process_record(service, raw, use_cache),
+                concurrency
+            ):
+                line_number, raw = line_numbers.pop(result.index)
+                out.write(json.dumps({
+                    "line": line_number,
+                    "id": _record_id(raw),
+                    "status_code": result.status_code,
+                    "result": result.value,
+                    "error": result.detail,
+                }) + "\n")
+                out.flush()
+
+                counts["processed"] += 1
+                if result.error is not None:
+                    counts["failed"] += 1
+                    logger.error("Line %d failed: %s", line_number, result.detail)
+                if counts["processed"] % 100 == 0:
+                    elapsed = time.perf_counter() - started
+                    logger.info("Processed %d lines (%.1f/s)", counts["processed"], counts["processed"] / elapsed)
+    finally:
+        # Finish folding thread turns into their summaries and write out
+        # usage before exiting, also when the run is interrupted
+        await service.close()
+        await service.tenants.stop()
+        await service.state.stop()
+    return counts
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Process a JSONL file of write/respond requests.")
+    parser.add_argument("input", help="Input JSONL file of requests")
+    parser.add_argument("output", help="Output JSONL file; existing results are treated as a checkpoint")
+    parser.add_argument("--concurrency", type=int, default=None,
+                        help="Requests in flight at once (default: BATCH_CONCURRENCY)")
+    parser.add_argument("--no-cache", action="store_true", help="Bypass the response cache")
+    parser.add_argument("--tenant", default=DEFAULT_TENANT, help="Tenant the run's usage is accounted to")
+    args = parser.parse_args(argv)
+
+    settings = get_settings()
+    configure_logging(settings)
+    concurrency = args.concurrency or settings.BATCH_CONCURRENCY
+    tenant_var.set(args.tenant)
+    counts = asyncio.run(
+        process_file(args.input, args.output, concurrency, use_cache=not args.no_cache)
+    )
+    logger.info(
+        "Done: %d processed, %d failed, %d skipped from previous runs",
+        counts["processed"], counts["failed"], counts["skipped"]
+    )
+
+
+if __name__ == "__main__":
+    main()
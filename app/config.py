@@ -1,9 +1,195 @@
 # config.py
 from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
 from pydantic_settings import BaseSettings
 
 class Settings(BaseSettings):
     GOOGLE_API_KEY: str
+    MODEL_NAME: str = "gemini-1.5-flash"
+
+    # Model routing: an optional smaller model for cheap calls, e.g.
+    # "gemini-1.5-flash-8b" (unset, every call uses MODEL_NAME), the rules
+    # that send calls to it, fallback to the other model when the routed one
+    # is erroring or has MODEL_MAX_IN_FLIGHT calls in flight (0 means
+    # MAX_CONCURRENT_REQUESTS), and USD per 1M input/output tokens
+    FAST_MODEL_NAME: Optional[str] = None
+    ROUTE_FAST_OPERATIONS: List[str] = ["greet_user", "json_repair", "summarize_thread"]
+    ROUTE_FAST_TONES: List[str] = ["casual"]
+    ROUTE_FAST_MAX_INPUT_TOKENS: int = 200
+    MODEL_FALLBACK: bool = True
+    MODEL_MAX_IN_FLIGHT: int = 0
+    MODEL_PRICING: Dict[str, Tuple[float, float]] = {
+        "gemini-1.5-flash": (0.075, 0.30),
+        "gemini-1.5-flash-8b": (0.0375, 0.15),
+        "gemini-1.5-pro": (1.25, 5.00),
+    }
+
+    # Generation backend: "gemini", or "fake" for load tests without the API
+    MODEL_BACKEND: str = "gemini"
+    # Fake backend: median first-token latency and its log-normal spread,
+    # output throughput and length, failure and malformed JSON rates, and
+    # the fraction of calls that stall for FAKE_SLOW_MULTIPLIER times longer,
+    # and prompt tokens read per second before the first token (0 ignores them)
+    FAKE_LATENCY_MS: float = 800.0
+    FAKE_LATENCY_SIGMA: float = 0.5
+    FAKE_TOKENS_PER_SECOND: float = 150.0
+    FAKE_OUTPUT_TOKENS: int = 120
+    FAKE_ERROR_RATE: float = 0.0
+    FAKE_MALFORMED_JSON_RATE: float = 0.0
+    FAKE_SLOW_RATE: float = 0.0
+    FAKE_SLOW_MULTIPLIER: float = 10.0
+    FAKE_PREFILL_TOKENS_PER_SECOND: float = 0.0
+    FAKE_SEED: Optional[int] = None
+
+    # Production server: worker processes (0 means one per CPU core the
+    # container may use), seconds allowed at shutdown for in-flight requests
+    # and model calls to finish, and where state shared between workers
+    # lives: "local" (quota split between workers, per-worker metrics) or
+    # "redis" (uses REDIS_URL)
+    WEB_CONCURRENCY: int = 0
+    SHUTDOWN_GRACE_SECONDS: float = 30.0
+    SHARED_STATE_BACKEND: str = "local"
+    METRICS_PUBLISH_SECONDS: float = 5.0
+
+    # Upstream connections (Gemini over gRPC): HTTP/2 channels calls are
+    # spread over (0 uses the SDK default client), keep-alive ping interval
+    # and connect timeout; optionally connect and send a token-count request
+    # at startup, before the worker takes traffic or reports ready
+    UPSTREAM_POOL_SIZE: int = 4
+    UPSTREAM_KEEPALIVE_SECONDS: float = 30.0
+    UPSTREAM_CONNECT_TIMEOUT_SECONDS: float = 10.0
+    UPSTREAM_WARMUP: bool = True
+
+    # Maximum number of model calls a single process keeps in flight
+    MAX_CONCURRENT_REQUESTS: int = 64
+
+    # Upstream resilience: per-attempt deadline, retries and circuit breaker
+    UPSTREAM_TIMEOUT_SECONDS: float = 30.0
+    RETRY_MAX_ATTEMPTS: int = 3
+    RETRY_BASE_DELAY_SECONDS: float = 0.5
+    RETRY_MAX_DELAY_SECONDS: float = 8.0
+    BREAKER_FAILURE_THRESHOLD: int = 5
+    BREAKER_RESET_SECONDS: float = 30.0
+
+    # Request hedging: a model call still running at the HEDGE_PERCENTILE
+    # latency of recent calls of its kind is raced against a duplicate.
+    # HEDGE_MAX_RATE caps duplicates as a fraction of calls
+    HEDGE_REQUESTS: bool = False
+    HEDGE_PERCENTILE: float = 0.95
+    HEDGE_MAX_RATE: float = 0.05
+    HEDGE_MIN_SAMPLES: int = 50
+    HEDGE_WINDOW_SECONDS: float = 60.0
+
+    # Admission control: upstream quota (0 disables a limit), wait queue bound,
+    # longest acceptable queue wait and expected output tokens per call
+    RATE_LIMIT_RPM: int = 2000
+    RATE_LIMIT_TPM: int = 4000000
+    ADMISSION_MAX_QUEUE: int = 256
+    ADMISSION_MAX_WAIT_SECONDS: float = 30.0
+    ADMISSION_OUTPUT_TOKENS: int = 512
+
+    # Tenants: API keys (sent as X-API-Key) mapped to tenant names; with no
+    # keys every caller is the "default" tenant. Daily model-call and token
+    # quotas and model calls in flight per tenant (0 disables a limit), with
+    # per-tenant overrides of those three, e.g. {"bulk": {"max_concurrency": 4}}
+    API_KEYS: Dict[str, str] = {}
+    TENANT_REQUESTS_PER_DAY: int = 0
+    TENANT_TOKENS_PER_DAY: int = 0
+    TENANT_MAX_CONCURRENCY: int = 0
+    TENANT_LIMITS: Dict[str, Dict[str, int]] = {}
+
+    # Tenant usage accounting: "sqlite", "none" (in memory only) or "auto"
+    # (sqlite once API keys, daily quotas or per-tenant limits are set, none
+    # otherwise), database path and how often counters are flushed to it
+    USAGE_BACKEND: str = "auto"
+    USAGE_DB_PATH: str = "usage.db"
+    USAGE_FLUSH_SECONDS: float = 10.0
+
+    # Input guardrails: longest accepted request fields in characters (longer
+    # requests are rejected with 422 before any model call), and the token
+    # budget an email thread is trimmed to before it is put in a prompt
+    # (signatures, then quoted history, then the middle; 0 disables)
+    MAX_EMAIL_CHARS: int = 100000
+    MAX_MESSAGE_CHARS: int = 20000
+    MAX_PROMPT_CHARS: int = 4000
+    EMAIL_TOKEN_BUDGET: int = 2000
+
+    # Thread mode for respond_message: where thread turns are stored
+    # ("sqlite", "memory" or "none"), how many recent messages are sent
+    # verbatim before older ones are folded into the rolling summary, and the
+    # summary's word limit
+    THREAD_BACKEND: str = "sqlite"
+    THREAD_DB_PATH: str = "threads.db"
+    THREAD_RECENT_MESSAGES: int = 4
+    THREAD_SUMMARY_WORDS: int = 150
+
+    # Upload static prompt prefixes as model-side cached content, recreated
+    # before their TTL runs out. The API refuses content below a minimum
+    # size (4096 tokens for current Gemini models), so smaller prefixes are
+    # always sent inline
+    PROMPT_CONTEXT_CACHE: bool = False
+    PROMPT_CONTEXT_CACHE_TTL_SECONDS: int = 3600
+    PROMPT_CONTEXT_CACHE_MIN_TOKENS: int = 4096
+
+    # Ask the model for schema-constrained JSON, and allow one repair call
+    # when a structured reply still cannot be parsed
+    STRUCTURED_OUTPUT: bool = True
+    JSON_REPAIR: bool = True
+
+    # Greeting pool: templates generated per variant (0 disables) and how
+    # often they are regenerated in the background
+    GREETING_POOL_SIZE: int = 8
+    GREETING_POOL_REFRESH_SECONDS: float = 3600.0
+
+    # Response cache: "memory", "redis" or "none"
+    CACHE_BACKEND: str = "memory"
+    CACHE_MAX_ENTRIES: int = 1024
+    CACHE_TTL_SECONDS: float = 3600.0
+    REDIS_URL: Optional[str] = None
+
+    # Near-duplicate cache for respond_message: minimum word-shingle Jaccard
+    # similarity for reuse, and entries kept in memory
+    SEMANTIC_CACHE: bool = True
+    SEMANTIC_CACHE_THRESHOLD: float = 0.85
+    SEMANTIC_CACHE_MAX_ENTRIES: int = 100000
+
+    # Job queue for submit/poll requests: "memory" (in-process workers only)
+    # or "redis" (shared with `python -m app.worker` processes), workers per
+    # process (0 leaves jobs to separate worker processes), record lifetime
+    # and callback delivery. Callbacks go only to public addresses unless
+    # JOB_CALLBACK_ALLOWED_HOSTS is set, e.g. ["hooks.example.com"], in which
+    # case only those hosts are accepted
+    JOB_QUEUE_BACKEND: str = "memory"
+    JOB_WORKERS: int = 4
+    JOB_TTL_SECONDS: float = 86400.0
+    JOB_MAX_ENTRIES: int = 10000
+    JOB_CALLBACK_TIMEOUT_SECONDS: float = 10.0
+    JOB_CALLBACK_RETRIES: int = 3
+    JOB_CALLBACK_ALLOWED_HOSTS: List[str] = []
+
+    # Batch endpoints: parallel items per batch and maximum batch size
+    BATCH_CONCURRENCY: int = 16
+    BATCH_MAX_ITEMS: int = 1000
+
+    # Campaigns: most recipients per request, most drafts per variant and
+    # generation attempts per draft before its placeholders count as lost
+    CAMPAIGN_MAX_RECIPIENTS: int = 10000
+    CAMPAIGN_MAX_DRAFTS: int = 5
+    CAMPAIGN_DRAFT_ATTEMPTS: int = 2
+
+    # Response compression: smallest body compressed in bytes (0 disables),
+    # gzip level, and brotli quality when the brotli package is installed
+    # and the client accepts it
+    COMPRESSION_MIN_BYTES: int = 1024
+    GZIP_LEVEL: int = 1
+    BROTLI_QUALITY: int = 4
+
+    # Logging: level, "json" or "text" output, and how much of large payloads
+    # (model replies, user messages) is logged and how often
+    LOG_LEVEL: str = "INFO"
+    LOG_FORMAT: str = "json"
+    LOG_PAYLOAD_MAX_CHARS: int = 512
+    LOG_PAYLOAD_SAMPLE_RATE: float = 0.01
 
     class Config:
         env_file = ".env"
@@ -0,0 +1,179 @@
+"""
+Logging setup for the AI Message Response System.
+
+Records are handed to a ``QueueHandler`` on the calling thread and written
+by a ``QueueListener`` background thread, so a slow log sink never blocks
+the event loop. Output is one JSON object per line carrying the current
+request ID. Large payloads (model replies, user messages) are wrapped in
+``Payload``: they are only stringified if the record is emitted, truncated
+to ``LOG_PAYLOAD_MAX_CHARS``, and sampled at ``LOG_PAYLOAD_SAMPLE_RATE``.
+"""
+
+import atexit
+import json
+import logging
+import queue
+import random
+import sys
+import uuid
+from contextvars import ContextVar
+from logging.handlers import QueueHandler, QueueListener
+from typing import Optional
+
+request_id_var: ContextVar[str] = ContextVar("request_id", default="-")
+
+_payload_max_chars = 512
+_listener: Optional[QueueListener] = None
+
+
+class Payload:
+    """Lazily formatted, truncated log argument for large text."""
+
+    __slots__ = ("value",)
+
+    def __init__(self, value):
+        self.value = value
+
+    def __str__(self) -> str:
+        text = str(self.value)
+        if len(text) <= _payload_max_chars:
+            return text
+        return f"{text[:_payload_max_chars]}... [{len(text) - _payload_max_chars} chars truncated]"
+
+
+class RequestIdFilter(logging.Filter):
+    """Attach the current request ID to every record."""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.request_id = request_id_var.get()
+        return True
+
+
+class PayloadSamplingFilter(logging.Filter):
+    """Keep only a sample of records that carry a Payload argument."""
+
+    def __init__(self, rate: float):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if self.rate >= 1 or not isinstance(record.args, tuple):
+            return True
+        if not any(isinstance(arg, Payload) for arg in record.args):
+            return True
+        return random.random() < self.rate
+
+
+class _DeferredQueueHandler(QueueHandler):
+    """
+    QueueHandler that leaves formatting to the listener thread.
+
+    The stock handler formats the message on the caller's thread; here only
+    the request ID and exception text, which depend on caller context, are
+    captured before the record is queued.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "request_id": getattr(record, "request_id", "-"),
+            "message": record.getMessage(),
+        }
+        if record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+TEXT_FORMAT = "%(asctime)s - %(levelname)s - [%(request_id)s] %(message)s"
+
+
+def configure_logging(settings, stream=None) -> QueueListener:
+    """
+    Route all logging through a background writer.
+
+    Safe to call more than once; later calls replace the previous setup.
+    """
+    global _payload_max_chars, _listener
+    if _listener is not None:
+        _listener.stop()
+
+    _payload_max_chars = settings.LOG_PAYLOAD_MAX_CHARS
+
+    sink = logging.StreamHandler(stream or sys.stderr)
+    if settings.LOG_FORMAT == "json":
+        sink.setFormatter(JsonFormatter())
+    else:
+        sink.setFormatter(logging.Formatter(TEXT_FORMAT))
+
+    handler = _DeferredQueueHandler(queue.SimpleQueue())
+    handler.addFilter(RequestIdFilter())
+    handler.addFilter(PayloadSamplingFilter(settings.LOG_PAYLOAD_SAMPLE_RATE))
+
+    root = logging.getLogger()
+    for existing in list(root.handlers):
+        root.removeHandler(existing)
+    root.addHandler(handler)
+    root.setLevel(settings.LOG_LEVEL.upper())
+
+    _listener = QueueListener(handler.queue, sink, respect_handler_level=True)
+    _listener.start()
+    return _listener
+
+
+def shutdown_logging() -> None:
+    """Flush queued records and stop the background writer."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+atexit.register(shutdown_logging)
+
+
+class RequestIdMiddleware:
+    """
+    ASGI middleware binding a request ID to the logging context.
+
+    Reuses an incoming ``X-Request-ID`` header when present and echoes the ID
+    back on the response.
+    """
+
+    def __init__(self, app, header: str = "x-request-id"):
+        self.app = app
+        self.header = header.encode("latin-1")
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request_id = None
+        for name, value in scope.get("headers", ()):
+            if name == self.header:
+                request_id = value.decode("latin-1")[:128]
+                break
+        request_id = request_id or uuid.uuid4().hex
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                headers = list(message.get("headers", []))
+                headers.append((self.header, request_id.encode("latin-1")))
+                message["headers"] = headers
+            await send(message)
+
+        token = request_id_var.set(request_id)
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            request_id_var.reset(token)
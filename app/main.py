@@ -4,24 +4,254 @@ FastAPI application setup and route definitions for the AI Message Response Syst
 
 # @Codebase
 
+import asyncio
 import logging
-import json
 
-# Configure logging
-logging.basicConfig(level=logging.DEBUG, format='%(asctime)s - %(levelname)s - %(message)s')
+from app.config import get_settings
+from app.logging_config import Payload, RequestIdMiddleware, configure_logging
+
+# Configure logging: queued, structured and written off the event loop
+configure_logging(get_settings())
 logger = logging.getLogger(__name__)
 
-from fastapi import FastAPI, HTTPException
-from app.models.model import EmailRequest, MessageRequest, Response, EmailWriter
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Awaitable, Callable, List, Optional
+from fastapi import Depends, FastAPI, Header, HTTPException
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from app.models.model import (
+    EmailRequest, MessageRequest, Response, EmailWriter,
+    BatchMessageRequest, BatchEmailRequest, BatchItemResult, BatchResponse, JobRecord, TenantUsage,
+    CampaignRequest, CampaignResponse, ThreadRecord
+)
+from app.responses import CompressionMiddleware, FastJSONResponse, dumps, ndjson_response, wants_ndjson
+from app.services.batch import run_batch
+from app.services.campaigns import run_campaign
+from app.services.jobs import JobWorkerPool, check_callback_url, create_job_queue, new_job
+from app.services.metrics import METRICS, MetricsMiddleware
 from app.services.services import AIService
+from app.services.tenants import tenant_var, today
+from app.worker import job_handler
+
+# Cheap to construct: the model client is created in the lifespan hook below
+ai_service = AIService()
+job_queue = create_job_queue(get_settings())
+job_workers = JobWorkerPool.from_settings(get_settings(), job_queue, job_handler(ai_service))
+
+async def _retry_warmup(timeout: float, delay: float = 1.0, max_delay: float = 30.0) -> None:
+    """Retry a failed upstream warmup with backoff, marking the worker ready once one succeeds."""
+    while True:
+        await asyncio.sleep(delay)
+        if await ai_service.warmup(timeout):
+            logger.info("Upstream warmup succeeded on retry, worker is ready")
+            app.state.ready = True
+            return
+        delay = min(delay * 2, max_delay)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Create the model client once the worker starts rather than at import
+    time, and warm its connections before the worker takes traffic. After
+    a failed warmup the worker stays unready while it retries in the
+    background.
+    """
+    app.state.ready = False
+    settings = get_settings()
+    ai_service.load_model()
+    warmed = not settings.UPSTREAM_WARMUP or await ai_service.warmup(settings.UPSTREAM_TIMEOUT_SECONDS)
+    ai_service.greetings.start()
+    ai_service.state.start()
+    ai_service.tenants.start()
+    if job_workers.concurrency > 0:
+        job_workers.start()
+    elif settings.JOB_QUEUE_BACKEND.lower() == "memory":
+        logger.warning("JOB_WORKERS=0 with an in-memory job queue: submitted jobs will never run")
+    warmup_retry = None
+    if warmed:
+        app.state.ready = True
+    else:
+        logger.warning("Upstream warmup failed, /ready returns 503 until a retry succeeds")
+        warmup_retry = asyncio.create_task(_retry_warmup(settings.UPSTREAM_TIMEOUT_SECONDS))
+    yield
+    # The server has stopped accepting requests; let running jobs and model
+    # calls finish within the grace period before tearing down
+    if warmup_retry is not None:
+        warmup_retry.cancel()
+    app.state.ready = False
+    grace = settings.SHUTDOWN_GRACE_SECONDS
+    await job_workers.stop(grace)
+    await ai_service.greetings.stop()
+    await ai_service.drain(grace)
+    await ai_service.close()
+    await job_queue.close()
+    await ai_service.tenants.stop()
+    await ai_service.state.stop()
 
 app = FastAPI(
     title="Telegence AI Message Response System",
     description="API for generating AI-based responses for user messages and emails.",
-    version="0.1.0"
+    version="0.1.0",
+    lifespan=lifespan,
+    default_response_class=FastJSONResponse
 )
+app.add_middleware(MetricsMiddleware)
+app.add_middleware(RequestIdMiddleware)
+if get_settings().COMPRESSION_MIN_BYTES > 0:
+    app.add_middleware(
+        CompressionMiddleware,
+        minimum_size=get_settings().COMPRESSION_MIN_BYTES,
+        compresslevel=get_settings().GZIP_LEVEL,
+        brotli_quality=get_settings().BROTLI_QUALITY
+    )
+ai_service.register_metrics()
 
-ai_service = AIService()
+async def current_tenant(x_api_key: Optional[str] = Header(None)) -> str:
+    """
+    Resolve the caller's tenant from the X-API-Key header and make it the
+    tenant its model calls are accounted to.
+    """
+    tenant = ai_service.tenants.authenticate(x_api_key)
+    tenant_var.set(tenant)
+    return tenant
+
+def _sse_event(data: dict, event: Optional[str] = None) -> str:
+    """Format a server-sent event with a JSON payload."""
+    prefix = f"event: {event}\n" if event else ""
+    return f"{prefix}data: {dumps(data).decode()}\n\n"
+
+async def _stream_as_sse(
+    first: Optional[str],
+    chunks: AsyncIterator[str],
+    **response_fields
+) -> AsyncIterator[str]:
+    """
+    Relay text chunks as `token` events, then a final `done` event carrying the
+    assembled text in the regular Response shape.
+    """
+    parts = []
+    try:
+        if first is not None:
+            parts.append(first)
+            yield _sse_event({"text": first}, event="token")
+            async for chunk in chunks:
+                parts.append(chunk)
+                yield _sse_event({"text": chunk}, event="token")
+    except Exception as e:
+        logger.error("Error while streaming response: %s", e)
+        yield _sse_event({"detail": str(getattr(e, "detail", e))}, event="error")
+        return
+    final = Response(response="".join(parts).strip(), **response_fields)
+    yield _sse_event(final.model_dump(), event="done")
+
+async def _sse_response(chunks: AsyncIterator[str], **response_fields) -> StreamingResponse:
+    """
+    Start streaming once the first chunk has arrived. Quota, admission and
+    circuit breaker rejections happen before it, so they are returned as
+    regular HTTP errors (with Retry-After) instead of an `error` event on a
+    200 stream.
+    """
+    try:
+        first = await chunks.__anext__()
+    except StopAsyncIteration:
+        first = None
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error("Error while starting stream: %s", e)
+        raise HTTPException(status_code=500, detail=str(e))
+    return StreamingResponse(
+        _stream_as_sse(first, chunks, **response_fields),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+async def _write_message(request: MessageRequest, use_cache: bool = True) -> EmailWriter:
+    response = await ai_service.generate_response(
+        request.type, 
+        request.user_message, 
+        request.email,
+        request.user_name,
+        use_cache=use_cache
+    )
+    return EmailWriter(
+        email=request.email or "user@example.com", 
+        subject=response["subject"], 
+        body=response["body"],
+        user_name=request.user_name
+    )
+
+async def _respond_message(request: EmailRequest, use_cache: bool = True) -> Response:
+    response_message = await ai_service.email_responder(
+        request.email_address, 
+        request.email, 
+        request.prompt, 
+        request.type,
+        request.user_name,
+        use_cache=use_cache,
+        thread_id=request.thread_id
+    )
+    return Response(
+        email=request.email_address, 
+        response=response_message, 
+        user_name=request.user_name
+    )
+
+def _batch_concurrency(requested: Optional[int]) -> int:
+    settings = get_settings()
+    if requested is None:
+        return settings.BATCH_CONCURRENCY
+    return max(1, min(requested, settings.BATCH_CONCURRENCY))
+
+def _check_batch_size(items: list) -> None:
+    limit = get_settings().BATCH_MAX_ITEMS
+    if len(items) > limit:
+        raise HTTPException(status_code=413, detail=f"Batch exceeds the maximum of {limit} items")
+
+async def _run_batch_endpoint(
+    items: list,
+    handler: Callable[..., Awaitable],
+    concurrency: Optional[int],
+    stream: bool
+):
+    """
+    Fan a batch out over the service. Identical items share one upstream call
+    through the response cache's request coalescing. Results are returned
+    without being validated against BatchResponse again.
+    """
+    _check_batch_size(items)
+    results = run_batch(items, handler, _batch_concurrency(concurrency))
+
+    def to_item(result) -> BatchItemResult:
+        if result.error is not None:
+            logger.error("Batch item %d failed: %s", result.index, result.detail)
+        return BatchItemResult(
+            index=result.index,
+            status_code=result.status_code,
+            result=result.value,
+            error=result.detail
+        )
+
+    if stream:
+        async def ndjson_items():
+            async for result in results:
+                yield to_item(result)
+        return ndjson_response(ndjson_items())
+
+    ordered: List[Optional[BatchItemResult]] = [None] * len(items)
+    async for result in results:
+        ordered[result.index] = to_item(result)
+    return FastJSONResponse(BatchResponse(results=ordered))
+
+async def _submit_job(kind: str, request, use_cache: bool, callback_url: Optional[str]) -> FastJSONResponse:
+    if callback_url is not None:
+        try:
+            await check_callback_url(callback_url, job_workers.callback_allowed_hosts)
+        except ValueError as e:
+            raise HTTPException(status_code=422, detail=str(e))
+    job = new_job(kind, request.model_dump(), use_cache, callback_url)
+    await job_queue.submit(job)
+    logger.info("Queued %s job %s", kind, job["job_id"])
+    return FastJSONResponse(JobRecord(**job), status_code=202)
 
 @app.get("/")
 async def read_root():
@@ -29,66 +259,246 @@ async def read_root():
     logger.info("Root endpoint accessed")
     return {"message": "Welcome to the AI Message Response System"}
 
-@app.post("/greet_user", response_model=Response)
+@app.get("/ready")
+async def ready():
+    """
+    Readiness for load balancers: 200 once startup (model client and
+    a successful connection warmup) has finished, 503 before that and while
+    shutting down.
+    `/` only reports that the process is alive.
+    """
+    if not getattr(app.state, "ready", False):
+        return FastJSONResponse({"status": "unavailable"}, status_code=503)
+    return {"status": "ready"}
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """
+    Expose service metrics in the Prometheus text format, summed over every
+    worker process when SHARED_STATE_BACKEND=redis.
+    """
+    text = await ai_service.state.render_metrics(METRICS)
+    return PlainTextResponse(text, media_type="text/plain; version=0.0.4")
+
+@app.post("/greet_user", response_model=Response, dependencies=[Depends(current_tenant)])
 async def greeting(user_name: str = None):
     """Generate an AI greeting message."""
     try:
-        logger.info(f"Generating user greeting for user: {user_name}")
+        logger.info("Generating user greeting for user: %s", user_name)
         greeting_message = await ai_service.greet_user("Hello", user_name)
         logger.info("User greeting generated successfully")
-        return Response(response=greeting_message, user_name=user_name)
+        return FastJSONResponse(Response(response=greeting_message, user_name=user_name))
+    except HTTPException:
+        raise
     except Exception as e:
-        logger.error(f"Error generating greeting: {str(e)}")
+        logger.error("Error generating greeting: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
-@app.post("/write_message", response_model=EmailWriter)
-async def select_message(request: MessageRequest):
+@app.post("/greet_user/stream", dependencies=[Depends(current_tenant)])
+async def greeting_stream(user_name: str = None):
+    """Stream an AI greeting message as server-sent events."""
+    logger.info("Streaming user greeting for user: %s", user_name)
+    chunks = ai_service.stream_greet_user("Hello", user_name)
+    return await _sse_response(chunks, user_name=user_name)
+
+@app.post("/write_message", response_model=EmailWriter, dependencies=[Depends(current_tenant)])
+async def select_message(request: MessageRequest, use_cache: bool = True):
     """Generate an AI response for a user message."""
     try:
-        logger.info(f"Received write_message request: type={request.type}, message={request.user_message}, user_name={request.user_name}")
-        response = await ai_service.generate_response(
-            request.type, 
-            request.user_message, 
-            request.email,
-            request.user_name
-        )
-        
-        email_response = EmailWriter(
-            email=request.email or "user@example.com", 
-            subject=response["subject"], 
-            body=response["body"],
-            user_name=request.user_name
-        )
-        
-        logger.info(f"Generated email response with subject: {email_response.subject}")
-        return email_response
+        logger.info("Received write_message request: type=%s, user_name=%s", request.type, request.user_name)
+        logger.debug("write_message user_message: %s", Payload(request.user_message))
+        email_response = await _write_message(request, use_cache)
+        logger.info("Generated email response with subject: %s", email_response.subject)
+        return FastJSONResponse(email_response)
+    except HTTPException:
+        raise
     except Exception as e:
-        logger.error(f"Error in write_message endpoint: {str(e)}")
+        logger.error("Error in write_message endpoint: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
-@app.post("/respond_message", response_model=Response)
-async def respond_to_email(request: EmailRequest):
-    """Generate an AI response for an email."""
+@app.post("/write_message/batch", response_model=BatchResponse, dependencies=[Depends(current_tenant)])
+async def select_message_batch(
+    request: BatchMessageRequest,
+    use_cache: bool = True,
+    concurrency: Optional[int] = None,
+    stream: bool = False,
+    accept: Optional[str] = Header(None)
+):
+    """
+    Generate AI emails for a batch of messages.
+
+    Results are returned in input order, or as NDJSON in completion order
+    when `stream=true` or with `Accept: application/x-ndjson`. A failing item
+    is reported in its own result entry.
+    """
+    logger.info("Received write_message batch of %d items", len(request.items))
+    return await _run_batch_endpoint(
+        request.items,
+        lambda item: _write_message(item, use_cache),
+        concurrency,
+        stream or wants_ndjson(accept)
+    )
+
+@app.post("/write_message/campaign", response_model=CampaignResponse, dependencies=[Depends(current_tenant)])
+async def write_message_campaign(
+    request: CampaignRequest,
+    use_cache: bool = True,
+    accept: Optional[str] = Header(None)
+):
+    """
+    Generate one message for many recipients that differ only in email and
+    user_name.
+
+    A few drafts are generated with placeholders for those fields and each
+    recipient's email is rendered from them locally, so the number of model
+    calls does not grow with the number of recipients. With
+    `Accept: application/x-ndjson` the emails are returned one per line and
+    the number of drafts in the `X-Campaign-Drafts` header.
+    """
+    settings = get_settings()
+    limit = settings.CAMPAIGN_MAX_RECIPIENTS
+    if len(request.recipients) > limit:
+        raise HTTPException(status_code=413, detail=f"Campaign exceeds the maximum of {limit} recipients")
+    logger.info("Received write_message campaign: type=%s, %d recipients", request.type, len(request.recipients))
     try:
-        logger.info(f"Received respond_message request for email: {request.email_address}, user_name: {request.user_name}")
-        response_message = await ai_service.email_responder(
-            request.email_address, 
-            request.email, 
-            request.prompt, 
+        campaign = await run_campaign(
+            ai_service.generate_response,
             request.type,
-            request.user_name
+            request.user_message,
+            [recipient.model_dump() for recipient in request.recipients],
+            drafts=max(1, min(request.drafts, settings.CAMPAIGN_MAX_DRAFTS)),
+            attempts=settings.CAMPAIGN_DRAFT_ATTEMPTS,
+            use_cache=use_cache
         )
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error("Error in write_message campaign endpoint: %s", e)
+        raise HTTPException(status_code=500, detail=str(e))
+    logger.info("Campaign rendered %d emails from %d drafts", len(campaign.results), campaign.drafts)
+    if wants_ndjson(accept):
+        return ndjson_response(campaign.results, headers={"X-Campaign-Drafts": str(campaign.drafts)})
+    return FastJSONResponse(CampaignResponse(results=campaign.results, drafts=campaign.drafts))
+
+@app.post("/respond_message", response_model=Response, dependencies=[Depends(current_tenant)])
+async def respond_to_email(request: EmailRequest, use_cache: bool = True):
+    """Generate an AI response for an email."""
+    try:
+        logger.info("Received respond_message request for email: %s, user_name: %s", request.email_address, request.user_name)
+        response = await _respond_message(request, use_cache)
         logger.info("Email response generated successfully")
-        return Response(
-            email=request.email_address, 
-            response=response_message, 
-            user_name=request.user_name
-        )
+        return FastJSONResponse(response)
+    except HTTPException:
+        raise
     except Exception as e:
-        logger.error(f"Error in respond_message endpoint: {str(e)}")
+        logger.error("Error in respond_message endpoint: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/respond_message/batch", response_model=BatchResponse, dependencies=[Depends(current_tenant)])
+async def respond_to_email_batch(
+    request: BatchEmailRequest,
+    use_cache: bool = True,
+    concurrency: Optional[int] = None,
+    stream: bool = False,
+    accept: Optional[str] = Header(None)
+):
+    """
+    Generate AI responses for a batch of emails.
+
+    Results are returned in input order, or as NDJSON in completion order
+    when `stream=true` or with `Accept: application/x-ndjson`. A failing item
+    is reported in its own result entry.
+    """
+    logger.info("Received respond_message batch of %d items", len(request.items))
+    return await _run_batch_endpoint(
+        request.items,
+        lambda item: _respond_message(item, use_cache),
+        concurrency,
+        stream or wants_ndjson(accept)
+    )
+
+@app.post("/respond_message/stream", dependencies=[Depends(current_tenant)])
+async def respond_to_email_stream(request: EmailRequest, use_cache: bool = True):
+    """Stream an AI response for an email as server-sent events."""
+    logger.info("Streaming respond_message for email: %s, user_name: %s", request.email_address, request.user_name)
+    chunks = ai_service.stream_email_responder(
+        request.email_address,
+        request.email,
+        request.prompt,
+        request.type,
+        request.user_name,
+        use_cache=use_cache,
+        thread_id=request.thread_id
+    )
+    return await _sse_response(chunks, email=request.email_address, user_name=request.user_name)
+
+@app.post("/write_message/jobs", response_model=JobRecord, status_code=202, dependencies=[Depends(current_tenant)])
+async def submit_write_message_job(
+    request: MessageRequest,
+    use_cache: bool = True,
+    callback_url: Optional[str] = None
+):
+    """
+    Queue a write_message request and return its job immediately.
+
+    Poll `GET /jobs/{job_id}` for the result, or pass `callback_url` to have
+    the finished job POSTed to it.
+    """
+    return await _submit_job("write_message", request, use_cache, callback_url)
+
+@app.post("/respond_message/jobs", response_model=JobRecord, status_code=202, dependencies=[Depends(current_tenant)])
+async def submit_respond_message_job(
+    request: EmailRequest,
+    use_cache: bool = True,
+    callback_url: Optional[str] = None
+):
+    """
+    Queue a respond_message request and return its job immediately.
+
+    Poll `GET /jobs/{job_id}` for the result, or pass `callback_url` to have
+    the finished job POSTed to it.
+    """
+    return await _submit_job("respond_message", request, use_cache, callback_url)
+
+@app.get("/jobs/{job_id}", response_model=JobRecord)
+async def get_job(job_id: str, tenant: str = Depends(current_tenant)):
+    """Return a queued job's status, and its result once it has finished."""
+    job = await job_queue.get(job_id)
+    # Jobs are only visible to the tenant that submitted them
+    if job is None or job.get("tenant", tenant) != tenant:
+        raise HTTPException(status_code=404, detail="Job not found or expired")
+    return FastJSONResponse(JobRecord(**job))
+
+@app.get("/usage", response_model=TenantUsage)
+async def usage(tenant: str = Depends(current_tenant)):
+    """Return the calling tenant's model usage today and its quotas."""
+    counts = ai_service.tenants.usage(tenant)
+    return FastJSONResponse(TenantUsage(
+        tenant=tenant,
+        day=today(),
+        limits=ai_service.tenants.limits(tenant)._asdict(),
+        **counts.as_dict()
+    ))
+
+@app.get("/threads/{thread_id}", response_model=ThreadRecord, dependencies=[Depends(current_tenant)])
+async def get_thread(thread_id: str):
+    """Return the summary and unsummarized messages stored for a thread."""
+    state = await ai_service.thread(thread_id)
+    if not state.summary and not state.messages:
+        raise HTTPException(status_code=404, detail="Thread not found")
+    return FastJSONResponse(ThreadRecord(
+        thread_id=thread_id,
+        summary=state.summary,
+        messages=[message._asdict() for message in state.messages]
+    ))
+
+@app.delete("/threads/{thread_id}", status_code=204, dependencies=[Depends(current_tenant)])
+async def delete_thread(thread_id: str):
+    """Forget a thread's stored messages and summary."""
+    if not await ai_service.delete_thread(thread_id):
+        raise HTTPException(status_code=404, detail="Thread not found")
+
 if __name__ == "__main__":
-    import uvicorn
-    logger.info("Starting AI Message Response System")
-    uvicorn.run("app.main:app", host="0.0.0.0", port=8000, reload=True)
+    # Production launcher; pass --reload for a single auto-reloading dev process
+    from app.server import main
+    main()
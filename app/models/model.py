@@ -4,8 +4,18 @@ Data models for request and response objects in the AI Message Response System.
 
 # @Codebase
 
-from pydantic import BaseModel
-from typing import Optional
+from pydantic import BaseModel, field_validator
+from typing import ClassVar, Dict, List, Optional, Tuple, Union
+
+from app.config import get_settings
+
+
+def check_length(value: Optional[str], field: str, setting: str) -> Optional[str]:
+    """Reject a field longer than the limit in ``setting``, before it reaches any prompt."""
+    limit = getattr(get_settings(), setting)
+    if value is not None and limit and len(value) > limit:
+        raise ValueError(f"{field} is {len(value):,} characters; the limit is {limit:,} ({setting})")
+    return value
 
 
 class EmailRequest(BaseModel):
@@ -14,6 +24,25 @@ class EmailRequest(BaseModel):
     prompt: str
     type: str
     user_name: Optional[str] = None  # Added user_name field
+    # Send only the newest email of a thread; earlier turns are remembered server-side
+    thread_id: Optional[str] = None
+
+    @field_validator("email")
+    @classmethod
+    def _check_email_length(cls, value: Optional[str]) -> Optional[str]:
+        return check_length(value, "email", "MAX_EMAIL_CHARS")
+
+    @field_validator("thread_id")
+    @classmethod
+    def _check_thread_id(cls, value: Optional[str]) -> Optional[str]:
+        if value is not None and not 0 < len(value) <= 200:
+            raise ValueError("thread_id must be 1 to 200 characters")
+        return value
+
+    @field_validator("prompt")
+    @classmethod
+    def _check_prompt_length(cls, value: str) -> str:
+        return check_length(value, "prompt", "MAX_PROMPT_CHARS")
 
 
 class MessageRequest(BaseModel):
@@ -22,6 +51,11 @@ class MessageRequest(BaseModel):
     email: Optional[str] = None 
     user_name: Optional[str] = None  # Added user_name field
 
+    @field_validator("user_message")
+    @classmethod
+    def _check_message_length(cls, value: str) -> str:
+        return check_length(value, "user_message", "MAX_MESSAGE_CHARS")
+
 
 #  Define Response model with methods for handling null values
 class Response(BaseModel):
@@ -44,3 +78,152 @@ class EmailWriter(BaseModel):
     subject: str
     body: str
     user_name: Optional[str] = None  # Added user_name field
+
+    # Fields the model generates; email and user_name come from the request
+    GENERATED_FIELDS: ClassVar[Tuple[str, ...]] = ("subject", "body")
+
+    @classmethod
+    def response_schema(cls) -> dict:
+        """Schema for the model's structured JSON output, bound to the generated fields."""
+        return {
+            "type": "object",
+            "properties": {name: {"type": "string"} for name in cls.GENERATED_FIELDS},
+            "required": list(cls.GENERATED_FIELDS),
+        }
+
+
+class BatchMessageRequest(BaseModel):
+    items: List[MessageRequest]
+
+
+class BatchEmailRequest(BaseModel):
+    items: List[EmailRequest]
+
+
+class BatchItemResult(BaseModel):
+    """
+    Outcome of a single batch item.
+
+    Attributes:
+        index (int): Position of the item in the submitted batch
+        status_code (int): HTTP-style status for this item
+        result (Optional[Union[EmailWriter, Response]]): The generated output on success
+        error (Optional[str]): Error detail when the item failed
+    """
+    index: int
+    status_code: int = 200
+    result: Optional[Union[EmailWriter, Response]] = None
+    error: Optional[str] = None
+
+
+class BatchResponse(BaseModel):
+    results: List[BatchItemResult]
+
+
+class CampaignRecipient(BaseModel):
+    email: Optional[str] = None
+    user_name: Optional[str] = None
+
+
+class CampaignRequest(BaseModel):
+    """
+    One message personalized for many recipients.
+
+    Attributes:
+        type (str): Message type, as in MessageRequest
+        user_message (str): The message every recipient's email is written from
+        recipients (List[CampaignRecipient]): Per-recipient email and user_name
+        drafts (int): Drafts generated per variant (with and without a name), used round-robin
+    """
+    type: str
+    user_message: str
+    recipients: List[CampaignRecipient]
+    drafts: int = 1
+
+    @field_validator("user_message")
+    @classmethod
+    def _check_message_length(cls, value: str) -> str:
+        return check_length(value, "user_message", "MAX_MESSAGE_CHARS")
+
+
+class CampaignResponse(BaseModel):
+    """
+    Personalized emails in recipient order.
+
+    Attributes:
+        results (List[EmailWriter]): One email per recipient
+        drafts (int): Model-generated drafts the results were rendered from
+    """
+    results: List[EmailWriter]
+    drafts: int
+
+
+class JobRecord(BaseModel):
+    """
+    State of a queued generation job.
+
+    Attributes:
+        job_id (str): Identifier to poll with GET /jobs/{job_id}
+        kind (str): "write_message" or "respond_message"
+        status (str): "queued", "running", "succeeded" or "failed"
+        status_code (Optional[int]): HTTP-style status once the job has finished
+        result (Optional[Union[EmailWriter, Response]]): The generated output on success
+        error (Optional[str]): Error detail when the job failed
+        callback_url (Optional[str]): URL the finished job is POSTed to
+        callback_status (Optional[str]): "delivered", "failed" or "rejected" once a callback was attempted
+    """
+    job_id: str
+    kind: str
+    status: str
+    created_at: float
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    status_code: Optional[int] = None
+    result: Optional[Union[EmailWriter, Response]] = None
+    error: Optional[str] = None
+    callback_url: Optional[str] = None
+    callback_status: Optional[str] = None
+
+
+class TenantUsage(BaseModel):
+    """
+    A tenant's model usage for the current UTC day and its limits.
+
+    Attributes:
+        tenant (str): Tenant the API key belongs to ("default" without API keys)
+        day (str): UTC day the usage covers, as YYYY-MM-DD
+        requests (int): Model calls made, including failed ones
+        errors (int): Model calls that failed
+        prompt_tokens (int): Input tokens reported by the model
+        response_tokens (int): Output tokens reported by the model
+        latency_seconds (float): Total upstream time of the model calls
+        limits (Dict[str, int]): requests_per_day, tokens_per_day and max_concurrency (0 is unlimited)
+    """
+    tenant: str
+    day: str
+    requests: int
+    errors: int
+    prompt_tokens: int
+    response_tokens: int
+    latency_seconds: float
+    limits: Dict[str, int]
+
+
+class ThreadMessageRecord(BaseModel):
+    role: str  # "received" or "sent"
+    text: str
+    created_at: float
+
+
+class ThreadRecord(BaseModel):
+    """
+    What is remembered of an email thread.
+
+    Attributes:
+        thread_id (str): Client-chosen thread ID
+        summary (str): Rolling summary of the turns no longer kept verbatim
+        messages (List[ThreadMessageRecord]): Messages not yet summarized, oldest first
+    """
+    thread_id: str
+    summary: str
+    messages: List[ThreadMessageRecord]
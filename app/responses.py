@@ -0,0 +1,104 @@
+"""
+Response encoding for the API: orjson rendering, NDJSON and compression.
+
+Route handlers return their models wrapped in ``FastJSONResponse``, which
+dumps a model the service has already built straight to JSON with orjson.
+FastAPI's default path would validate it against the response model again
+and dump it back to plain data before encoding it with the json module.
+Large bodies are compressed by ``CompressionMiddleware``: with brotli when
+the package is installed and the client accepts it, gzip otherwise.
+"""
+
+from typing import Any, AsyncIterable, Iterable, Union
+
+import orjson
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, StreamingResponse
+from pydantic import BaseModel
+from starlette.datastructures import Headers
+from starlette.middleware.gzip import GZipMiddleware, IdentityResponder
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+
+def dumps(content: Any) -> bytes:
+    """Serialize to compact UTF-8 JSON; pydantic models are dumped without revalidation."""
+    if isinstance(content, BaseModel):
+        content = content.model_dump()
+    # jsonable_encoder only runs for types orjson does not know
+    return orjson.dumps(content, default=jsonable_encoder, option=orjson.OPT_NON_STR_KEYS)
+
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse rendered with orjson that also accepts a pydantic model as content."""
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+def wants_ndjson(accept: str) -> bool:
+    return NDJSON_MEDIA_TYPE in (accept or "")
+
+
+def ndjson_response(items: Union[Iterable, AsyncIterable], **kwargs) -> StreamingResponse:
+    """Stream items (models or plain values) as newline-delimited JSON, one per line."""
+    if hasattr(items, "__aiter__"):
+        async def lines():
+            async for item in items:
+                yield dumps(item) + b"\n"
+    else:
+        def lines():
+            for item in items:
+                yield dumps(item) + b"\n"
+    return StreamingResponse(lines(), media_type=NDJSON_MEDIA_TYPE, **kwargs)
+
+
+class BrotliResponder(IdentityResponder):
+    content_encoding = "br"
+
+    def __init__(self, app, minimum_size: int, quality: int = 4, **kwargs):
+        super().__init__(app, minimum_size, **kwargs)
+        self.quality = quality
+        self._compressor = None
+
+    async def apply_compression(self, body: bytes, *, more_body: bool) -> bytes:
+        if self._compressor is None:
+            self._compressor = brotli.Compressor(quality=self.quality)
+        if more_body:
+            # Flush each chunk so streamed NDJSON lines reach the client promptly
+            return self._compressor.process(body) + self._compressor.flush()
+        return self._compressor.process(body) + self._compressor.finish()
+
+
+class CompressionMiddleware(GZipMiddleware):
+    """
+    Compress response bodies of at least ``minimum_size`` bytes, preferring
+    brotli over gzip when both the package and the client support it.
+    Server-sent events and already encoded responses pass through as is.
+
+    Attributes:
+        minimum_size (int): Smallest body in bytes that is compressed.
+        compresslevel (int): gzip level, 1 (fastest) to 9.
+        brotli_quality (int): brotli quality, 0 (fastest) to 11.
+    """
+
+    def __init__(self, app, minimum_size: int = 1024, compresslevel: int = 1, brotli_quality: int = 4):
+        super().__init__(app, minimum_size=minimum_size, compresslevel=compresslevel)
+        self.brotli_quality = brotli_quality
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] == "http" and brotli is not None and "br" in Headers(scope=scope).get("Accept-Encoding", ""):
+            responder = BrotliResponder(
+                self.app,
+                self.minimum_size,
+                quality=self.brotli_quality,
+                exclude_content_types=self.exclude_content_types,
+            )
+            await responder(scope, receive, send)
+            return
+        await super().__call__(scope, receive, send)
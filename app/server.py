@@ -0,0 +1,123 @@
+"""
+Production server launcher for the AI Message Response System.
+
+Runs the API under uvicorn with one worker process per CPU core available
+to the process (or WEB_CONCURRENCY), the uvloop event loop and httptools parser when installed,
+and a graceful shutdown: on SIGTERM the server stops accepting connections,
+lets in-flight requests, queued jobs and model calls finish for up to
+SHUTDOWN_GRACE_SECONDS, then exits.
+
+Each worker is a separate process with its own AIService; set
+SHARED_STATE_BACKEND=redis (and CACHE_BACKEND=redis) to share rate limits,
+metrics and caches between them.
+
+Usage:
+    python -m app.server --workers 4 --port 8000
+    python -m app.server --reload        # single auto-reloading dev process
+"""
+
+import argparse
+import importlib.util
+import logging
+import math
+import os
+from typing import Optional
+
+import uvicorn
+
+from app.config import get_settings
+from app.logging_config import configure_logging
+
+logger = logging.getLogger(__name__)
+
+
+CGROUP_V2_CPU_MAX = "/sys/fs/cgroup/cpu.max"
+CGROUP_V1_CPU_QUOTA = "/sys/fs/cgroup/cpu/cpu.cfs_quota_us"
+CGROUP_V1_CPU_PERIOD = "/sys/fs/cgroup/cpu/cpu.cfs_period_us"
+
+
+def _read(path: str) -> Optional[str]:
+    try:
+        with open(path) as f:
+            return f.read().strip()
+    except OSError:
+        return None
+
+
+def cgroup_cpu_limit() -> Optional[float]:
+    """CPUs allowed by the container's cgroup CPU quota, or None when unlimited or unknown."""
+    cpu_max = _read(CGROUP_V2_CPU_MAX)
+    if cpu_max is not None:
+        quota, _, period = cpu_max.partition(" ")
+    else:
+        quota, period = _read(CGROUP_V1_CPU_QUOTA), _read(CGROUP_V1_CPU_PERIOD)
+    try:
+        quota, period = int(quota), int(period)
+    except (TypeError, ValueError):
+        # "max" (v2) means no quota
+        return None
+    if quota <= 0 or period <= 0:
+        return None
+    return quota / period
+
+
+def available_cpus() -> int:
+    """
+    CPU cores this process may actually use: the CPUs it is pinned to,
+    further limited by a container CPU quota. os.cpu_count() reports every
+    core on the host, which oversubscribes a container limited to a few.
+    """
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except AttributeError:
+        cpus = os.cpu_count() or 1
+    limit = cgroup_cpu_limit()
+    if limit is not None:
+        cpus = min(cpus, math.ceil(limit))
+    return max(1, cpus)
+
+
+def worker_count(settings) -> int:
+    return settings.WEB_CONCURRENCY or available_cpus()
+
+
+def _available(module: str) -> bool:
+    return importlib.util.find_spec(module) is not None
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Run the API server.")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=int(os.environ.get("PORT", 8000)))
+    parser.add_argument("--workers", type=int, default=None,
+                        help="Worker processes (default: WEB_CONCURRENCY, or one per CPU core)")
+    parser.add_argument("--reload", action="store_true", help="Reload on code changes (single process)")
+    args = parser.parse_args(argv)
+
+    settings = get_settings()
+    configure_logging(settings)
+    workers = 1 if args.reload else args.workers or worker_count(settings)
+    # Workers are spawned fresh and read settings from the environment; this
+    # lets each one size its share of per-process limits (see LocalState)
+    os.environ["WEB_CONCURRENCY"] = str(workers)
+
+    loop = "uvloop" if _available("uvloop") else "asyncio"
+    http = "httptools" if _available("httptools") else "h11"
+    logger.info("Starting AI Message Response System: %d workers, %s loop, %s parser", workers, loop, http)
+    uvicorn.run(
+        "app.main:app",
+        host=args.host,
+        port=args.port,
+        workers=None if args.reload else workers,
+        reload=args.reload,
+        loop=loop,
+        http=http,
+        timeout_graceful_shutdown=settings.SHUTDOWN_GRACE_SECONDS,
+        proxy_headers=True,
+        # Logging is configured per worker by app.main
+        log_config=None,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,266 @@
+"""
+Client-side rate limiting and admission control for upstream model calls.
+
+Requests are admitted against two token buckets, requests per minute and
+estimated tokens per minute, sized to the upstream quota. When the buckets
+are empty, callers wait in a bounded priority queue so interactive traffic
+is served before bulk work. When the queue is full, or the expected wait is
+longer than a caller would sensibly wait, the request is rejected at once
+with 429 and a Retry-After hint instead of piling up work that would time
+out anyway.
+"""
+
+import asyncio
+import heapq
+import itertools
+import logging
+import time
+from enum import IntEnum
+from typing import Dict, List, Optional, Tuple
+
+from fastapi import HTTPException
+
+logger = logging.getLogger(__name__)
+
+
+class Priority(IntEnum):
+    """Admission lanes; lower values are served first."""
+    INTERACTIVE = 0
+    NORMAL = 1
+    BULK = 2
+
+
+class AdmissionRejectedError(HTTPException):
+    def __init__(self, retry_after: float, reason: str):
+        super().__init__(
+            status_code=429,
+            detail=f"Service at capacity: {reason}",
+            headers={"Retry-After": str(max(1, int(retry_after + 0.999)))},
+        )
+
+
+class TokenBucket:
+    """
+    Token bucket refilled continuously at ``rate`` tokens per second.
+
+    Attributes:
+        rate (float): Refill rate in tokens per second.
+        capacity (float): Maximum tokens held, i.e. the largest burst.
+    """
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self._updated = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def wait_time(self, amount: float) -> float:
+        """Seconds until ``amount`` tokens are available (0 if available now)."""
+        self._refill()
+        # Requests larger than the bucket are admitted once it is full.
+        amount = min(amount, self.capacity)
+        if self.tokens >= amount:
+            return 0.0
+        return (amount - self.tokens) / self.rate
+
+    def consume(self, amount: float) -> None:
+        self._refill()
+        self.tokens -= min(amount, self.capacity)
+
+    def level(self) -> float:
+        self._refill()
+        return self.tokens
+
+
+def admission_limits(requests_per_minute: int, tokens_per_minute: int) -> Dict[str, Tuple[float, float]]:
+    """Bucket (refill rate per second, capacity) for each enabled limit."""
+    limits = {}
+    if requests_per_minute > 0:
+        limits["requests"] = (requests_per_minute / 60.0, float(requests_per_minute))
+    if tokens_per_minute > 0:
+        limits["tokens"] = (tokens_per_minute / 60.0, float(tokens_per_minute))
+    return limits
+
+
+class LocalBuckets:
+    """
+    Named token buckets held in this process.
+
+    The interface is shared with the Redis-backed buckets in
+    ``app.services.shared_state``: ``acquire`` takes from every bucket at
+    once or from none, and ``levels`` reports (available tokens, rate).
+    """
+
+    def __init__(self, limits: Dict[str, Tuple[float, float]]):
+        self._buckets = {name: TokenBucket(rate, capacity) for name, (rate, capacity) in limits.items()}
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+    async def acquire(self, amounts: Dict[str, float]) -> float:
+        """Take ``amounts`` and return 0, or take nothing and return the seconds to wait."""
+        wait = max((bucket.wait_time(amounts[name]) for name, bucket in self._buckets.items()), default=0.0)
+        if wait == 0:
+            for name, bucket in self._buckets.items():
+                bucket.consume(amounts[name])
+        return wait
+
+    def levels(self) -> Dict[str, Tuple[float, float]]:
+        return {name: (bucket.level(), bucket.rate) for name, bucket in self._buckets.items()}
+
+
+class _Waiter:
+    __slots__ = ("priority", "sequence", "tokens", "future")
+
+    def __init__(self, priority: int, sequence: int, tokens: int, future: asyncio.Future):
+        self.priority = priority
+        self.sequence = sequence
+        self.tokens = tokens
+        self.future = future
+
+    def __lt__(self, other: "_Waiter") -> bool:
+        return (self.priority, self.sequence) < (other.priority, other.sequence)
+
+
+class AdmissionController:
+    """
+    Admits upstream calls against RPM/TPM token buckets with a bounded
+    priority wait queue.
+
+    The buckets are local to the process unless ``buckets`` is given, e.g.
+    buckets shared between worker processes through a SharedState.
+
+    Attributes:
+        max_queue (int): Waiters allowed before new requests are rejected.
+        max_wait (float): Longest expected wait before a request is rejected.
+    """
+
+    def __init__(
+        self,
+        requests_per_minute: int = 0,
+        tokens_per_minute: int = 0,
+        max_queue: int = 256,
+        max_wait: float = 30.0,
+        buckets=None
+    ):
+        if buckets is None:
+            buckets = LocalBuckets(admission_limits(requests_per_minute, tokens_per_minute))
+        self.buckets = buckets
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+
+        self.admitted = 0
+        self.rejected = 0
+        self.queued_total = 0
+        self._queue: List[_Waiter] = []
+        self._sequence = itertools.count()
+        self._dispatcher: Optional[asyncio.Task] = None
+
+    @classmethod
+    def from_settings(cls, settings, state=None) -> "AdmissionController":
+        """Build the controller, taking its buckets from ``state`` (a SharedState) when given."""
+        limits = admission_limits(settings.RATE_LIMIT_RPM, settings.RATE_LIMIT_TPM)
+        return cls(
+            max_queue=settings.ADMISSION_MAX_QUEUE,
+            max_wait=settings.ADMISSION_MAX_WAIT_SECONDS,
+            buckets=state.buckets("admission", limits) if state is not None else LocalBuckets(limits),
+        )
+
+    @staticmethod
+    def _amounts(tokens: int) -> Dict[str, float]:
+        return {"requests": 1, "tokens": tokens}
+
+    def _expected_wait(self, tokens: int, ahead: List[_Waiter]) -> float:
+        """Estimate how long a new request waits behind the given queued requests."""
+        wait = 0.0
+        for name, (available, rate) in self.buckets.levels().items():
+            if name == "requests":
+                wait = max(wait, (len(ahead) + 1) / rate)
+            else:
+                queued = sum(w.tokens for w in ahead) + tokens
+                wait = max(wait, (queued - available) / rate)
+        return wait
+
+    async def admit(self, estimated_tokens: int, priority: Priority = Priority.NORMAL) -> None:
+        """Wait until the request may be sent upstream, or raise AdmissionRejectedError."""
+        if not self.buckets:
+            self.admitted += 1
+            return
+
+        if not self._queue and await self.buckets.acquire(self._amounts(estimated_tokens)) == 0:
+            self.admitted += 1
+            return
+
+        ahead = [w for w in self._queue if w.priority <= priority]
+        expected = self._expected_wait(estimated_tokens, ahead)
+        if expected > self.max_wait:
+            self.rejected += 1
+            raise AdmissionRejectedError(expected, "expected queue wait exceeds limit")
+
+        if len(self._queue) >= self.max_queue:
+            # A full queue sheds its lowest-priority waiter for a more urgent request.
+            worst = max(self._queue)
+            if worst.priority <= priority:
+                self.rejected += 1
+                raise AdmissionRejectedError(expected, "admission queue is full")
+            self._queue.remove(worst)
+            heapq.heapify(self._queue)
+            self.rejected += 1
+            worst.future.set_exception(
+                AdmissionRejectedError(self._expected_wait(worst.tokens, self._queue), "preempted by higher priority work")
+            )
+
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._queue, _Waiter(priority, next(self._sequence), estimated_tokens, future))
+        self.queued_total += 1
+        if self._dispatcher is None or self._dispatcher.done():
+            self._dispatcher = asyncio.create_task(self._dispatch())
+        await future
+        self.admitted += 1
+
+    async def try_admit(self, estimated_tokens: int) -> bool:
+        """Admit a request only if the buckets have room now and nobody is queued; never waits."""
+        if not self.buckets:
+            self.admitted += 1
+            return True
+        if self._queue or await self.buckets.acquire(self._amounts(estimated_tokens)) > 0:
+            return False
+        self.admitted += 1
+        return True
+
+    async def _dispatch(self) -> None:
+        """Release queued requests in priority order as bucket tokens refill."""
+        while self._queue:
+            head = self._queue[0]
+            if head.future.done():
+                heapq.heappop(self._queue)
+                continue
+            wait = await self.buckets.acquire(self._amounts(head.tokens))
+            if wait > 0:
+                await asyncio.sleep(wait)
+                continue
+            # Shared buckets are acquired over the network; a more urgent
+            # waiter may have been queued meanwhile, so remove this one by identity.
+            if self._queue and self._queue[0] is head:
+                heapq.heappop(self._queue)
+            elif head in self._queue:
+                self._queue.remove(head)
+                heapq.heapify(self._queue)
+            if not head.future.done():
+                head.future.set_result(None)
+
+    def stats(self) -> dict:
+        stats = {
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "queued_total": self.queued_total,
+            "queue_depth": len(self._queue),
+        }
+        for name, (available, _) in self.buckets.levels().items():
+            stats[f"{name}_available"] = round(available, 1)
+        return stats
@@ -0,0 +1,547 @@
+"""
+Generation backends for AIService.
+
+A backend turns a prompt (a RenderedPrompt or a plain string) into a
+response object exposing ``text`` and ``usage_metadata``
+(``prompt_token_count`` / ``candidates_token_count``), in sync, async and
+streaming variants. ``MODEL_BACKEND`` selects the implementation:
+
+- ``gemini``: the Google Generative AI SDK, loaded lazily
+- ``fake``: an in-process simulator with configurable latency, token
+  throughput, error rate and malformed JSON, for load tests and benchmarks
+  that must not depend on a live API key or the network
+"""
+
+import asyncio
+import json
+import logging
+import math
+import random
+import re
+import threading
+import time
+from abc import ABC, abstractmethod
+from typing import AsyncIterator, Callable, Dict, Iterator, List, NamedTuple, Optional
+
+from app.services.resilience import error_status
+from app.templates.prompts import RenderedPrompt, estimate_tokens, prompt_contents
+
+logger = logging.getLogger(__name__)
+
+# Statuses the API answers with for cached content that expired or was deleted
+CONTEXT_CACHE_REJECTED = {403, 404}
+# Cached content is recreated once this much of its TTL has passed
+CONTEXT_CACHE_REFRESH_FRACTION = 0.8
+
+
+class GenerationBackend(ABC):
+    """
+    Interface every generation backend implements.
+
+    ``supports_async`` tells AIService whether the async methods are native;
+    when False it runs the sync methods on its bounded thread pool instead.
+    """
+
+    name = "base"
+    supports_async = True
+
+    def load(self) -> None:
+        """Create clients or connections; called once at startup. Must be idempotent."""
+
+    async def warmup(self) -> None:
+        """Open connections and make a minimal request so the first real call does not pay for setup."""
+
+    async def close(self) -> None:
+        """Release connections at shutdown."""
+
+    @abstractmethod
+    def generate(self, prompt, **kwargs):
+        """Generate a complete response, blocking the calling thread."""
+
+    @abstractmethod
+    async def generate_async(self, prompt, **kwargs):
+        """Generate a complete response without blocking the event loop."""
+
+    @abstractmethod
+    def stream(self, prompt, **kwargs) -> Iterator:
+        """Return an iterator of response chunks, each exposing ``text``."""
+
+    @abstractmethod
+    async def stream_async(self, prompt, **kwargs) -> AsyncIterator:
+        """Open a stream and return an async iterator of response chunks."""
+
+
+class ModelBackend(GenerationBackend):
+    """
+    Adapter for SDK-style model objects exposing ``generate_content`` and,
+    optionally, ``generate_content_async``.
+
+    Prompts whose static prefix is held in a model-side context cache are
+    sent to the matching cached-content model with only their body. If the
+    API rejects the cached content (e.g. it expired or was deleted), the
+    cache is dropped and the call is repeated with the prefix inline.
+    """
+
+    name = "model"
+
+    def __init__(self, model=None):
+        self._model = model
+        self._context_models: Dict[str, object] = {}
+
+    @property
+    def model(self):
+        if self._model is None:
+            self.load()
+        return self._model
+
+    @property
+    def supports_async(self) -> bool:
+        return hasattr(self.model, "generate_content_async")
+
+    def _context_model(self, name: str):
+        return self._context_models.get(name)
+
+    def _resolve(self, prompt):
+        if isinstance(prompt, RenderedPrompt):
+            context_model = self._context_model(prompt.name)
+            if context_model is not None:
+                return context_model, prompt.body
+        return self.model, prompt_contents(prompt)
+
+    def _context_rejected(self, prompt, contents, error: Exception) -> bool:
+        """
+        Forget a prompt's context cache after the API rejected a call that
+        used it; True when the call should be repeated with the prefix inline.
+        """
+        if not isinstance(prompt, RenderedPrompt) or contents is not prompt.body:
+            return False
+        if error_status(error) not in CONTEXT_CACHE_REJECTED:
+            return False
+        self._context_models.pop(prompt.name, None)
+        logger.warning("Context cache for prompt '%s' rejected, sending its prefix inline: %s", prompt.name, error)
+        return True
+
+    def generate(self, prompt, **kwargs):
+        model, contents = self._resolve(prompt)
+        try:
+            return model.generate_content(contents, **kwargs)
+        except Exception as e:
+            if not self._context_rejected(prompt, contents, e):
+                raise
+        model, contents = self._resolve(prompt)
+        return model.generate_content(contents, **kwargs)
+
+    async def generate_async(self, prompt, **kwargs):
+        model, contents = self._resolve(prompt)
+        try:
+            return await model.generate_content_async(contents, **kwargs)
+        except Exception as e:
+            if not self._context_rejected(prompt, contents, e):
+                raise
+        model, contents = self._resolve(prompt)
+        return await model.generate_content_async(contents, **kwargs)
+
+    def stream(self, prompt, **kwargs) -> Iterator:
+        model, contents = self._resolve(prompt)
+        try:
+            return iter(model.generate_content(contents, stream=True, **kwargs))
+        except Exception as e:
+            if not self._context_rejected(prompt, contents, e):
+                raise
+        model, contents = self._resolve(prompt)
+        return iter(model.generate_content(contents, stream=True, **kwargs))
+
+    async def stream_async(self, prompt, **kwargs) -> AsyncIterator:
+        model, contents = self._resolve(prompt)
+        try:
+            return await model.generate_content_async(contents, stream=True, **kwargs)
+        except Exception as e:
+            if not self._context_rejected(prompt, contents, e):
+                raise
+        model, contents = self._resolve(prompt)
+        return await model.generate_content_async(contents, stream=True, **kwargs)
+
+
+class _ContextCache(NamedTuple):
+    """Models bound to one prompt's cached content, and when it is refreshed and expires."""
+    models: List
+    refresh_at: float
+    expires_at: float
+
+
+class GeminiBackend(ModelBackend):
+    """
+    Google Gemini through the google-generativeai SDK, imported on load().
+
+    With UPSTREAM_POOL_SIZE > 0 the backend owns its async transport: a pool
+    of gRPC channels, each its own HTTP/2 connection with keep-alive pings,
+    that calls are spread over round-robin. Otherwise the SDK's default
+    client is used.
+
+    With PROMPT_CONTEXT_CACHE, prefixes of at least
+    PROMPT_CONTEXT_CACHE_MIN_TOKENS (estimated) are uploaded as cached
+    content, used through the same channel pool, and recreated in the
+    background once 80% of their TTL has passed. Until a replacement is up,
+    and after the old one expires, the prefix is sent inline.
+    """
+
+    name = "gemini"
+
+    def __init__(self, settings, model_name: Optional[str] = None):
+        super().__init__()
+        self.settings = settings
+        self.model_name = model_name or settings.MODEL_NAME
+        self._channels: List = []
+        self._clients: List = []
+        self._pool: List = []
+        self._next = 0
+        self._genai = None
+        self._refreshing = set()
+        self._refresh_lock = threading.Lock()
+
+    def load(self) -> None:
+        if self._model is not None:
+            return
+
+        import google.generativeai as genai
+
+        genai.configure(api_key=self.settings.GOOGLE_API_KEY)
+        self._genai = genai
+        self._model = genai.GenerativeModel(self.model_name)
+        if self.settings.UPSTREAM_POOL_SIZE > 0:
+            self._create_pool()
+        if self.settings.PROMPT_CONTEXT_CACHE:
+            self._create_context_caches()
+
+    def _channel_options(self) -> list:
+        keepalive_ms = int(self.settings.UPSTREAM_KEEPALIVE_SECONDS * 1000)
+        return [
+            # A subchannel per channel, so each channel is its own connection
+            ("grpc.use_local_subchannel_pool", 1),
+            ("grpc.keepalive_time_ms", keepalive_ms),
+            ("grpc.keepalive_timeout_ms", min(keepalive_ms, 20000)),
+            ("grpc.keepalive_permit_without_calls", 1),
+            ("grpc.http2.max_pings_without_data", 0),
+            # gRPC core also uses this as the minimum connect timeout
+            ("grpc.min_reconnect_backoff_ms", int(self.settings.UPSTREAM_CONNECT_TIMEOUT_SECONDS * 1000)),
+        ]
+
+    def _create_pool(self) -> None:
+        """One client per pooled channel; must run on the event loop that will use it."""
+        from google.ai import generativelanguage as glm
+        from google.auth import api_key
+
+        credentials = api_key.Credentials(self.settings.GOOGLE_API_KEY)
+        transport_class = glm.GenerativeServiceAsyncClient.get_transport_class("grpc_asyncio")
+        for _ in range(self.settings.UPSTREAM_POOL_SIZE):
+            channel = transport_class.create_channel(credentials=credentials, options=self._channel_options())
+            self._channels.append(channel)
+            self._clients.append(glm.GenerativeServiceAsyncClient(transport=transport_class(channel=channel)))
+        self._pool = self._on_channels(lambda: self._genai.GenerativeModel(self.model_name))
+        logger.info("Upstream pool for %s: %d channels", self.model_name, len(self._pool))
+
+    def _on_channels(self, create_model: Callable[[], object]) -> List:
+        """A model from ``create_model`` for each pooled channel, or a single one without a pool."""
+        if not self._clients:
+            return [create_model()]
+        models = []
+        for client in self._clients:
+            model = create_model()
+            # The SDK only takes a transport name; give the model its own
+            # client bound to this channel instead
+            model._async_client = client
+            models.append(model)
+        return models
+
+    def _round_robin(self, models: List):
+        model = models[self._next % len(models)]
+        self._next += 1
+        return model
+
+    def _context_model(self, name: str):
+        entry = self._context_models.get(name)
+        if entry is None:
+            return None
+        now = time.time()
+        if now >= entry.refresh_at:
+            self._refresh_context_cache(name)
+        if now >= entry.expires_at:
+            return None
+        return self._round_robin(entry.models)
+
+    def _resolve(self, prompt):
+        model, contents = super()._resolve(prompt)
+        if model is self._model and self._pool:
+            model = self._round_robin(self._pool)
+        return model, contents
+
+    async def warmup(self) -> None:
+        """Connect every pooled channel, then count the tokens of a one-word prompt on each."""
+        self.load()
+        timeout = self.settings.UPSTREAM_CONNECT_TIMEOUT_SECONDS
+        await asyncio.gather(*(asyncio.wait_for(channel.channel_ready(), timeout) for channel in self._channels))
+        await asyncio.gather(*(model.count_tokens_async("ping") for model in self._pool or [self._model]))
+
+    async def close(self) -> None:
+        await asyncio.gather(*(channel.close() for channel in self._channels), return_exceptions=True)
+        self._channels, self._clients, self._pool = [], [], []
+        self._context_models.clear()
+
+    def _create_context_caches(self) -> None:
+        """
+        Upload each large enough static prefix as cached content so requests
+        only send their per-request body. Smaller prefixes, and those the API
+        refuses to cache, keep being sent inline.
+        """
+        from app.templates.prompts import PROMPTS
+
+        minimum = self.settings.PROMPT_CONTEXT_CACHE_MIN_TOKENS
+        eligible = [template for template in PROMPTS if template.prefix_tokens >= minimum]
+        if not eligible:
+            logger.warning(
+                "PROMPT_CONTEXT_CACHE is on, but no prompt prefix reaches PROMPT_CONTEXT_CACHE_MIN_TOKENS=%d "
+                "(largest is ~%d tokens); all prefixes are sent inline",
+                minimum, max((template.prefix_tokens for template in PROMPTS), default=0)
+            )
+        for template in eligible:
+            self._create_context_cache(template)
+
+    def _create_context_cache(self, template) -> None:
+        from datetime import timedelta
+        from google.generativeai import caching
+
+        ttl = self.settings.PROMPT_CONTEXT_CACHE_TTL_SECONDS
+        try:
+            created = time.time()
+            cached = caching.CachedContent.create(
+                model=self.model_name,
+                display_name=f"telegence-{template.name}-{template.fingerprint}",
+                system_instruction=template.prefix,
+                ttl=timedelta(seconds=ttl),
+            )
+            models = self._on_channels(lambda: self._genai.GenerativeModel.from_cached_content(cached))
+            self._context_models[template.name] = _ContextCache(
+                models, created + ttl * CONTEXT_CACHE_REFRESH_FRACTION, created + ttl
+            )
+            logger.info("Context cache created for prompt '%s'", template.name)
+        except Exception as e:
+            logger.warning("Context cache unavailable for prompt '%s': %s", template.name, e)
+
+    def _refresh_context_cache(self, name: str) -> None:
+        """Recreate a prompt's cached content in a background thread, once at a time."""
+        from app.templates.prompts import PROMPTS
+
+        with self._refresh_lock:
+            if name in self._refreshing:
+                return
+            self._refreshing.add(name)
+
+        def refresh():
+            try:
+                self._create_context_cache(PROMPTS.get(name))
+            finally:
+                with self._refresh_lock:
+                    self._refreshing.discard(name)
+
+        threading.Thread(target=refresh, name=f"context-cache-{name}", daemon=True).start()
+
+
+# The sender's name line of the write_message prompt body
+_SENDER_NAME = re.compile(r"Sender's Name: (.*?) \(if provided\)")
+
+
+class FakeUsage:
+    __slots__ = ("prompt_token_count", "candidates_token_count", "total_token_count")
+
+    def __init__(self, prompt_tokens: int, response_tokens: int):
+        self.prompt_token_count = prompt_tokens
+        self.candidates_token_count = response_tokens
+        self.total_token_count = prompt_tokens + response_tokens
+
+
+class FakeResponse:
+    __slots__ = ("text", "usage_metadata")
+
+    def __init__(self, text: str, usage_metadata: Optional[FakeUsage] = None):
+        self.text = text
+        self.usage_metadata = usage_metadata
+
+
+class FakeUpstreamError(Exception):
+    """Simulated upstream failure; ``code`` makes it look like an API error."""
+
+    def __init__(self, code: int = 503, message: str = "Simulated upstream error"):
+        super().__init__(f"{code} {message}")
+        self.code = code
+
+
+class FakeBackend(GenerationBackend):
+    """
+    Deterministic in-process stand-in for a hosted model.
+
+    Time to first token follows a log-normal distribution around
+    ``latency_ms`` (spread ``latency_sigma``); the reply is then produced at
+    ``tokens_per_second``. ``slow_rate`` of calls stall for
+    ``slow_multiplier`` times as long, giving the heavy tail of a hosted
+    model. With ``prefill_tokens_per_second`` set, the first token also
+    waits for the prompt to be read, so longer prompts answer later.
+    ``error_rate`` of calls fail with a retryable 503 and
+    ``malformed_json_rate`` of JSON replies come back wrapped in prose or
+    truncated. With ``seed`` set, the sequence of outcomes is reproducible.
+
+    Attributes:
+        latency_ms (float): Median time to first token in milliseconds.
+        latency_sigma (float): Log-normal shape; 0 gives a constant latency.
+        tokens_per_second (float): Output throughput once generation starts.
+        output_tokens (int): Approximate length of each reply in tokens.
+        error_rate (float): Fraction of calls raising FakeUpstreamError.
+        malformed_json_rate (float): Fraction of JSON replies that are malformed.
+        slow_rate (float): Fraction of calls with a stalled first token.
+        slow_multiplier (float): How many times longer a stalled call waits.
+        prefill_tokens_per_second (float): Prompt read throughput; 0 ignores prompt length.
+    """
+
+    name = "fake"
+
+    def __init__(
+        self,
+        latency_ms: float = 800.0,
+        latency_sigma: float = 0.5,
+        tokens_per_second: float = 150.0,
+        output_tokens: int = 120,
+        error_rate: float = 0.0,
+        malformed_json_rate: float = 0.0,
+        slow_rate: float = 0.0,
+        slow_multiplier: float = 10.0,
+        prefill_tokens_per_second: float = 0.0,
+        seed: Optional[int] = None
+    ):
+        self.latency_ms = latency_ms
+        self.latency_sigma = latency_sigma
+        self.tokens_per_second = tokens_per_second
+        self.output_tokens = output_tokens
+        self.error_rate = error_rate
+        self.malformed_json_rate = malformed_json_rate
+        self.slow_rate = slow_rate
+        self.slow_multiplier = slow_multiplier
+        self.prefill_tokens_per_second = prefill_tokens_per_second
+        self._random = random.Random(seed)
+        self.calls = 0
+
+    @classmethod
+    def from_settings(cls, settings) -> "FakeBackend":
+        return cls(
+            latency_ms=settings.FAKE_LATENCY_MS,
+            latency_sigma=settings.FAKE_LATENCY_SIGMA,
+            tokens_per_second=settings.FAKE_TOKENS_PER_SECOND,
+            output_tokens=settings.FAKE_OUTPUT_TOKENS,
+            error_rate=settings.FAKE_ERROR_RATE,
+            malformed_json_rate=settings.FAKE_MALFORMED_JSON_RATE,
+            slow_rate=settings.FAKE_SLOW_RATE,
+            slow_multiplier=settings.FAKE_SLOW_MULTIPLIER,
+            prefill_tokens_per_second=settings.FAKE_PREFILL_TOKENS_PER_SECOND,
+            seed=settings.FAKE_SEED,
+        )
+
+    def _plan(self, prompt, kwargs) -> tuple:
+        """Draw this call's outcome: (first-token delay, reply text, usage, error)."""
+        self.calls += 1
+        delay = self.latency_ms / 1000.0
+        if self.latency_sigma > 0:
+            delay *= math.exp(self._random.gauss(0, self.latency_sigma))
+        if self.slow_rate > 0 and self._random.random() < self.slow_rate:
+            delay *= self.slow_multiplier
+        prompt_tokens = estimate_tokens(str(prompt))
+        if self.prefill_tokens_per_second > 0:
+            delay += prompt_tokens / self.prefill_tokens_per_second
+        if self._random.random() < self.error_rate:
+            return delay, None, None, FakeUpstreamError()
+
+        words = ["lorem", "ipsum", "dolor", "sit", "amet", "consectetur", "adipiscing", "elit"]
+        body = " ".join(self._random.choice(words) for _ in range(self.output_tokens))
+        if self._wants_json(prompt, kwargs):
+            # Sign off with the sender's name, as the write_message prompt asks
+            sender = _SENDER_NAME.search(getattr(prompt, "body", ""))
+            if sender and sender.group(1) != "None":
+                body += f"\n\nBest regards,\n{sender.group(1)}"
+            text = json.dumps({"subject": "Re: " + " ".join(body.split()[:4]), "body": body})
+            if self._random.random() < self.malformed_json_rate:
+                text = self._random.choice([
+                    f"Sure, here is the email:\n```json\n{text}\n```",
+                    text[: len(text) // 2],
+                ])
+        else:
+            text = body
+
+        usage = FakeUsage(prompt_tokens, self.output_tokens)
+        return delay, text, usage, None
+
+    @staticmethod
+    def _wants_json(prompt, kwargs) -> bool:
+        config = kwargs.get("generation_config") or {}
+        if config.get("response_mime_type") == "application/json":
+            return True
+        return isinstance(prompt, RenderedPrompt) and prompt.operation in ("write_message", "json_repair")
+
+    def _chunks(self, text: str, size: int = 8):
+        words = text.split(" ")
+        for start in range(0, len(words), size):
+            piece = " ".join(words[start:start + size])
+            yield piece if start == 0 else " " + piece
+
+    def _generation_time(self, usage: FakeUsage) -> float:
+        return usage.candidates_token_count / self.tokens_per_second if self.tokens_per_second > 0 else 0.0
+
+    def generate(self, prompt, **kwargs):
+        delay, text, usage, error = self._plan(prompt, kwargs)
+        time.sleep(delay)
+        if error is not None:
+            raise error
+        time.sleep(self._generation_time(usage))
+        return FakeResponse(text, usage)
+
+    async def generate_async(self, prompt, **kwargs):
+        delay, text, usage, error = self._plan(prompt, kwargs)
+        await asyncio.sleep(delay)
+        if error is not None:
+            raise error
+        await asyncio.sleep(self._generation_time(usage))
+        return FakeResponse(text, usage)
+
+    def stream(self, prompt, **kwargs) -> Iterator:
+        delay, text, usage, error = self._plan(prompt, kwargs)
+        time.sleep(delay)
+        if error is not None:
+            raise error
+        return self._iter_chunks(text, usage)
+
+    def _iter_chunks(self, text: str, usage: FakeUsage) -> Iterator:
+        chunks = list(self._chunks(text))
+        pause = self._generation_time(usage) / max(1, len(chunks))
+        for index, chunk in enumerate(chunks):
+            time.sleep(pause)
+            yield FakeResponse(chunk, usage if index == len(chunks) - 1 else None)
+
+    async def stream_async(self, prompt, **kwargs) -> AsyncIterator:
+        delay, text, usage, error = self._plan(prompt, kwargs)
+        await asyncio.sleep(delay)
+        if error is not None:
+            raise error
+        return self._aiter_chunks(text, usage)
+
+    async def _aiter_chunks(self, text: str, usage: FakeUsage) -> AsyncIterator:
+        chunks = list(self._chunks(text))
+        pause = self._generation_time(usage) / max(1, len(chunks))
+        for index, chunk in enumerate(chunks):
+            await asyncio.sleep(pause)
+            yield FakeResponse(chunk, usage if index == len(chunks) - 1 else None)
+
+
+def create_backend(settings, model_name: Optional[str] = None) -> GenerationBackend:
+    """Build the backend selected by ``MODEL_BACKEND`` for ``model_name`` (default MODEL_NAME)."""
+    backend = settings.MODEL_BACKEND.lower()
+    if backend == "gemini":
+        return GeminiBackend(settings, model_name)
+    if backend == "fake":
+        return FakeBackend.from_settings(settings)
+    raise ValueError(f"Unknown MODEL_BACKEND: {settings.MODEL_BACKEND}")
@@ -0,0 +1,81 @@
+"""
+Bounded parallel fan-out for batch generation.
+
+Items are pulled lazily from any iterable and at most ``concurrency`` of them
+are in flight at once, so the same helper serves both HTTP batch endpoints and
+offline processing of large request files.
+"""
+
+import asyncio
+from typing import Any, AsyncIterator, Awaitable, Callable, Iterable, NamedTuple, Optional
+
+from fastapi import HTTPException
+
+
+def error_status(error: Exception) -> int:
+    """HTTP-style status for an error raised while handling one request."""
+    if isinstance(error, HTTPException):
+        return error.status_code
+    # Malformed or invalid input items (JSON and pydantic errors)
+    if isinstance(error, ValueError):
+        return 422
+    return 500
+
+
+def error_detail(error: Exception) -> str:
+    if isinstance(error, HTTPException):
+        return str(error.detail)
+    return str(error)
+
+
+class BatchResult(NamedTuple):
+    index: int
+    value: Any = None
+    error: Optional[Exception] = None
+
+    @property
+    def status_code(self) -> int:
+        return 200 if self.error is None else error_status(self.error)
+
+    @property
+    def detail(self) -> Optional[str]:
+        return None if self.error is None else error_detail(self.error)
+
+
+async def _run_item(handler: Callable[[Any], Awaitable[Any]], index: int, item: Any) -> BatchResult:
+    # Errors are captured per item so one failure never aborts the batch.
+    try:
+        return BatchResult(index, await handler(item))
+    except Exception as e:
+        return BatchResult(index, error=e)
+
+
+async def run_batch(
+    items: Iterable[Any],
+    handler: Callable[[Any], Awaitable[Any]],
+    concurrency: int
+) -> AsyncIterator[BatchResult]:
+    """
+    Run ``handler`` over ``items`` with bounded concurrency, yielding results
+    in completion order. Use ``BatchResult.index`` to restore input order.
+    """
+    iterator = enumerate(items)
+    pending = set()
+    exhausted = False
+    try:
+        while True:
+            while not exhausted and len(pending) < concurrency:
+                try:
+                    index, item = next(iterator)
+                except StopIteration:
+                    exhausted = True
+                    break
+                pending.add(asyncio.create_task(_run_item(handler, index, item)))
+            if not pending:
+                return
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                yield task.result()
+    finally:
+        for task in pending:
+            task.cancel()
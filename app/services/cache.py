@@ -0,0 +1,191 @@
+"""
+Response caching for AIService.
+
+Model outputs are cached under a hash of the fully rendered prompt and the
+model name, so byte-identical requests skip the upstream round trip.
+Concurrent misses for the same key are coalesced into a single upstream call.
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+def make_cache_key(namespace: str, model_name: str, prompt: str) -> str:
+    """Build a stable cache key from the rendered prompt and model name."""
+    digest = hashlib.sha256(f"{model_name}\x00{prompt}".encode("utf-8")).hexdigest()
+    return f"telegence:{namespace}:{digest}"
+
+
+class CacheBackend:
+    """Interface for cache storage backends."""
+
+    async def get(self, key: str) -> Optional[Any]:
+        raise NotImplementedError
+
+    async def set(self, key: str, value: Any) -> None:
+        raise NotImplementedError
+
+
+class InMemoryCache(CacheBackend):
+    """
+    LRU cache with per-entry TTL and a bound on the number of entries.
+
+    Attributes:
+        max_entries (int): Entries kept before the least recently used is evicted.
+        ttl (float): Seconds an entry stays valid after being written.
+    """
+
+    def __init__(self, max_entries: int = 1024, ttl: float = 3600.0):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+
+    async def get(self, key: str) -> Optional[Any]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    async def set(self, key: str, value: Any) -> None:
+        self._entries[key] = (time.monotonic() + self.ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class RedisCache(CacheBackend):
+    """
+    Cache backed by any Redis-compatible server.
+
+    Requires the optional ``redis`` package. Values are stored as JSON with
+    the TTL enforced by the server.
+    """
+
+    def __init__(self, url: str, ttl: float = 3600.0):
+        try:
+            import redis.asyncio as redis
+        except ImportError as e:
+            raise ImportError("CACHE_BACKEND=redis requires the 'redis' package") from e
+        self.ttl = ttl
+        self._client = redis.from_url(url)
+
+    async def get(self, key: str) -> Optional[Any]:
+        raw = await self._client.get(key)
+        return json.loads(raw) if raw is not None else None
+
+    async def set(self, key: str, value: Any) -> None:
+        await self._client.set(key, json.dumps(value), ex=max(1, int(self.ttl)))
+
+
+class _LeaderCancelled(Exception):
+    """Set on an in-flight future when the caller running its factory is cancelled."""
+
+
+class ResponseCache:
+    """
+    Cache front-end with hit/miss counters and single-flight coalescing.
+
+    Only successful results are stored; failures propagate to every caller
+    waiting on the same key and are not cached. If the caller running the
+    upstream call is cancelled, one of the waiters runs it again instead.
+    """
+
+    def __init__(self, backend: CacheBackend):
+        self.backend = backend
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self._inflight: Dict[str, asyncio.Future] = {}
+
+    async def get(self, key: str) -> Optional[Any]:
+        """Look up a key, counting a hit or miss."""
+        value = await self._read(key)
+        if value is not None:
+            self.hits += 1
+        else:
+            self.misses += 1
+        return value
+
+    async def set(self, key: str, value: Any) -> None:
+        try:
+            await self.backend.set(key, value)
+        except Exception as e:
+            logger.warning("Cache write failed: %s", e)
+
+    async def get_or_set(self, key: str, factory: Callable[[], Awaitable[Any]]) -> Any:
+        while True:
+            value = await self._read(key)
+            if value is not None:
+                self.hits += 1
+                return value
+
+            inflight = self._inflight.get(key)
+            if inflight is None:
+                break
+            self.coalesced += 1
+            try:
+                return await asyncio.shield(inflight)
+            except _LeaderCancelled:
+                # The caller running the factory went away; the next waiter takes over
+                continue
+
+        self.misses += 1
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            value = await factory()
+        except asyncio.CancelledError:
+            # Cancelling the shared future would cancel every waiter with it
+            future.set_exception(_LeaderCancelled())
+            future.exception()
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            # Mark the exception as retrieved when nobody else was waiting.
+            future.exception()
+            raise
+        finally:
+            self._inflight.pop(key, None)
+
+        future.set_result(value)
+        await self.set(key, value)
+        return value
+
+    async def _read(self, key: str) -> Optional[Any]:
+        try:
+            return await self.backend.get(key)
+        except Exception as e:
+            logger.warning("Cache read failed, bypassing cache: %s", e)
+            return None
+
+    def stats(self) -> dict:
+        return {"hits": self.hits, "misses": self.misses, "coalesced": self.coalesced}
+
+
+def create_response_cache(settings) -> Optional[ResponseCache]:
+    """Build the response cache configured in settings, or None when disabled."""
+    backend_name = settings.CACHE_BACKEND.lower()
+    if backend_name == "none":
+        return None
+    if backend_name == "redis":
+        if not settings.REDIS_URL:
+            raise ValueError("CACHE_BACKEND=redis requires REDIS_URL")
+        return ResponseCache(RedisCache(settings.REDIS_URL, ttl=settings.CACHE_TTL_SECONDS))
+    if backend_name == "memory":
+        return ResponseCache(InMemoryCache(settings.CACHE_MAX_ENTRIES, settings.CACHE_TTL_SECONDS))
+    raise ValueError(f"Unknown CACHE_BACKEND: {settings.CACHE_BACKEND}")
@@ -0,0 +1,135 @@
+"""
+Campaign mode for bulk /write_message sends.
+
+A campaign is one message sent to many recipients whose requests differ
+only in the sender fields (name and email address). Instead of one model
+call per recipient, a few drafts are generated with placeholders in place
+of those fields, checked to still contain the placeholders intact, and
+every recipient's email is rendered locally by plain string replacement.
+A campaign therefore costs a fixed number of model calls however many
+recipients it has. Recipients without a name get drafts generated without
+one, so no sign-off is left blank.
+"""
+
+import asyncio
+import logging
+import re
+from typing import Awaitable, Callable, Dict, List, NamedTuple, Optional
+
+from fastapi import HTTPException
+
+from app.models.model import EmailWriter
+
+logger = logging.getLogger(__name__)
+
+USER_NAME_PLACEHOLDER = "{user_name}"
+EMAIL_PLACEHOLDER = "{email}"
+DEFAULT_EMAIL = "user@example.com"
+
+NAMED = "named"
+ANONYMOUS = "anonymous"
+
+# Braces left once the known placeholders are removed mean one was mangled,
+# e.g. "{User Name}" or "{{user_name}}"
+_STRAY_BRACE = re.compile(r"[{}]")
+
+
+class CampaignResult(NamedTuple):
+    results: List[EmailWriter]
+    drafts: int
+
+
+def valid_draft(draft: dict, variant: str) -> bool:
+    """True if a draft's placeholders survived generation intact."""
+    text = f"{draft.get('subject', '')}\n{draft.get('body', '')}"
+    if variant == NAMED and USER_NAME_PLACEHOLDER not in draft.get("body", ""):
+        return False
+    if variant == ANONYMOUS and USER_NAME_PLACEHOLDER in text:
+        return False
+    stripped = text.replace(USER_NAME_PLACEHOLDER, "").replace(EMAIL_PLACEHOLDER, "")
+    return not _STRAY_BRACE.search(stripped)
+
+
+def personalize(draft: dict, email: Optional[str], user_name: Optional[str]) -> EmailWriter:
+    """Render a recipient's email from a validated draft."""
+    email = email or DEFAULT_EMAIL
+    name = user_name or ""
+    return EmailWriter(
+        email=email,
+        subject=draft["subject"].replace(USER_NAME_PLACEHOLDER, name).replace(EMAIL_PLACEHOLDER, email),
+        body=draft["body"].replace(USER_NAME_PLACEHOLDER, name).replace(EMAIL_PLACEHOLDER, email),
+        user_name=user_name,
+    )
+
+
+async def generate_drafts(
+    generate: Callable[..., Awaitable[dict]],
+    message_type: str,
+    user_message: str,
+    variant: str,
+    count: int,
+    attempts: int = 2,
+    use_cache: bool = True
+) -> List[dict]:
+    """
+    Generate up to ``count`` valid drafts for a variant concurrently,
+    regenerating an invalid draft up to ``attempts`` times in total. Only the
+    first attempt of the first draft may come from the response cache; the
+    rest are fresh generations so that drafts differ.
+    """
+    async def draft(index: int) -> Optional[dict]:
+        for attempt in range(attempts):
+            result = await generate(
+                message_type,
+                user_message,
+                EMAIL_PLACEHOLDER,
+                USER_NAME_PLACEHOLDER if variant == NAMED else None,
+                use_cache=use_cache and index == 0 and attempt == 0,
+            )
+            if valid_draft(result, variant):
+                return result
+            logger.warning("Campaign %s draft %d lost its placeholders (attempt %d)", variant, index + 1, attempt + 1)
+        return None
+
+    drafts = [result for result in await asyncio.gather(*(draft(index) for index in range(count))) if result]
+    if not drafts:
+        raise HTTPException(
+            status_code=502,
+            detail=f"Could not generate a {variant} campaign draft with intact placeholders",
+        )
+    return drafts
+
+
+async def run_campaign(
+    generate: Callable[..., Awaitable[dict]],
+    message_type: str,
+    user_message: str,
+    recipients: List[dict],
+    drafts: int = 1,
+    attempts: int = 2,
+    use_cache: bool = True
+) -> CampaignResult:
+    """
+    Personalize one message for every recipient (dicts with ``email`` and
+    ``user_name``) from ``drafts`` drafts per variant, assigned round-robin.
+    ``generate`` has the signature of ``AIService.generate_response``.
+    """
+    variants: Dict[str, List[int]] = {NAMED: [], ANONYMOUS: []}
+    for index, recipient in enumerate(recipients):
+        variants[NAMED if recipient.get("user_name") else ANONYMOUS].append(index)
+
+    active = {variant: indexes for variant, indexes in variants.items() if indexes}
+    generated = await asyncio.gather(*(
+        generate_drafts(
+            generate, message_type, user_message, variant, max(1, min(drafts, len(indexes))), attempts, use_cache
+        )
+        for variant, indexes in active.items()
+    ))
+
+    results: List[Optional[EmailWriter]] = [None] * len(recipients)
+    for indexes, variant_drafts in zip(active.values(), generated):
+        for position, index in enumerate(indexes):
+            recipient = recipients[index]
+            draft = variant_drafts[position % len(variant_drafts)]
+            results[index] = personalize(draft, recipient.get("email"), recipient.get("user_name"))
+    return CampaignResult(results, sum(len(variant_drafts) for variant_drafts in generated))
@@ -0,0 +1,150 @@
+"""
+Pre-generated greeting pool for /greet_user.
+
+Greetings only vary by whether a name is given, so instead of one model call
+per request the pool generates a set of varied templates in the background,
+refreshes them periodically, and answers requests by slotting the user's
+name into a random template. Requests the pool cannot serve (an unusual
+message, or a pool that is still empty) fall back to a live call.
+"""
+
+import asyncio
+import logging
+import random
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from app.templates.prompts import GREETING_TEMPLATE, RenderedPrompt
+
+logger = logging.getLogger(__name__)
+
+NAME_PLACEHOLDER = "{user_name}"
+
+NAMED = "named"
+ANONYMOUS = "anonymous"
+
+GREETING_STYLES = (
+    "warm and welcoming",
+    "upbeat and energetic",
+    "short and friendly",
+    "calm and professional",
+    "cheerful and playful",
+    "helpful and attentive",
+    "relaxed and casual",
+    "polite and gracious",
+)
+
+
+class GreetingPool:
+    """
+    Background-refreshed pool of greeting templates.
+
+    Attributes:
+        message (str): The greeting message the pool answers (others go live).
+        size (int): Templates generated per variant (named / anonymous).
+        refresh_interval (float): Seconds between background refreshes.
+    """
+
+    def __init__(
+        self,
+        generate: Callable[[RenderedPrompt], Awaitable[str]],
+        size: int = 8,
+        refresh_interval: float = 3600.0,
+        message: str = "Hello"
+    ):
+        self._generate = generate
+        self.size = size
+        self.refresh_interval = refresh_interval
+        self.message = message
+        self._templates: Dict[str, List[str]] = {NAMED: [], ANONYMOUS: []}
+        self._task: Optional[asyncio.Task] = None
+        self.hits = 0
+        self.misses = 0
+        self.refreshes = 0
+
+    @classmethod
+    def from_settings(cls, settings, generate) -> "GreetingPool":
+        return cls(
+            generate,
+            size=settings.GREETING_POOL_SIZE,
+            refresh_interval=settings.GREETING_POOL_REFRESH_SECONDS,
+        )
+
+    @property
+    def enabled(self) -> bool:
+        return self.size > 0
+
+    def get(self, message: str, user_name: Optional[str] = None) -> Optional[str]:
+        """A pooled greeting for this request, or None if it needs a live call."""
+        templates = self._templates[NAMED if user_name else ANONYMOUS]
+        if message != self.message or not templates:
+            self.misses += 1
+            return None
+        self.hits += 1
+        template = random.choice(templates)
+        return template.replace(NAME_PLACEHOLDER, user_name) if user_name else template
+
+    async def refresh(self) -> None:
+        """Generate a fresh set of templates, keeping the old ones if generation fails."""
+        for variant in (NAMED, ANONYMOUS):
+            placeholder = NAME_PLACEHOLDER if variant == NAMED else "none"
+            prompts = [
+                GREETING_TEMPLATE.render(
+                    style=GREETING_STYLES[index % len(GREETING_STYLES)],
+                    placeholder=placeholder,
+                    message=self.message,
+                )
+                for index in range(self.size)
+            ]
+            results = await asyncio.gather(*(self._generate(prompt) for prompt in prompts), return_exceptions=True)
+            texts = [result.strip().strip('"') for result in results if isinstance(result, str)]
+            templates = [text for text in texts if self._valid(text, variant)]
+            failed = sum(isinstance(result, BaseException) for result in results)
+            if failed:
+                logger.warning("Greeting pool: %d of %d %s generations failed", failed, self.size, variant)
+            if templates:
+                self._templates[variant] = templates
+        self.refreshes += 1
+        logger.info(
+            "Greeting pool refreshed: %d named, %d anonymous",
+            len(self._templates[NAMED]), len(self._templates[ANONYMOUS])
+        )
+
+    @staticmethod
+    def _valid(text: str, variant: str) -> bool:
+        if not text or "{" in text.replace(NAME_PLACEHOLDER, ""):
+            return False
+        placeholders = text.count(NAME_PLACEHOLDER)
+        return placeholders == 1 if variant == NAMED else placeholders == 0
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self.refresh()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error("Greeting pool refresh failed: %s", e)
+            await asyncio.sleep(self.refresh_interval)
+
+    def start(self) -> None:
+        """Start background refreshes on the running event loop."""
+        if self.enabled and (self._task is None or self._task.done()):
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self) -> dict:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "refreshes": self.refreshes,
+            "named_templates": len(self._templates[NAMED]),
+            "anonymous_templates": len(self._templates[ANONYMOUS]),
+        }
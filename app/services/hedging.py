@@ -0,0 +1,243 @@
+"""
+Hedged requests for upstream model calls.
+
+Most model calls finish close to the median, but a few stall for several
+times as long and set the p99. A hedged call waits until the call has been
+running for the ``percentile`` latency of recent calls of the same kind,
+then sends an identical second call and returns whichever finishes first,
+cancelling the other. Only the slowest few percent of calls are hedged, so
+the extra upstream cost is small; a hedge budget earned at ``max_rate`` per
+call caps it even when latency shifts faster than the histogram follows.
+A ``HedgeGate`` from the caller can veto each hedge (e.g. when rate limits
+or concurrency slots have no room), is told when the duplicate finishes,
+and is told when one copy won so the cancelled one can be accounted for.
+
+Latencies are kept per model and operation in a rolling log-bucketed
+histogram covering the last one to two ``window`` periods. Hedging starts
+once a kind of call has ``min_samples`` observations.
+"""
+
+import asyncio
+import logging
+import math
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class RollingHistogram:
+    """
+    Latency histogram over a sliding time window.
+
+    Buckets grow geometrically by ``growth`` from ``minimum`` seconds, so
+    quantiles are accurate to about that factor at any scale. Samples are
+    counted in the current window and the previous one; windows rotate
+    every ``window`` seconds.
+
+    Attributes:
+        window (float): Seconds per window.
+        minimum (float): Upper bound of the first bucket in seconds.
+        growth (float): Ratio between consecutive bucket bounds.
+    """
+
+    def __init__(self, window: float = 60.0, minimum: float = 0.001, growth: float = 1.1, buckets: int = 160):
+        self.window = window
+        self.minimum = minimum
+        self.growth = growth
+        self._log_growth = math.log(growth)
+        self._size = buckets
+        self._current = [0] * buckets
+        self._previous = [0] * buckets
+        self._count = 0
+        self._previous_count = 0
+        self._rotated = time.monotonic()
+
+    def _rotate(self) -> None:
+        now = time.monotonic()
+        if now - self._rotated < self.window:
+            return
+        # More than two windows without a rotation leaves nothing recent
+        self._previous = self._current if now - self._rotated < 2 * self.window else [0] * self._size
+        self._previous_count = sum(self._previous)
+        self._current = [0] * self._size
+        self._count = 0
+        self._rotated = now
+
+    def _bucket(self, value: float) -> int:
+        if value <= self.minimum:
+            return 0
+        return min(self._size - 1, int(math.log(value / self.minimum) / self._log_growth) + 1)
+
+    def observe(self, value: float) -> None:
+        self._rotate()
+        self._current[self._bucket(value)] += 1
+        self._count += 1
+
+    def count(self) -> int:
+        self._rotate()
+        return self._count + self._previous_count
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Upper bucket bound below which ``q`` of the samples fall, or None without samples."""
+        total = self.count()
+        if not total:
+            return None
+        rank = q * total
+        seen = 0
+        for index in range(self._size):
+            seen += self._current[index] + self._previous[index]
+            if seen >= rank:
+                return self.minimum * self.growth ** index
+        return self.minimum * self.growth ** (self._size - 1)
+
+
+class HedgeGate:
+    """Caller hooks around the duplicate of a hedged call; the defaults allow every hedge."""
+
+    async def admit(self) -> bool:
+        """Whether the duplicate may be sent now. Must not wait for capacity."""
+        return True
+
+    def release(self) -> None:
+        """The duplicate finished or was cancelled; called once for every admitted hedge."""
+
+    def lost(self) -> None:
+        """One copy returned a result and the other was cancelled before reporting its usage."""
+
+
+class Hedger:
+    """
+    Sends a second copy of slow calls and keeps the first reply.
+
+    Attributes:
+        percentile (float): Latency quantile after which a call is hedged.
+        max_rate (float): Hedges allowed per call, on average.
+        min_samples (int): Observations of a kind of call before it is hedged.
+        window (float): Seconds per rolling histogram window.
+    """
+
+    # Hedges that can be saved up while latency is normal
+    MAX_BUDGET = 10.0
+
+    def __init__(
+        self,
+        percentile: float = 0.95,
+        max_rate: float = 0.05,
+        min_samples: int = 50,
+        window: float = 60.0
+    ):
+        self.percentile = percentile
+        self.max_rate = max_rate
+        self.min_samples = min_samples
+        self.window = window
+        self._histograms: Dict[str, RollingHistogram] = {}
+        self._budget = 0.0
+        self.calls = 0
+        self.hedged = 0
+        self.hedge_wins = 0
+        self.budget_exhausted = 0
+        self.not_admitted = 0
+
+    @classmethod
+    def from_settings(cls, settings) -> Optional["Hedger"]:
+        """The configured hedger, or None when hedging is off."""
+        if not settings.HEDGE_REQUESTS:
+            return None
+        return cls(
+            percentile=settings.HEDGE_PERCENTILE,
+            max_rate=settings.HEDGE_MAX_RATE,
+            min_samples=settings.HEDGE_MIN_SAMPLES,
+            window=settings.HEDGE_WINDOW_SECONDS,
+        )
+
+    def histogram(self, key: str) -> RollingHistogram:
+        histogram = self._histograms.get(key)
+        if histogram is None:
+            histogram = self._histograms[key] = RollingHistogram(self.window)
+        return histogram
+
+    def delay(self, key: str) -> Optional[float]:
+        """Seconds after which a call of kind ``key`` is hedged, or None while too few samples exist."""
+        histogram = self.histogram(key)
+        if histogram.count() < self.min_samples:
+            return None
+        return histogram.quantile(self.percentile)
+
+    async def call(
+        self,
+        key: str,
+        operation: Callable[[], Awaitable[Any]],
+        gate: Optional[HedgeGate] = None
+    ) -> Any:
+        """
+        Run ``operation``, starting a second copy if the first is still
+        running after the hedge delay for ``key`` and ``gate`` (if given)
+        admits it. Returns the first successful result; an error is raised
+        only once both copies failed.
+        """
+        self.calls += 1
+        self._budget = min(self.MAX_BUDGET, self._budget + self.max_rate)
+        histogram = self.histogram(key)
+        delay = self.delay(key)
+        started = time.monotonic()
+        primary = asyncio.ensure_future(operation())
+        if delay is None:
+            result = await primary
+            histogram.observe(time.monotonic() - started)
+            return result
+
+        try:
+            done, _ = await asyncio.wait({primary}, timeout=delay)
+            hedging = not done
+            if hedging and self._budget < 1:
+                self.budget_exhausted += 1
+                hedging = False
+            if hedging and gate is not None and not await gate.admit():
+                self.not_admitted += 1
+                hedging = False
+            if not hedging:
+                result = await primary
+                histogram.observe(time.monotonic() - started)
+                return result
+        except BaseException:
+            primary.cancel()
+            raise
+
+        self._budget -= 1
+        self.hedged += 1
+        hedge_started = time.monotonic()
+        hedge = asyncio.ensure_future(operation())
+        if gate is not None:
+            # A done callback also runs for a task cancelled before it started
+            hedge.add_done_callback(lambda _: gate.release())
+        pending = {primary, hedge}
+        error: Optional[BaseException] = None
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is not None:
+                        error = error or task.exception()
+                        continue
+                    if task is hedge:
+                        self.hedge_wins += 1
+                        histogram.observe(time.monotonic() - hedge_started)
+                    # The slower copy is cancelled; its latency is at least this long
+                    histogram.observe(time.monotonic() - started)
+                    if pending and gate is not None:
+                        gate.lost()
+                    return task.result()
+            raise error
+        finally:
+            for task in pending:
+                task.cancel()
+
+    def stats(self) -> dict:
+        return {
+            "calls": self.calls,
+            "hedged": self.hedged,
+            "hedge_wins": self.hedge_wins,
+            "budget_exhausted": self.budget_exhausted,
+            "not_admitted": self.not_admitted,
+        }
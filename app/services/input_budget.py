@@ -0,0 +1,119 @@
+"""
+Token budgeting for user-supplied email threads.
+
+A pasted thread is mostly quoted history, signatures and legal footers,
+none of which the model needs to reply to the newest message.
+``fit_email`` keeps the text within a token budget by removing, in order:
+signatures and disclaimers, quoted earlier messages (oldest first), and
+finally the middle of whatever is still too long. Tokens are estimated
+locally and everything here runs before admission or any upstream call.
+"""
+
+import re
+from typing import List, NamedTuple, Tuple
+
+from app.templates.prompts import estimate_tokens
+
+SIGNATURE = "signature"
+HISTORY = "history"
+TRUNCATED = "truncated"
+
+# Lines that introduce a quoted earlier message: "On <date>, <name> wrote:",
+# "-----Original Message-----", an Outlook "From:/Sent:" header block, or
+# the first line of a ">" quoted block
+_REPLY_HEADER = re.compile(
+    r"^(?:On\s[^\n]{1,200}?wrote:[ \t]*$"
+    r"|-{2,}\s*(?:Original|Forwarded)\sMessage\s*-{2,}"
+    r"|From:[^\n]*\n(?:[^\n]*\n){0,3}?(?:Sent|Date):"
+    r"|>)",
+    re.IGNORECASE | re.MULTILINE,
+)
+_SIGNATURE_DELIMITER = re.compile(r"^-- ?$", re.MULTILINE)
+_SENT_FROM = re.compile(r"^Sent from my [^\n]*$\n?", re.IGNORECASE | re.MULTILINE)
+_DISCLAIMER = re.compile(
+    r"\b(?:confidential|privileged)\b.*\bintended\b|\breceived this (?:e-?mail|message) in error\b",
+    re.IGNORECASE | re.DOTALL,
+)
+
+
+class FittedText(NamedTuple):
+    text: str
+    trimmed: Tuple[str, ...] = ()
+
+
+def split_thread(email: str) -> Tuple[str, List[str]]:
+    """The newest message and the quoted earlier messages, newest first."""
+    starts = []
+    for match in _REPLY_HEADER.finditer(email):
+        # A ">" block is one quoted message, not one per line, and belongs to
+        # the "... wrote:" header right above it
+        if match.group().startswith(">") and starts and _continues_quote(email[starts[-1]:match.start()]):
+            continue
+        starts.append(match.start())
+    if not starts:
+        return email, []
+    bounds = starts + [len(email)]
+    return email[:starts[0]], [email[start:end] for start, end in zip(bounds, bounds[1:])]
+
+
+def _continues_quote(segment: str) -> bool:
+    lines = [line for line in segment.splitlines() if line.strip()]
+    return all(line.startswith(">") for line in lines[1:])
+
+
+def strip_signature(message: str) -> str:
+    """Remove a "-- " signature block, "Sent from my ..." lines and legal disclaimer paragraphs."""
+    delimiter = _SIGNATURE_DELIMITER.search(message)
+    if delimiter:
+        message = message[:delimiter.start()]
+    message = _SENT_FROM.sub("", message)
+    paragraphs = re.split(r"(\n\s*\n)", message)
+    kept = [part for part in paragraphs if not _DISCLAIMER.search(part)]
+    return "".join(kept).rstrip() + "\n" if kept else ""
+
+
+def truncate_middle(text: str, budget: int) -> str:
+    """Keep the start and end of ``text`` within about ``budget`` tokens."""
+    keep = max(0, budget * 4 - 40)
+    if len(text) <= keep:
+        return text
+    head = keep * 2 // 3
+    tail = keep - head
+    omitted = len(text) - head - tail
+    return f"{text[:head]}\n[... {omitted} characters omitted ...]\n{text[len(text) - tail:] if tail else ''}"
+
+
+def fit_email(email: str, budget: int) -> FittedText:
+    """
+    Fit an email thread into ``budget`` estimated tokens (0 disables).
+
+    Returns the text and which kinds of content were removed.
+    """
+    if not email or budget <= 0 or estimate_tokens(email) <= budget:
+        return FittedText(email)
+
+    trimmed = []
+    newest, history = split_thread(email)
+    stripped = [strip_signature(message) for message in [newest] + history]
+    if any(after.strip() != before.strip() for before, after in zip([newest] + history, stripped)):
+        trimmed.append(SIGNATURE)
+    newest, history = stripped[0], [message for message in stripped[1:] if message.strip()]
+
+    used = estimate_tokens(newest)
+    kept = []
+    for message in history:
+        cost = estimate_tokens(message)
+        if used + cost > budget:
+            break
+        kept.append(message)
+        used += cost
+    text = newest + "".join(kept)
+    omitted = len(history) - len(kept)
+    if omitted:
+        trimmed.append(HISTORY)
+        text += f"\n[{omitted} earlier quoted message{'s' if omitted != 1 else ''} omitted]\n"
+
+    if estimate_tokens(text) > budget:
+        trimmed.append(TRUNCATED)
+        text = truncate_middle(text, budget)
+    return FittedText(text, tuple(trimmed))
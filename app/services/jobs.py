@@ -0,0 +1,379 @@
+"""
+Submit/poll job queue for long-running generation requests.
+
+Instead of holding an HTTP connection open for the whole generation, a
+client submits a request, gets a job ID back immediately and either polls
+for the result or names a callback URL that receives the finished job.
+Jobs are executed by a pool of workers consuming from a pluggable queue:
+in memory (served by workers inside the API process) or on a
+Redis-compatible server, which lets separate worker processes
+(``python -m app.worker``) scale generation independently of the API tier.
+Job records, including results, expire after a TTL.
+
+Callback URLs must be http(s) and, unless an allowlist of hosts is
+configured, resolve only to public addresses, so a callback cannot be used
+to reach services on the server's own network. They are checked when the
+job is submitted and again before each delivery attempt, which connects to
+the address that was vetted (with the original Host header and TLS server
+name) rather than resolving the host a second time.
+"""
+
+import asyncio
+import ipaddress
+import json
+import logging
+import socket
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Collection, List, Optional, Tuple
+from urllib.parse import urlsplit, urlunsplit
+
+from app.logging_config import request_id_var
+from app.services.batch import error_detail, error_status
+from app.services.metrics import METRICS
+from app.services.tenants import DEFAULT_TENANT, tenant_var
+
+logger = logging.getLogger(__name__)
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+
+AI_JOBS = METRICS.counter(
+    "ai_jobs_total",
+    "Queued jobs by kind and final status",
+    ("kind", "status"),
+)
+
+
+async def check_callback_url(url: str, allowed_hosts: Collection[str] = ()) -> Optional[str]:
+    """
+    Raise ValueError unless ``url`` is an http(s) URL whose host is in
+    ``allowed_hosts`` or, with no allowlist, resolves only to public addresses.
+    Returns the vetted address to connect to (None for an allowlisted host).
+    """
+    parts = urlsplit(url)
+    if parts.scheme not in ("http", "https") or not parts.hostname:
+        raise ValueError("callback_url must be an http(s) URL")
+    host = parts.hostname.lower()
+    if allowed_hosts:
+        if host not in {allowed.lower() for allowed in allowed_hosts}:
+            raise ValueError(f"callback_url host {host} is not allowed")
+        return None
+
+    port = parts.port or (443 if parts.scheme == "https" else 80)
+    try:
+        addresses = await asyncio.get_running_loop().getaddrinfo(host, port, type=socket.SOCK_STREAM)
+    except socket.gaierror:
+        raise ValueError(f"callback_url host {host} does not resolve")
+    for *_, sockaddr in addresses:
+        address = ipaddress.ip_address(sockaddr[0].split("%", 1)[0])
+        if getattr(address, "ipv4_mapped", None) is not None:
+            address = address.ipv4_mapped
+        if not address.is_global or address.is_multicast:
+            raise ValueError(f"callback_url host {host} resolves to a non-public address")
+    return addresses[0][4][0]
+
+
+async def pinned_callback(url: str, allowed_hosts: Collection[str] = ()) -> Tuple[str, dict, dict]:
+    """
+    Vet ``url`` and return (URL, headers, request extensions) for an httpx
+    request that connects to the vetted address, so a second DNS lookup
+    cannot send it elsewhere. The Host header and TLS server name (used for
+    certificate checks) stay those of the original host.
+    """
+    address = await check_callback_url(url, allowed_hosts)
+    if address is None:
+        return url, {}, {}
+    parts = urlsplit(url)
+    pinned = f"[{address}]" if ":" in address else address
+    if parts.port is not None:
+        pinned = f"{pinned}:{parts.port}"
+    host = parts.netloc.rpartition("@")[2]
+    extensions = {"sni_hostname": parts.hostname} if parts.scheme == "https" else {}
+    return urlunsplit(parts._replace(netloc=pinned)), {"Host": host}, extensions
+
+
+def new_job(kind: str, request: dict, use_cache: bool = True, callback_url: Optional[str] = None) -> dict:
+    """Build the record for a freshly submitted job."""
+    return {
+        "job_id": uuid.uuid4().hex,
+        "kind": kind,
+        "status": QUEUED,
+        "request": request,
+        "use_cache": use_cache,
+        "callback_url": callback_url,
+        "request_id": request_id_var.get(),
+        "tenant": tenant_var.get(),
+        "created_at": time.time(),
+        "started_at": None,
+        "finished_at": None,
+        "status_code": None,
+        "result": None,
+        "error": None,
+        "callback_status": None,
+    }
+
+
+class JobQueue:
+    """Interface for job queues: a FIFO of job IDs plus a store of job records."""
+
+    async def submit(self, job: dict) -> None:
+        """Store a new job record and queue it for a worker."""
+        raise NotImplementedError
+
+    async def take(self, timeout: float) -> Optional[dict]:
+        """Next queued job, or None if none arrives within ``timeout`` seconds."""
+        raise NotImplementedError
+
+    async def get(self, job_id: str) -> Optional[dict]:
+        raise NotImplementedError
+
+    async def save(self, job: dict) -> None:
+        raise NotImplementedError
+
+    async def depth(self) -> int:
+        """Jobs waiting for a worker."""
+        raise NotImplementedError
+
+    async def close(self) -> None:
+        pass
+
+
+class InMemoryJobQueue(JobQueue):
+    """
+    Job queue local to one process, for workers running inside the API.
+
+    Attributes:
+        ttl (float): Seconds a job record is kept after it was last written.
+        max_entries (int): Records kept before the oldest are evicted.
+    """
+
+    def __init__(self, ttl: float = 86400.0, max_entries: int = 10000):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._queue: "asyncio.Queue[str]" = asyncio.Queue()
+        self._jobs: "OrderedDict[str, tuple]" = OrderedDict()
+
+    async def submit(self, job: dict) -> None:
+        await self.save(job)
+        self._queue.put_nowait(job["job_id"])
+
+    async def take(self, timeout: float) -> Optional[dict]:
+        try:
+            job_id = await asyncio.wait_for(self._queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+        # An evicted or expired job is skipped; the worker simply asks again
+        return await self.get(job_id)
+
+    async def get(self, job_id: str) -> Optional[dict]:
+        entry = self._jobs.get(job_id)
+        if entry is None:
+            return None
+        expires_at, job = entry
+        if expires_at < time.monotonic():
+            del self._jobs[job_id]
+            return None
+        return dict(job)
+
+    async def save(self, job: dict) -> None:
+        self._jobs[job["job_id"]] = (time.monotonic() + self.ttl, dict(job))
+        self._jobs.move_to_end(job["job_id"])
+        while len(self._jobs) > self.max_entries:
+            self._jobs.popitem(last=False)
+
+    async def depth(self) -> int:
+        return self._queue.qsize()
+
+
+class RedisJobQueue(JobQueue):
+    """
+    Job queue on any Redis-compatible server, shared by API and worker processes.
+
+    Requires the optional ``redis`` package. Job IDs are pushed to a list that
+    workers pop with a blocking call; records are stored as JSON with the TTL
+    enforced by the server.
+    """
+
+    def __init__(self, url: str, ttl: float = 86400.0, name: str = "telegence:jobs"):
+        try:
+            import redis.asyncio as redis
+        except ImportError as e:
+            raise ImportError("JOB_QUEUE_BACKEND=redis requires the 'redis' package") from e
+        self.ttl = ttl
+        self.name = name
+        self._client = redis.from_url(url)
+
+    def _key(self, job_id: str) -> str:
+        return f"{self.name}:{job_id}"
+
+    async def submit(self, job: dict) -> None:
+        await self.save(job)
+        await self._client.lpush(f"{self.name}:queue", job["job_id"])
+
+    async def take(self, timeout: float) -> Optional[dict]:
+        item = await self._client.brpop(f"{self.name}:queue", timeout=max(1, int(timeout)))
+        if item is None:
+            return None
+        _, job_id = item
+        return await self.get(job_id.decode() if isinstance(job_id, bytes) else job_id)
+
+    async def get(self, job_id: str) -> Optional[dict]:
+        raw = await self._client.get(self._key(job_id))
+        return json.loads(raw) if raw is not None else None
+
+    async def save(self, job: dict) -> None:
+        await self._client.set(self._key(job["job_id"]), json.dumps(job), ex=max(1, int(self.ttl)))
+
+    async def depth(self) -> int:
+        return await self._client.llen(f"{self.name}:queue")
+
+    async def close(self) -> None:
+        await self._client.aclose()
+
+
+def create_job_queue(settings) -> JobQueue:
+    """Build the job queue configured in settings."""
+    backend_name = settings.JOB_QUEUE_BACKEND.lower()
+    if backend_name == "redis":
+        if not settings.REDIS_URL:
+            raise ValueError("JOB_QUEUE_BACKEND=redis requires REDIS_URL")
+        return RedisJobQueue(settings.REDIS_URL, ttl=settings.JOB_TTL_SECONDS)
+    if backend_name == "memory":
+        return InMemoryJobQueue(settings.JOB_TTL_SECONDS, settings.JOB_MAX_ENTRIES)
+    raise ValueError(f"Unknown JOB_QUEUE_BACKEND: {settings.JOB_QUEUE_BACKEND}")
+
+
+class JobWorkerPool:
+    """
+    Workers that run queued jobs through ``handler`` and store the outcome.
+
+    A job that raises is stored as failed with the same status code and
+    detail the synchronous endpoint would have returned. When the job has a
+    callback URL, the finished record is POSTed to it, with retries.
+
+    Attributes:
+        concurrency (int): Jobs processed at once.
+        callback_timeout (float): Seconds allowed per callback attempt.
+        callback_retries (int): Extra callback attempts after a failure.
+        callback_allowed_hosts (List[str]): Hosts callbacks may go to; empty allows any public host.
+    """
+
+    def __init__(
+        self,
+        queue: JobQueue,
+        handler: Callable[[dict], Awaitable[Any]],
+        concurrency: int = 4,
+        callback_timeout: float = 10.0,
+        callback_retries: int = 3,
+        poll_interval: float = 1.0,
+        callback_allowed_hosts: Collection[str] = ()
+    ):
+        self.queue = queue
+        self.handler = handler
+        self.concurrency = concurrency
+        self.callback_timeout = callback_timeout
+        self.callback_retries = callback_retries
+        self.callback_allowed_hosts = list(callback_allowed_hosts)
+        self.poll_interval = poll_interval
+        self._tasks: List[asyncio.Task] = []
+        self._client = None
+        self._stopping = False
+
+    @classmethod
+    def from_settings(cls, settings, queue: JobQueue, handler, concurrency: Optional[int] = None) -> "JobWorkerPool":
+        return cls(
+            queue,
+            handler,
+            concurrency=settings.JOB_WORKERS if concurrency is None else concurrency,
+            callback_timeout=settings.JOB_CALLBACK_TIMEOUT_SECONDS,
+            callback_retries=settings.JOB_CALLBACK_RETRIES,
+            callback_allowed_hosts=settings.JOB_CALLBACK_ALLOWED_HOSTS,
+        )
+
+    async def run_job(self, job: dict) -> dict:
+        # Log under the ID of the request that submitted the job, and account
+        # its model calls to the submitting tenant
+        request_id_var.set(job.get("request_id") or job["job_id"])
+        tenant_var.set(job.get("tenant") or DEFAULT_TENANT)
+        job.update(status=RUNNING, started_at=time.time())
+        await self.queue.save(job)
+        try:
+            result = await self.handler(job)
+        except Exception as e:
+            job.update(status=FAILED, status_code=error_status(e), error=error_detail(e))
+            logger.error("Job %s failed: %s", job["job_id"], job["error"])
+        else:
+            job.update(status=SUCCEEDED, status_code=200, result=result)
+        job["finished_at"] = time.time()
+        AI_JOBS.inc(job["kind"], job["status"])
+        logger.info(
+            "Job %s %s in %.2fs", job["job_id"], job["status"], job["finished_at"] - job["started_at"]
+        )
+        if job.get("callback_url"):
+            job["callback_status"] = await self._deliver(job)
+        await self.queue.save(job)
+        return job
+
+    async def _deliver(self, job: dict) -> str:
+        """POST the finished job to its callback URL, retrying with backoff."""
+        if self._client is None:
+            import httpx
+            self._client = httpx.AsyncClient(timeout=self.callback_timeout)
+        for attempt in range(self.callback_retries + 1):
+            try:
+                # Vetted on every attempt: the host may resolve differently
+                # than at submission or on the previous attempt
+                url, headers, extensions = await pinned_callback(job["callback_url"], self.callback_allowed_hosts)
+            except ValueError as e:
+                logger.warning("Job %s callback rejected: %s", job["job_id"], e)
+                return "rejected"
+            try:
+                response = await self._client.post(url, json=job, headers=headers, extensions=extensions)
+                if response.status_code < 400:
+                    return "delivered"
+                logger.warning("Job %s callback returned %d", job["job_id"], response.status_code)
+            except Exception as e:
+                logger.warning("Job %s callback failed: %s", job["job_id"], e)
+            if attempt < self.callback_retries:
+                await asyncio.sleep(min(2 ** attempt, 30))
+        return "failed"
+
+    async def _work(self) -> None:
+        while not self._stopping:
+            try:
+                job = await self.queue.take(self.poll_interval)
+                if job is not None:
+                    await self.run_job(job)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error("Job worker error: %s", e)
+                await asyncio.sleep(self.poll_interval)
+
+    def start(self) -> None:
+        """Start the workers on the running event loop."""
+        if not self._tasks:
+            self._stopping = False
+            self._tasks = [asyncio.create_task(self._work()) for _ in range(self.concurrency)]
+
+    async def stop(self, timeout: float = 0.0) -> None:
+        """
+        Stop taking new jobs, give jobs already running up to ``timeout``
+        seconds to finish, then cancel the rest.
+        """
+        self._stopping = True
+        if self._tasks and timeout > 0:
+            _, pending = await asyncio.wait(self._tasks, timeout=timeout)
+            if pending:
+                logger.warning("Cancelling %d job workers still busy at shutdown", len(pending))
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
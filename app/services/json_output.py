@@ -0,0 +1,60 @@
+"""
+Tolerant parsing of JSON objects from model output.
+
+With schema-constrained output the model's reply is normally a bare JSON
+object, but older models, safety rewrites and prompt drift still produce
+Markdown fences, leading prose or trailing commentary. ``extract_json_object``
+recovers the first JSON object from such text without another model call.
+"""
+
+import json
+import re
+from typing import Iterable, Tuple
+
+_DECODER = json.JSONDecoder()
+_FENCE = re.compile(r"```(?:json)?\s*(.*?)```", re.DOTALL | re.IGNORECASE)
+
+
+def extract_json_object(text: str) -> Tuple[dict, bool]:
+    """
+    Return the first JSON object found in ``text``.
+
+    The second item is False when ``text`` was already a bare JSON object and
+    True when the object had to be extracted from surrounding text. Raises
+    json.JSONDecodeError if no object can be decoded.
+    """
+    stripped = text.strip()
+    try:
+        value = json.loads(stripped)
+    except json.JSONDecodeError as e:
+        error = e
+    else:
+        if isinstance(value, dict):
+            return value, False
+        error = json.JSONDecodeError("Expected a JSON object", stripped, 0)
+
+    # Fenced blocks first, then the raw text; scan each candidate from every
+    # "{" so a stray brace in leading prose does not hide a later object.
+    for candidate in _candidates(stripped):
+        position = candidate.find("{")
+        while position != -1:
+            try:
+                value, _ = _DECODER.raw_decode(candidate, position)
+            except json.JSONDecodeError:
+                pass
+            else:
+                if isinstance(value, dict):
+                    return value, True
+            position = candidate.find("{", position + 1)
+    raise error
+
+
+def _candidates(text: str) -> Iterable[str]:
+    for match in _FENCE.finditer(text):
+        yield match.group(1)
+    yield text
+
+
+def missing_fields(data: dict, required: Iterable[str]) -> list:
+    """Required keys absent from ``data`` or not holding a string."""
+    return [field for field in required if not isinstance(data.get(field), str)]
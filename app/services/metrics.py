@@ -0,0 +1,306 @@
+"""
+Lightweight Prometheus-style metrics for the AI Message Response System.
+
+Counters and histograms are plain in-process dictionaries keyed by label
+values, so recording a sample is a dict lookup and an increment. Values
+owned by other components (cache, circuit breaker, admission queue) are read
+through callbacks at scrape time instead of being mirrored on the hot path.
+``MetricsRegistry.render`` produces the Prometheus text exposition format.
+"""
+
+import json
+import time
+from bisect import bisect_left
+from typing import Callable, Dict, Iterable, List, Tuple
+
+from app.services.admission import AdmissionRejectedError
+from app.services.resilience import CircuitOpenError, UpstreamTimeoutError
+from app.services.tenants import QuotaExceededError
+
+# Latency buckets in seconds, spanning in-process stages to slow LLM calls
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _format_labels(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+class Counter:
+    def __init__(self, name: str, help: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[tuple, float] = {}
+
+    def inc(self, *labels, amount: float = 1) -> None:
+        self._values[labels] = self._values.get(labels, 0) + amount
+
+    def value(self, *labels) -> float:
+        return self._values.get(labels, 0)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        for labels, value in self._values.items():
+            lines.append(f"{self.name}{_format_labels(self.labelnames, labels)} {value}")
+        return lines
+
+
+class Histogram:
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        labelnames: Iterable[str] = (),
+        buckets: Tuple[float, ...] = DEFAULT_BUCKETS
+    ):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        # labels -> [per-bucket counts (last is +Inf), sum, count]
+        self._series: Dict[tuple, list] = {}
+
+    def observe(self, value: float, *labels) -> None:
+        series = self._series.get(labels)
+        if series is None:
+            series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+        series[0][bisect_left(self.buckets, value)] += 1
+        series[1] += value
+        series[2] += 1
+
+    def time(self, *labels) -> "_Timer":
+        return _Timer(self, labels)
+
+    def count(self, *labels) -> int:
+        series = self._series.get(labels)
+        return series[2] if series else 0
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for labels, (counts, total, count) in self._series.items():
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                bucket_labels = _format_labels(self.labelnames, labels, f'le="{le}"')
+                lines.append(f"{self.name}_bucket{bucket_labels} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, labels)} {total}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, labels)} {count}")
+        return lines
+
+
+class _Timer:
+    __slots__ = ("histogram", "labels", "started")
+
+    def __init__(self, histogram: Histogram, labels: tuple):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.histogram.observe(time.perf_counter() - self.started, *self.labels)
+
+
+class CallbackMetric:
+    """A gauge or counter whose samples are read from ``callback`` at scrape time."""
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        metric_type: str,
+        labelnames: Iterable[str],
+        callback: Callable[[], Dict[tuple, float]]
+    ):
+        self.name = name
+        self.help = help
+        self.metric_type = metric_type
+        self.labelnames = tuple(labelnames)
+        self.callback = callback
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.metric_type}"]
+        for labels, value in self.callback().items():
+            lines.append(f"{self.name}{_format_labels(self.labelnames, labels)} {value}")
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics: Dict[str, object] = {}
+
+    def register(self, metric):
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, help: str, labelnames: Iterable[str] = ()) -> Counter:
+        return self.register(Counter(name, help, labelnames))
+
+    def histogram(self, name: str, help: str, labelnames: Iterable[str] = (), buckets=DEFAULT_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, help, labelnames, buckets))
+
+    def callback(self, name: str, help: str, metric_type: str, labelnames: Iterable[str], callback) -> CallbackMetric:
+        return self.register(CallbackMetric(name, help, metric_type, labelnames, callback))
+
+    def get(self, name: str):
+        return self._metrics[name]
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+def merge_expositions(texts: Iterable[str]) -> str:
+    """
+    Sum several workers' text expositions into one.
+
+    Samples with the same name and labels are added up, which aggregates
+    counters and histograms exactly; gauges become deployment totals (calls
+    in flight, queue depth, or the number of workers in each breaker state).
+    """
+    families: Dict[str, Tuple[List[str], Dict[str, float]]] = {}
+    for text in texts:
+        family = None
+        for line in text.splitlines():
+            if line.startswith("# HELP "):
+                name = line.split(" ", 3)[2]
+                family = families.setdefault(name, ([], {}))
+                if not family[0]:
+                    family[0].append(line)
+            elif line.startswith("# TYPE "):
+                if family is not None and len(family[0]) == 1:
+                    family[0].append(line)
+            elif line and family is not None:
+                series, _, value = line.rpartition(" ")
+                family[1][series] = family[1].get(series, 0.0) + float(value)
+
+    lines: List[str] = []
+    for header, samples in families.values():
+        lines.extend(header)
+        lines.extend(f"{series} {value}" for series, value in samples.items())
+    return "\n".join(lines) + "\n"
+
+
+METRICS = MetricsRegistry()
+
+HTTP_REQUEST_DURATION = METRICS.histogram(
+    "http_request_duration_seconds",
+    "HTTP request latency by route",
+    ("method", "route", "status"),
+)
+AI_STAGE_DURATION = METRICS.histogram(
+    "ai_stage_duration_seconds",
+    "AIService time per stage (prompt_build, upstream, parse, validate)",
+    ("operation", "stage"),
+)
+AI_TOKENS = METRICS.counter(
+    "ai_tokens_total",
+    "Tokens reported by model usage metadata",
+    ("operation", "kind"),
+)
+AI_ERRORS = METRICS.counter(
+    "ai_errors_total",
+    "AIService errors by class",
+    ("operation", "error"),
+)
+AI_INPUT_TRIMMED = METRICS.counter(
+    "ai_input_trimmed_total",
+    "User input trimmed to fit the prompt token budget (signature, history, truncated)",
+    ("operation", "reason"),
+)
+AI_TENANT_REQUESTS = METRICS.counter(
+    "ai_tenant_requests_total",
+    "Model calls per tenant by outcome",
+    ("tenant", "outcome"),
+)
+AI_TENANT_TOKENS = METRICS.counter(
+    "ai_tenant_tokens_total",
+    "Tokens reported by model usage metadata per tenant",
+    ("tenant", "kind"),
+)
+AI_JSON_PARSE = METRICS.counter(
+    "ai_json_parse_total",
+    "Structured output parse outcomes (direct, extracted, repaired, failed)",
+    ("operation", "outcome"),
+)
+
+
+def error_class(error: Exception) -> str:
+    """Map an exception raised inside AIService to a metrics error class."""
+    if isinstance(error, CircuitOpenError):
+        return "circuit_open"
+    if isinstance(error, UpstreamTimeoutError):
+        return "timeout"
+    if isinstance(error, AdmissionRejectedError):
+        return "rate_limited"
+    if isinstance(error, QuotaExceededError):
+        return "quota"
+    status = getattr(error, "status_code", None)
+    if isinstance(error, json.JSONDecodeError) or status == 400:
+        return "json_decode"
+    if isinstance(error, ValueError) or status == 422:
+        return "validation"
+    return "upstream"
+
+
+def record_usage(operation: str, response) -> Tuple[int, int]:
+    """
+    Count prompt/response tokens from a model response's usage metadata, if
+    present, and return them.
+    """
+    usage = getattr(response, "usage_metadata", None)
+    if usage is None:
+        return 0, 0
+    prompt_tokens = getattr(usage, "prompt_token_count", 0) or 0
+    response_tokens = getattr(usage, "candidates_token_count", 0) or 0
+    if prompt_tokens:
+        AI_TOKENS.inc(operation, "prompt", amount=prompt_tokens)
+    if response_tokens:
+        AI_TOKENS.inc(operation, "response", amount=response_tokens)
+    return prompt_tokens, response_tokens
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware recording request latency per route template.
+
+    Implemented as plain ASGI rather than BaseHTTPMiddleware so streaming
+    responses pass through untouched and per-request overhead stays small.
+    """
+
+    def __init__(self, app, histogram: Histogram = HTTP_REQUEST_DURATION):
+        self.app = app
+        self.histogram = histogram
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = [500]
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+            await send(message)
+
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = scope.get("route")
+            # Label by route template, never the raw path, to bound cardinality
+            path = getattr(route, "path", None) or "unmatched"
+            self.histogram.observe(time.perf_counter() - started, scope["method"], path, str(status[0]))
@@ -0,0 +1,253 @@
+"""
+Retry, deadline and circuit-breaker handling for upstream model calls.
+
+Every model call made by AIService goes through ``Resilience.call``, which
+applies a per-attempt deadline, retries retryable failures (429/5xx and
+timeouts) with exponential backoff and full jitter, honours retry-after
+hints from the upstream, and fails fast while the circuit breaker is open.
+A hint longer than the backoff cap ends the retries and is passed on to
+the client as Retry-After.
+"""
+
+import asyncio
+import logging
+import random
+import time
+from contextlib import nullcontext
+from typing import Any, Awaitable, Callable, Optional
+
+from fastapi import HTTPException
+
+logger = logging.getLogger(__name__)
+
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+
+
+class UpstreamTimeoutError(HTTPException):
+    def __init__(self, timeout: float):
+        super().__init__(status_code=504, detail=f"Upstream model call timed out after {timeout:.1f}s")
+
+
+class CircuitOpenError(HTTPException):
+    def __init__(self, retry_after: float):
+        super().__init__(
+            status_code=503,
+            detail="Upstream model is unavailable, failing fast",
+            headers={"Retry-After": str(max(1, int(retry_after + 0.5)))},
+        )
+
+
+class UpstreamThrottledError(HTTPException):
+    """The upstream asked for a longer pause than a retry may wait; passes its hint on."""
+
+    def __init__(self, retry_after: float):
+        super().__init__(
+            status_code=503,
+            detail=f"Upstream model asked to retry after {retry_after:.1f}s",
+            headers={"Retry-After": str(max(1, int(retry_after + 0.999)))},
+        )
+
+
+def error_status(error: Exception) -> Optional[int]:
+    """Best-effort HTTP status of an upstream error (google.api_core uses ``code``)."""
+    for attribute in ("status_code", "code"):
+        value = getattr(error, attribute, None)
+        if isinstance(value, int):
+            return value
+    return None
+
+
+def is_retryable(error: Exception) -> bool:
+    if isinstance(error, (UpstreamTimeoutError, asyncio.TimeoutError, ConnectionError)):
+        return True
+    if isinstance(error, CircuitOpenError):
+        return False
+    return error_status(error) in RETRYABLE_STATUS_CODES
+
+
+def retry_after_hint(error: Exception) -> Optional[float]:
+    """Extract a retry-after delay in seconds from an upstream error, if present."""
+    hint = getattr(error, "retry_after", None)
+    if isinstance(hint, (int, float)):
+        return float(hint)
+
+    # google.rpc.RetryInfo details carry a protobuf Duration in ``retry_delay``
+    for detail in getattr(error, "details", None) or []:
+        delay = getattr(detail, "retry_delay", None)
+        if delay is None:
+            continue
+        if hasattr(delay, "total_seconds"):
+            return delay.total_seconds()
+        return getattr(delay, "seconds", 0) + getattr(delay, "nanos", 0) / 1e9
+    return None
+
+
+class CircuitBreaker:
+    """
+    Closed/open/half-open circuit breaker.
+
+    Attributes:
+        failure_threshold (int): Consecutive failures that open the circuit.
+        reset_timeout (float): Seconds the circuit stays open before a trial call.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self.opened_count = 0
+        self._opened_at = 0.0
+        self._trial_in_flight = False
+
+    @property
+    def is_open(self) -> bool:
+        """True while the circuit is open and calls would fail fast."""
+        return self.state == self.OPEN and time.monotonic() < self._opened_at + self.reset_timeout
+
+    def before_call(self) -> None:
+        """Raise CircuitOpenError unless a call may proceed."""
+        if self.state == self.OPEN:
+            remaining = self._opened_at + self.reset_timeout - time.monotonic()
+            if remaining > 0:
+                raise CircuitOpenError(remaining)
+            self.state = self.HALF_OPEN
+            self._trial_in_flight = False
+
+        if self.state == self.HALF_OPEN:
+            if self._trial_in_flight:
+                raise CircuitOpenError(self.reset_timeout)
+            self._trial_in_flight = True
+
+    def record_success(self) -> None:
+        if self.state != self.CLOSED:
+            logger.info("Circuit breaker closed")
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self._trial_in_flight = False
+
+    def record_failure(self) -> None:
+        self.consecutive_failures += 1
+        if self.state == self.HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+            if self.state != self.OPEN:
+                self.opened_count += 1
+                logger.warning(
+                    "Circuit breaker opened after %d consecutive failures", self.consecutive_failures
+                )
+            self.state = self.OPEN
+            self._opened_at = time.monotonic()
+            self._trial_in_flight = False
+
+    def release(self) -> None:
+        """Forget a half-open trial that ended without a verdict on upstream health."""
+        self._trial_in_flight = False
+
+
+class Resilience:
+    """
+    Deadline, retry and circuit-breaker wrapper for upstream calls.
+
+    Attributes:
+        timeout (float): Deadline in seconds for each attempt.
+        max_attempts (int): Total attempts, including the first one.
+        base_delay (float): Initial backoff delay in seconds.
+        max_delay (float): Upper bound on any single backoff delay.
+        breaker (CircuitBreaker): Breaker shared by all calls through this wrapper.
+    """
+
+    def __init__(
+        self,
+        timeout: float = 30.0,
+        max_attempts: int = 3,
+        base_delay: float = 0.5,
+        max_delay: float = 8.0,
+        breaker: Optional[CircuitBreaker] = None
+    ):
+        self.timeout = timeout
+        self.max_attempts = max(1, max_attempts)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.breaker = breaker or CircuitBreaker()
+        self.calls = 0
+        self.retries = 0
+        self.timeouts = 0
+        self.failures = 0
+
+    @classmethod
+    def from_settings(cls, settings) -> "Resilience":
+        return cls(
+            timeout=settings.UPSTREAM_TIMEOUT_SECONDS,
+            max_attempts=settings.RETRY_MAX_ATTEMPTS,
+            base_delay=settings.RETRY_BASE_DELAY_SECONDS,
+            max_delay=settings.RETRY_MAX_DELAY_SECONDS,
+            breaker=CircuitBreaker(
+                failure_threshold=settings.BREAKER_FAILURE_THRESHOLD,
+                reset_timeout=settings.BREAKER_RESET_SECONDS,
+            ),
+        )
+
+    def backoff(self, attempt: int, error: Exception) -> float:
+        """Delay before retry number ``attempt`` (1-based), preferring upstream hints."""
+        hint = retry_after_hint(error)
+        if hint is not None:
+            return min(hint, self.max_delay)
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** (attempt - 1)))
+
+    async def call(self, operation: Callable[[], Awaitable[Any]], slot=None) -> Any:
+        """
+        Run ``operation`` with deadlines, retries and the circuit breaker.
+
+        ``slot`` is an optional async context manager (e.g. a semaphore) held
+        only while an attempt is running, never during backoff.
+        """
+        self.calls += 1
+        attempt = 0
+        while True:
+            attempt += 1
+            self.breaker.before_call()
+            try:
+                async with (slot or nullcontext()):
+                    try:
+                        result = await asyncio.wait_for(operation(), self.timeout)
+                    except asyncio.TimeoutError:
+                        self.timeouts += 1
+                        raise UpstreamTimeoutError(self.timeout)
+            except Exception as e:
+                if not is_retryable(e):
+                    # The upstream answered; a client-side error says nothing about its health.
+                    self.breaker.release()
+                    raise
+                self.failures += 1
+                self.breaker.record_failure()
+                hint = retry_after_hint(e)
+                if hint is not None and (hint > self.max_delay or attempt >= self.max_attempts):
+                    raise UpstreamThrottledError(hint) from e
+                if attempt >= self.max_attempts:
+                    raise
+                delay = self.backoff(attempt, e)
+                self.retries += 1
+                logger.warning(
+                    "Retryable upstream error (attempt %d/%d), retrying in %.2fs: %s",
+                    attempt, self.max_attempts, delay, e
+                )
+                await asyncio.sleep(delay)
+            except BaseException:
+                self.breaker.release()
+                raise
+            else:
+                self.breaker.record_success()
+                return result
+
+    def stats(self) -> dict:
+        return {
+            "calls": self.calls,
+            "retries": self.retries,
+            "timeouts": self.timeouts,
+            "failures": self.failures,
+            "breaker_state": self.breaker.state,
+            "breaker_opened": self.breaker.opened_count,
+        }
@@ -0,0 +1,200 @@
+"""
+Per-request model routing for AIService.
+
+Calls are routed to one of two tiers: a small, fast model for cheap work
+(greetings, JSON repairs, short casual messages) and the standard model for
+everything else. Each model keeps its own circuit breaker and in-flight
+count; when the routed model is erroring or saturated, calls go to the
+other tier instead, and a call that still fails with a retryable error is
+retried once on the other tier. Per-model latency, token and cost totals are
+kept for tuning the rules.
+"""
+
+import logging
+from typing import Dict, List, Optional
+
+from app.services.backends import GenerationBackend, create_backend
+from app.services.resilience import Resilience
+from app.templates.prompts import RenderedPrompt, estimate_tokens
+
+logger = logging.getLogger(__name__)
+
+FAST = "fast"
+STANDARD = "standard"
+
+
+class ModelTarget:
+    """
+    A model the router can send calls to, with its own resilience policy and stats.
+
+    Attributes:
+        name (str): Model name.
+        backend (GenerationBackend): Backend bound to this model.
+        resilience (Resilience): Deadline, retries and circuit breaker for this model.
+        max_in_flight (int): Calls in flight at which the model counts as saturated.
+        input_price (float): USD per million prompt tokens.
+        output_price (float): USD per million response tokens.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        backend: GenerationBackend,
+        resilience: Resilience,
+        max_in_flight: int,
+        input_price: float = 0.0,
+        output_price: float = 0.0
+    ):
+        self.name = name
+        self.backend = backend
+        self.resilience = resilience
+        self.max_in_flight = max_in_flight
+        self.input_price = input_price
+        self.output_price = output_price
+
+        self.in_flight = 0
+        self.calls = 0
+        self.failures = 0
+        self.fallbacks = 0
+        self.latency_total = 0.0
+        self.prompt_tokens = 0
+        self.response_tokens = 0
+
+    @property
+    def saturated(self) -> bool:
+        return self.in_flight >= self.max_in_flight
+
+    @property
+    def available(self) -> bool:
+        return not self.saturated and not self.resilience.breaker.is_open
+
+    @property
+    def cost(self) -> float:
+        return (self.prompt_tokens * self.input_price + self.response_tokens * self.output_price) / 1e6
+
+    def record(self, latency: float, response=None) -> None:
+        self.calls += 1
+        self.latency_total += latency
+        usage = getattr(response, "usage_metadata", None)
+        if usage is not None:
+            self.prompt_tokens += getattr(usage, "prompt_token_count", 0) or 0
+            self.response_tokens += getattr(usage, "candidates_token_count", 0) or 0
+
+    def record_failure(self) -> None:
+        self.calls += 1
+        self.failures += 1
+
+    def stats(self) -> dict:
+        successes = self.calls - self.failures
+        return {
+            "calls": self.calls,
+            "failures": self.failures,
+            "fallbacks": self.fallbacks,
+            "in_flight": self.in_flight,
+            "avg_latency_ms": round(self.latency_total / successes * 1000, 1) if successes else 0.0,
+            "prompt_tokens": self.prompt_tokens,
+            "response_tokens": self.response_tokens,
+            "cost_usd": round(self.cost, 6),
+            "breaker_state": self.resilience.breaker.state,
+        }
+
+
+class ModelRouter:
+    """
+    Picks the model tier for each call.
+
+    A call goes to the fast tier when its operation is listed in
+    ``fast_operations``, or when its tone is in ``fast_tones`` and its
+    per-request input is at most ``fast_max_input_tokens``.
+    """
+
+    def __init__(
+        self,
+        targets: Dict[str, ModelTarget],
+        fast_operations=(),
+        fast_tones=(),
+        fast_max_input_tokens: int = 0,
+        fallback: bool = True
+    ):
+        self.targets = targets
+        self.fast_operations = set(fast_operations)
+        self.fast_tones = {tone.lower() for tone in fast_tones}
+        self.fast_max_input_tokens = fast_max_input_tokens
+        self.fallback = fallback
+
+    @classmethod
+    def from_settings(
+        cls,
+        settings,
+        backend: Optional[GenerationBackend] = None,
+        resilience: Optional[Resilience] = None
+    ) -> "ModelRouter":
+        """
+        Build the standard tier from MODEL_NAME (or the injected backend) and,
+        when FAST_MODEL_NAME is set, a fast tier next to it.
+        """
+        def target(name: str, target_backend, target_resilience) -> ModelTarget:
+            input_price, output_price = settings.MODEL_PRICING.get(name, (0.0, 0.0))
+            return ModelTarget(
+                name,
+                target_backend,
+                target_resilience or Resilience.from_settings(settings),
+                settings.MODEL_MAX_IN_FLIGHT or settings.MAX_CONCURRENT_REQUESTS,
+                input_price,
+                output_price,
+            )
+
+        targets = {
+            STANDARD: target(
+                settings.MODEL_NAME,
+                backend or create_backend(settings, settings.MODEL_NAME),
+                resilience,
+            )
+        }
+        # An injected backend is a single, fixed model: nothing to route between.
+        if settings.FAST_MODEL_NAME and backend is None:
+            targets[FAST] = target(
+                settings.FAST_MODEL_NAME, create_backend(settings, settings.FAST_MODEL_NAME), None
+            )
+        return cls(
+            targets,
+            fast_operations=settings.ROUTE_FAST_OPERATIONS,
+            fast_tones=settings.ROUTE_FAST_TONES,
+            fast_max_input_tokens=settings.ROUTE_FAST_MAX_INPUT_TOKENS,
+            fallback=settings.MODEL_FALLBACK,
+        )
+
+    @property
+    def primary(self) -> ModelTarget:
+        return self.targets[STANDARD]
+
+    def tier_for(self, prompt, tone: Optional[str] = None) -> str:
+        if FAST not in self.targets:
+            return STANDARD
+        operation = prompt.operation if isinstance(prompt, RenderedPrompt) else "custom"
+        if operation in self.fast_operations:
+            return FAST
+        if tone is not None and tone.lower() in self.fast_tones:
+            body = prompt.body if isinstance(prompt, RenderedPrompt) else prompt
+            if estimate_tokens(body) <= self.fast_max_input_tokens:
+                return FAST
+        return STANDARD
+
+    def candidates(self, prompt, tone: Optional[str] = None) -> List[ModelTarget]:
+        """Models to try for a call, in order: the routed tier, then its fallback."""
+        tier = self.tier_for(prompt, tone)
+        routed = self.targets[tier]
+        if not self.fallback or len(self.targets) == 1:
+            return [routed]
+        other = self.targets[STANDARD if tier == FAST else FAST]
+        if not routed.available and other.available:
+            routed.fallbacks += 1
+            logger.info("Model %s unavailable, routing to %s", routed.name, other.name)
+            return [other, routed]
+        return [routed, other]
+
+    def __iter__(self):
+        return iter(self.targets.values())
+
+    def stats(self) -> Dict[str, dict]:
+        return {target.name: target.stats() for target in self}
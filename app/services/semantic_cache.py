@@ -0,0 +1,260 @@
+"""
+Near-duplicate response cache for email_responder.
+
+Exact-match caching misses requests that differ only in whitespace, casing,
+the greeting name or a trivial wording change. This cache normalizes the
+original email and fingerprints it with a 64-bit SimHash (local, CPU-only,
+no model download). Candidates come from a multi-probe banded LSH index: the
+fingerprint is split into ``max_distance // 2 + 1`` bands, so any entry
+within ``max_distance`` differing bits matches the query in at least one
+band up to a single flipped bit, and lookups probe each band's exact value
+and its one-bit neighbours. The closest candidates are then verified with
+the Jaccard similarity of their word shingles, which is what the threshold
+applies to. Emails whose specifics differ (numbers, dates, amounts, IDs,
+email addresses, day and month names) never match, however similar the rest
+is: an order email that differs only in its order number needs its own
+reply. Hits are reused with the greeting name swapped when it changed.
+"""
+
+import re
+import time
+from collections import OrderedDict
+from typing import Dict, FrozenSet, List, Optional, Set, Tuple
+
+BITS = 64
+_MASK = (1 << BITS) - 1
+
+_WORD = re.compile(r"[a-z0-9']+")
+_GREETING = re.compile(r"^\s*(hi|hello|hey|dear|good (?:morning|afternoon|evening))\s+([^\s,!.:]+)", re.IGNORECASE)
+_EMAIL_ADDRESS = re.compile(r"[\w.+-]+@[\w-]+(?:\.[\w-]+)+")
+_WITH_DIGIT = re.compile(r"[^\s,;:!?()\[\]<>\"']*\d[^\s,;:!?()\[\]<>\"']*")
+_CALENDAR_WORDS = frozenset(
+    "monday tuesday wednesday thursday friday saturday sunday today tomorrow yesterday "
+    "january february march april may june july august september october november december "
+    "jan feb mar apr jun jul aug sep sept oct nov dec".split()
+)
+
+
+def greeting_name(text: str) -> Optional[str]:
+    """Name addressed by the email's opening greeting ("Hi Okey," -> "Okey"), if any."""
+    match = _GREETING.match(text)
+    return match.group(2) if match else None
+
+
+def normalize(text: str) -> List[str]:
+    """Lowercased word tokens with the opening greeting and name removed."""
+    return _WORD.findall(_GREETING.sub("", text, count=1).lower())
+
+
+def specifics(text: str) -> FrozenSet[str]:
+    """Tokens a reply may depend on exactly: anything with a digit, email addresses and calendar words."""
+    lowered = text.lower()
+    found = {token.rstrip(".") for token in _WITH_DIGIT.findall(lowered)}
+    found.update(_EMAIL_ADDRESS.findall(lowered))
+    found.update(word for word in _WORD.findall(lowered) if word in _CALENDAR_WORDS)
+    return frozenset(found)
+
+
+def shingles(words: List[str]) -> List[str]:
+    """Word unigrams and bigrams."""
+    return words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+
+
+def jaccard(a: Set[str], b: Set[str]) -> float:
+    return len(a & b) / len(a | b) if a or b else 1.0
+
+
+def simhash(features: List[str]) -> int:
+    """64-bit SimHash over the given features."""
+    # Bit-sliced majority vote: transpose the feature hashes as bit strings so
+    # each column (one fingerprint bit) is counted in C rather than per bit.
+    # The built-in (SipHash) string hash is fast and well mixed; it is only
+    # stable within one process, which is all an in-memory index needs.
+    rows = [format(hash(feature) & _MASK, "064b") for feature in features]
+    majority = len(rows) / 2
+    fingerprint = 0
+    for column in zip(*rows):
+        fingerprint = fingerprint << 1 | (column.count("1") > majority)
+    return fingerprint
+
+
+class _Entry:
+    __slots__ = ("fingerprint", "partition", "words", "specifics", "value", "name", "expires_at")
+
+    def __init__(
+        self,
+        fingerprint: int,
+        partition: str,
+        words: str,
+        specifics: FrozenSet[str],
+        value: str,
+        name: Optional[str],
+        expires_at: float
+    ):
+        self.fingerprint = fingerprint
+        self.partition = partition
+        self.words = words
+        self.specifics = specifics
+        self.value = value
+        self.name = name
+        self.expires_at = expires_at
+
+
+class SemanticCache:
+    """
+    In-memory SimHash/LSH cache of generated replies.
+
+    Entries are grouped by ``partition`` (e.g. tone and sender name), which
+    must match exactly; within a partition the text only needs to be similar.
+
+    Attributes:
+        threshold (float): Minimum Jaccard similarity of word shingles for a hit.
+        max_distance (int): Fingerprint bits a candidate may differ by before it is skipped unverified.
+        max_entries (int): Entries kept before the least recently used are evicted.
+        ttl (float): Seconds an entry stays valid.
+    """
+
+    # Closest candidates verified per lookup
+    VERIFY = 4
+
+    def __init__(
+        self,
+        threshold: float = 0.85,
+        max_entries: int = 100000,
+        ttl: float = 3600.0,
+        max_distance: int = 12
+    ):
+        self.threshold = threshold
+        self.max_distance = max_distance
+        self.max_entries = max_entries
+        self.ttl = ttl
+
+        bands = min(BITS, self.max_distance // 2 + 1)
+        self._bands: List[Tuple[int, int, int]] = []
+        start = 0
+        for band in range(bands):
+            width = BITS // bands + (1 if band < BITS % bands else 0)
+            self._bands.append((start, width, (1 << width) - 1))
+            start += width
+
+        self._entries: "OrderedDict[int, _Entry]" = OrderedDict()
+        self._index: Dict[Tuple[str, int, int], Set[int]] = {}
+        self._next_id = 0
+        self.hits = 0
+        self.misses = 0
+        self.lookup_seconds = 0.0
+
+    @classmethod
+    def from_settings(cls, settings) -> Optional["SemanticCache"]:
+        if not settings.SEMANTIC_CACHE:
+            return None
+        return cls(
+            threshold=settings.SEMANTIC_CACHE_THRESHOLD,
+            max_entries=settings.SEMANTIC_CACHE_MAX_ENTRIES,
+            ttl=settings.CACHE_TTL_SECONDS,
+        )
+
+    def _keys(self, partition: str, fingerprint: int):
+        for band, (shift, _, mask) in enumerate(self._bands):
+            yield partition, band, fingerprint >> shift & mask
+
+    def _probes(self, partition: str, fingerprint: int):
+        """Index keys holding every entry whose band differs from the query by at most one bit."""
+        for band, (shift, width, mask) in enumerate(self._bands):
+            value = fingerprint >> shift & mask
+            yield partition, band, value
+            for bit in range(width):
+                yield partition, band, value ^ (1 << bit)
+
+    def get(self, partition: str, text: str) -> Optional[Tuple[str, float]]:
+        """Most similar cached reply at or above the threshold and its similarity, or None."""
+        started = time.perf_counter()
+        try:
+            words = normalize(text)
+            features = shingles(words)
+            fingerprint = simhash(features)
+            candidates = {}
+            for key in self._probes(partition, fingerprint):
+                for entry_id in self._index.get(key, ()):
+                    distance = (self._entries[entry_id].fingerprint ^ fingerprint).bit_count()
+                    if distance <= self.max_distance:
+                        candidates[entry_id] = distance
+
+            now = time.monotonic()
+            query = set(features)
+            query_specifics = specifics(text)
+            best_id, best_similarity = None, self.threshold
+            matching = [
+                entry_id for entry_id in sorted(candidates, key=candidates.get)
+                if self._entries[entry_id].specifics == query_specifics
+            ]
+            for entry_id in matching[:self.VERIFY]:
+                entry = self._entries[entry_id]
+                if entry.expires_at <= now:
+                    self._remove(entry_id)
+                    continue
+                similarity = jaccard(query, set(shingles(entry.words.split())))
+                if similarity >= best_similarity:
+                    best_id, best_similarity = entry_id, similarity
+            if best_id is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(best_id)
+            self.hits += 1
+            return self._adapt(self._entries[best_id], greeting_name(text)), best_similarity
+        finally:
+            self.lookup_seconds += time.perf_counter() - started
+
+    # Non-empty lines at the end of a reply that may hold the sign-off name
+    SIGN_OFF_LINES = 2
+
+    @classmethod
+    def _adapt(cls, entry: _Entry, name: Optional[str]) -> str:
+        """
+        Swap the cached greeting name for the new one so the reply addresses
+        the right person. Only the greeting line and the sign-off are touched,
+        so the same word elsewhere in the reply ("the team will ...") is kept.
+        """
+        if not (entry.name and name and entry.name != name):
+            return entry.value
+        pattern = re.compile(rf"\b{re.escape(entry.name)}\b")
+        lines = entry.value.split("\n")
+        filled = [index for index, line in enumerate(lines) if line.strip()]
+        for index in set(filled[:1] + filled[-cls.SIGN_OFF_LINES:]):
+            lines[index] = pattern.sub(lambda _: name, lines[index])
+        return "\n".join(lines)
+
+    def set(self, partition: str, text: str, value: str) -> None:
+        words = normalize(text)
+        fingerprint = simhash(shingles(words))
+        entry_id = self._next_id
+        self._next_id += 1
+        self._entries[entry_id] = _Entry(
+            fingerprint, partition, " ".join(words), specifics(text), value, greeting_name(text),
+            time.monotonic() + self.ttl
+        )
+        for key in self._keys(partition, fingerprint):
+            self._index.setdefault(key, set()).add(entry_id)
+        while len(self._entries) > self.max_entries:
+            self._remove(next(iter(self._entries)))
+
+    def _remove(self, entry_id: int) -> None:
+        entry = self._entries.pop(entry_id)
+        for key in self._keys(entry.partition, entry.fingerprint):
+            bucket = self._index.get(key)
+            if bucket is not None:
+                bucket.discard(entry_id)
+                if not bucket:
+                    del self._index[key]
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "avg_lookup_us": round(self.lookup_seconds / lookups * 1e6, 1) if lookups else 0.0,
+        }
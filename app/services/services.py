@@ -1,134 +1,462 @@
-from typing import List, Optional
-import google.generativeai as genai
+from typing import AsyncIterator, List, Optional
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
 from fastapi import HTTPException
 from app.config import get_settings
-from app.templates.templates import MessageType, MESSAGE_TEMPLATES
-
+from app.services.cache import ResponseCache, create_response_cache, make_cache_key
+from app.services.resilience import CircuitOpenError, Resilience, is_retryable
+from app.services.admission import AdmissionController, Priority
+from app.services.backends import GenerationBackend, ModelBackend
+from app.services.routing import ModelRouter
+from app.services.greetings import GreetingPool
+from app.services.hedging import HedgeGate, Hedger
+from app.services.semantic_cache import SemanticCache, normalize
+from app.services.shared_state import SharedState, create_shared_state
+from app.services.input_budget import fit_email
+from app.services.tenants import Tenants, tenant_var
+from app.services.threads import (
+    SENT, ThreadMemory, ThreadMessage, ThreadState, format_messages, recent_history, turn_fingerprint
+)
+from app.services.json_output import extract_json_object, missing_fields
+from app.services.metrics import (
+    AI_ERRORS, AI_INPUT_TRIMMED, AI_JSON_PARSE, AI_STAGE_DURATION, AI_TENANT_REQUESTS, AI_TENANT_TOKENS,
+    METRICS, MetricsRegistry, error_class, record_usage
+)
+from app.templates.prompts import (
+    GREETING_ANONYMOUS, GREETING_NAMED, JSON_REPAIR, ORIGINAL_MESSAGE_REFERENCE, RESPOND_MESSAGE,
+    RESPOND_THREAD, THREAD_SUMMARY, WRITE_MESSAGE, RenderedPrompt, estimate_tokens, get_tone_template
+)
+from app.templates.templates import PromptTemplate
+from app.models.model import EmailWriter
+from app.logging_config import Payload
+
+import asyncio
 import logging
 import json
+import time
 
-# Configure logging
-logging.basicConfig(level=logging.DEBUG, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
 # services.py
+class _HedgeAccounting(HedgeGate):
+    """
+    Admits a hedged duplicate only if it can take a concurrency slot of its
+    own and rate-limit budget right away. Once one copy wins, the cancelled
+    copy's estimated prompt tokens are billed to the tenant; the winner's
+    real usage is recorded with the call as usual.
+    """
+
+    def __init__(self, service: "AIService", prompt):
+        self.service = service
+        self.prompt = prompt
+        self.tenant = tenant_var.get()
+
+    async def admit(self) -> bool:
+        semaphore = self.service._semaphore
+        if semaphore.locked():
+            return False
+        # Does not wait: the semaphore has a free slot
+        await semaphore.acquire()
+        try:
+            estimate = self.service._input_tokens(self.prompt) + self.service.output_token_estimate
+            admitted = await self.service.admission.try_admit(estimate)
+        except BaseException:
+            semaphore.release()
+            raise
+        if not admitted:
+            semaphore.release()
+        return admitted
+
+    def release(self) -> None:
+        self.service._semaphore.release()
+
+    def lost(self) -> None:
+        input_tokens = self.service._input_tokens(self.prompt)
+        self.service.tenants.record(self.tenant, prompt_tokens=input_tokens, requests=0)
+        AI_TENANT_TOKENS.inc(self.tenant, "prompt", amount=input_tokens)
+
+
 class AIService:
-    def __init__(self):
+    def __init__(
+        self,
+        model=None,
+        backend: Optional[GenerationBackend] = None,
+        max_concurrency: Optional[int] = None,
+        cache: Optional[ResponseCache] = None,
+        resilience: Optional[Resilience] = None,
+        admission: Optional[AdmissionController] = None,
+        state: Optional[SharedState] = None,
+        tenants: Optional[Tenants] = None
+    ):
         settings = get_settings()
-        genai.configure(api_key=settings.GOOGLE_API_KEY)
-        self.model = genai.GenerativeModel("gemini-1.5-flash")
+        # Backends create their clients on first use (or in load_model() at
+        # startup) so importing the app stays cheap. An injected SDK-style
+        # model is wrapped in a ModelBackend.
+        if backend is None and model is not None:
+            backend = ModelBackend(model)
+
+        # Routes each call to the fast or standard model, each with its own
+        # deadlines, retries and circuit breaker, falling back between them
+        self.router = ModelRouter.from_settings(settings, backend=backend, resilience=resilience)
+        self.backend = self.router.primary.backend
+        self.resilience = self.router.primary.resilience
+        self.model_name = settings.MODEL_NAME
+        # Duplicate calls that run past the recent latency percentile
+        self.hedger = Hedger.from_settings(settings)
+        self.cache = cache if cache is not None else create_response_cache(settings)
+
+        # Cap on in-flight model calls for this process; callers beyond the cap
+        # wait on the semaphore instead of blocking the event loop.
+        self.max_concurrency = max_concurrency or settings.MAX_CONCURRENT_REQUESTS
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+        # Where state shared between worker processes lives (rate-limit
+        # buckets, aggregated metrics)
+        self.state = state or create_shared_state(settings, METRICS)
+
+        # Client-side RPM/TPM limits with a priority wait queue
+        self.admission = admission or AdmissionController.from_settings(settings, self.state)
+        self.output_token_estimate = settings.ADMISSION_OUTPUT_TOKENS
+
+        # API-key tenants: daily quotas, in-flight caps and usage accounting
+        self.tenants = tenants or Tenants.from_settings(settings)
+
+        # Pre-generated greetings served without a model call
+        self.greetings = GreetingPool.from_settings(settings, self._generate_greeting_template)
+
+        # Near-duplicate reuse of email_responder replies
+        self.semantic_cache = SemanticCache.from_settings(settings)
+
+        # Token budget long email threads are trimmed to before prompting
+        self.email_token_budget = settings.EMAIL_TOKEN_BUDGET
+
+        # Stored turns and rolling summaries for thread-mode replies
+        self.threads = ThreadMemory.from_settings(settings, self._summarize_thread)
+        self.thread_summary_words = settings.THREAD_SUMMARY_WORDS
+
+        # Schema-constrained JSON output and the one-shot repair fallback
+        self.structured_output = settings.STRUCTURED_OUTPUT
+        self.json_repair = settings.JSON_REPAIR
+
+    def load_model(self) -> GenerationBackend:
+        """Create every routed backend's client; safe to call repeatedly."""
+        for target in self.router:
+            target.backend.load()
+        return self.backend
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.max_concurrency,
+                thread_name_prefix="ai-service",
+            )
+        return self._executor
+
+    async def warmup(self, timeout: float) -> bool:
+        """
+        Open every routed backend's connections and make a minimal request,
+        for up to ``timeout`` seconds. Returns False if any warmup failed.
+        """
+        started = time.perf_counter()
+        backends = list({id(target.backend): target.backend for target in self.router}.values())
+        results = await asyncio.gather(
+            *(asyncio.wait_for(backend.warmup(), timeout) for backend in backends),
+            return_exceptions=True
+        )
+        failed = [result for result in results if isinstance(result, BaseException)]
+        for error in failed:
+            logger.warning("Upstream warmup failed: %r", error)
+        logger.info("Upstream warmup finished in %.2fs", time.perf_counter() - started)
+        return not failed
+
+    async def close(self) -> None:
+        """Release upstream connections, the thread pool and the thread store at shutdown."""
+        if self.threads is not None:
+            await self.threads.stop()
+        for target in self.router:
+            await target.backend.close()
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+    async def drain(self, timeout: float) -> None:
+        """Wait up to ``timeout`` seconds for model calls in flight to finish, e.g. at shutdown."""
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline and any(target.in_flight for target in self.router):
+            await asyncio.sleep(0.05)
+        remaining = sum(target.in_flight for target in self.router)
+        if remaining:
+            logger.warning("Shutting down with %d model calls still in flight", remaining)
+
+    @staticmethod
+    def _input_tokens(prompt) -> int:
+        if isinstance(prompt, RenderedPrompt):
+            return prompt.estimated_tokens
+        return estimate_tokens(prompt)
+
+    async def _admit(self, prompt, priority: Priority) -> None:
+        await self.admission.admit(self._input_tokens(prompt) + self.output_token_estimate, priority)
+
+    async def _generate(
+        self,
+        prompt,
+        priority: Priority = Priority.NORMAL,
+        tone: Optional[str] = None,
+        **kwargs
+    ):
+        """
+        Run a model call without blocking the event loop.
+
+        The call is checked against the current tenant's quotas and holds
+        one of its in-flight slots throughout. It is then admitted against
+        the rate limits in its priority lane and routed to a model by task
+        and size (``tone`` feeds the routing rules). Each attempt holds a
+        concurrency slot and is subject to that model's resilience policy
+        (deadline, retries, circuit breaker).
+        """
+        operation = self._operation(prompt)
+        tenant = tenant_var.get()
+        started = time.perf_counter()
+        try:
+            self.tenants.check(tenant)
+            async with self.tenants.slot(tenant):
+                await self._admit(prompt, priority)
+                admitted = time.perf_counter()
+                AI_STAGE_DURATION.observe(admitted - started, operation, "admission")
+                try:
+                    response = await self._call_routed(prompt, tone, **kwargs)
+                except Exception:
+                    self._account(tenant, operation, time.perf_counter() - admitted, failed=True)
+                    raise
+        except Exception as e:
+            AI_ERRORS.inc(operation, error_class(e))
+            raise
+        elapsed = time.perf_counter() - admitted
+        AI_STAGE_DURATION.observe(elapsed, operation, "upstream")
+        self._account(tenant, operation, elapsed, response)
+        return response
+
+    def _account(self, tenant: str, operation: str, elapsed: float, response=None, failed: bool = False) -> None:
+        """Record a finished model call's tokens and latency against metrics and its tenant."""
+        prompt_tokens, response_tokens = record_usage(operation, response)
+        self.tenants.record(tenant, prompt_tokens, response_tokens, elapsed, failed)
+        AI_TENANT_REQUESTS.inc(tenant, "failure" if failed else "success")
+        if prompt_tokens:
+            AI_TENANT_TOKENS.inc(tenant, "prompt", amount=prompt_tokens)
+        if response_tokens:
+            AI_TENANT_TOKENS.inc(tenant, "response", amount=response_tokens)
+
+    @staticmethod
+    def _operation(prompt) -> str:
+        return prompt.operation if isinstance(prompt, RenderedPrompt) else "custom"
+
+    async def _call_routed(self, prompt, tone: Optional[str] = None, **kwargs):
+        """
+        Call the routed model, moving on to the fallback model when it fails
+        with a retryable error or its circuit is open. With hedging on, each
+        attempt that runs unusually long is raced against a duplicate.
+        """
+        targets = self.router.candidates(prompt, tone)
+        for index, target in enumerate(targets):
+            started = time.perf_counter()
+            target.in_flight += 1
+            operation = partial(self._invoke_model, target.backend, prompt, **kwargs)
+            if self.hedger is not None:
+                operation = partial(
+                    self.hedger.call,
+                    f"{target.name}:{self._operation(prompt)}",
+                    operation,
+                    _HedgeAccounting(self, prompt)
+                )
+            try:
+                response = await target.resilience.call(operation, slot=self._semaphore)
+            except Exception as e:
+                target.record_failure()
+                fallback = isinstance(e, CircuitOpenError) or is_retryable(e)
+                if not fallback or index == len(targets) - 1:
+                    raise
+                target.fallbacks += 1
+                logger.warning(
+                    "Model %s failed (%s), falling back to %s", target.name, e, targets[index + 1].name
+                )
+                continue
+            finally:
+                target.in_flight -= 1
+            target.record(time.perf_counter() - started, response)
+            return response
+
+    async def _invoke_model(self, backend: GenerationBackend, prompt, **kwargs):
+        # Prefer the backend's native async generation; fall back to the
+        # bounded thread pool for sync-only backends.
+        if backend.supports_async:
+            return await backend.generate_async(prompt, **kwargs)
+
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self._get_executor(),
+            partial(backend.generate, prompt, **kwargs),
+        )
+
+    async def _open_stream(self, backend: GenerationBackend, prompt, **kwargs):
+        if backend.supports_async:
+            return await backend.stream_async(prompt, **kwargs)
+
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self._get_executor(),
+            partial(backend.stream, prompt, **kwargs),
+        )
+
+    async def _generate_stream(
+        self,
+        prompt,
+        priority: Priority = Priority.NORMAL,
+        tone: Optional[str] = None,
+        **kwargs
+    ) -> AsyncIterator[str]:
+        """
+        Stream text chunks from the model as they are produced.
+
+        Streams are not retried once started, but are quota-checked and
+        admitted like regular calls, gated by the circuit breaker, and the
+        deadline applies to opening the stream. A stream cannot switch models
+        once started, so fallback only applies when the routed model is
+        already unavailable.
+        """
+        operation = self._operation(prompt)
+        tenant = tenant_var.get()
+        target = self.router.candidates(prompt, tone)[0]
+        breaker = target.resilience.breaker
+        try:
+            self.tenants.check(tenant)
+        except Exception as e:
+            AI_ERRORS.inc(operation, error_class(e))
+            raise
+        async with self.tenants.slot(tenant):
+            try:
+                await self._admit(prompt, priority)
+                breaker.before_call()
+            except Exception as e:
+                AI_ERRORS.inc(operation, error_class(e))
+                raise
+            started = time.perf_counter()
+            last_chunk = None
+            target.in_flight += 1
+            try:
+                async with self._semaphore:
+                    response = await asyncio.wait_for(
+                        self._open_stream(target.backend, prompt, **kwargs),
+                        target.resilience.timeout
+                    )
+                    if hasattr(response, "__aiter__"):
+                        async for chunk in response:
+                            last_chunk = chunk
+                            if chunk.text:
+                                yield chunk.text
+                    else:
+                        # Sync-only models are drained chunk by chunk on the thread pool
+                        loop = asyncio.get_running_loop()
+                        chunks = iter(response)
+                        done = object()
+                        while True:
+                            chunk = await loop.run_in_executor(self._get_executor(), next, chunks, done)
+                            if chunk is done:
+                                break
+                            last_chunk = chunk
+                            if chunk.text:
+                                yield chunk.text
+            except Exception as e:
+                AI_ERRORS.inc(operation, error_class(e))
+                target.record_failure()
+                self._account(tenant, operation, time.perf_counter() - started, failed=True)
+                if isinstance(e, asyncio.TimeoutError) or is_retryable(e):
+                    breaker.record_failure()
+                else:
+                    breaker.release()
+                raise
+            except BaseException:
+                breaker.release()
+                raise
+            finally:
+                target.in_flight -= 1
+        breaker.record_success()
+        elapsed = time.perf_counter() - started
+        target.record(elapsed, last_chunk)
+        AI_STAGE_DURATION.observe(elapsed, operation, "upstream")
+        # Streaming responses report usage on the final chunk
+        self._account(tenant, operation, elapsed, last_chunk)
+
+    async def _cached(self, namespace: str, prompt, factory, use_cache: bool = True):
+        """
+        Return a cached result for the rendered prompt, computing it with
+        ``factory`` on a miss. Identical concurrent misses share one call.
+        """
+        if not use_cache or self.cache is None:
+            return await factory()
+        return await self.cache.get_or_set(self._cache_key(namespace, prompt), factory)
+
+    def _cache_key(self, namespace: str, prompt) -> str:
+        text = prompt.cache_text if isinstance(prompt, RenderedPrompt) else prompt
+        return make_cache_key(namespace, self.model_name, text)
     
     async def greet_user(self, message: str, user_name: str = None) -> str:
+        pooled = self.greetings.get(message, user_name)
+        if pooled is not None:
+            return pooled
         try:
-            # Personalize the greeting if user_name is provided
-            if user_name:
-                personalized_message = f"""
-                Task: Generate a warm, friendly greeting
-                Context:
-                - Recipient's name: {user_name}
-                - Initial message: {message}
-
-                Instructions:
-                1. Create a personalized greeting that addresses {user_name} directly
-                2. The tone should be friendly and welcoming
-                3. Offer assistance or ask how you can help
-                4. Keep the response concise and natural
-
-                Example format:
-                "Hi [Name]! It's great to meet you. I'm here to help with [context]. What can I assist you with today?"
-                """
-            else:
-                personalized_message = f"""
-                Task: Generate a warm, friendly greeting
-                Context:
-                - Initial message: {message}
-
-                Instructions:
-                1. Create a friendly, generic greeting
-                2. Offer assistance or ask how you can help
-                3. Keep the response concise and welcoming
-                4. Do not mention a specific name
-
-                Example format:
-                "Hello there! I'm ready to help. What can I assist you with today?"
-                """
-            
-            greeting = self.model.generate_content(personalized_message)
-            logger.debug(f"Generated greeting: {greeting.text}")
+            with AI_STAGE_DURATION.time("greet_user", "prompt_build"):
+                personalized_message = self._greeting_prompt(message, user_name)
+            greeting = await self._generate(personalized_message, priority=Priority.INTERACTIVE)
+            logger.debug("Generated greeting: %s", Payload(greeting.text))
             return greeting.text.strip()
+        except HTTPException:
+            raise
         except Exception as e:
-            logger.error(f"AI greeting error: {str(e)}")
+            logger.error("AI greeting error: %s", e)
             raise HTTPException(status_code=500, detail=f"AI greeting error: {str(e)}")
 
+    async def stream_greet_user(self, message: str, user_name: Optional[str] = None) -> AsyncIterator[str]:
+        """Stream a greeting as it is generated."""
+        pooled = self.greetings.get(message, user_name)
+        if pooled is not None:
+            yield pooled
+            return
+        async for chunk in self._generate_stream(
+            self._greeting_prompt(message, user_name),
+            priority=Priority.INTERACTIVE
+        ):
+            yield chunk
+
+    async def _generate_greeting_template(self, prompt: RenderedPrompt) -> str:
+        # Background work: lowest priority, and sampled hot for variety
+        return await self._generate_text(prompt, priority=Priority.BULK, generation_config={"temperature": 1.0})
+
+    def _greeting_prompt(self, message: str, user_name: Optional[str] = None) -> RenderedPrompt:
+        # Personalize the greeting if user_name is provided
+        if user_name:
+            return GREETING_NAMED.render(user_name=user_name, message=message)
+        return GREETING_ANONYMOUS.render(message=message)
+
     async def generate_response(
         self, 
         message_type: str, 
         user_message: str, 
         email: Optional[str] = None, 
-        user_name: Optional[str] = None
+        user_name: Optional[str] = None,
+        use_cache: bool = True
     ) -> dict:
         try:
-            template = self._get_message_template(message_type)
-
-            prompt = template.format(custom_message=user_message)
-            # Construct the prompt without relying on separate templates
-            email_generation_prompt = f"""
-            With this prompt: {prompt}
-            Task: Convert the Following Message into a Professional Email
-            Original Message: "{user_message}"
-
-            Instructions:
-            1. Format the message into a complete email structure
-            2. Maintain the message's core intent
-            3. Use the sender's information:
-               - Email: {email}
-               - Sender's Name: {user_name} (if provided)
-            4. Match the tone to the message type: {message_type}
-
-            Email Requirements:
-            - Include a subject line that reflects the message's intent
-            - Body must:
-               - Start with a greeting (e.g., "Dear Team,")
-               - Include the original message as the core content
-               - End with a professional sign-off using the sender's name which is {user_name}
-            - Output strictly in JSON format with these keys: "email", "subject", "body"
-            
-            Example Input:
-            {{
-                "type": "formal",
-                "user_message": "Thank you for attending my party last night.",
-                "email": "okey@example.com",
-                "user_name": "Okey"
-            }}
-
-            Example Output:
-            {{
-                "subject": "Appreciation for Attending My Party",
-                "body": "Dear Friend,\n\nThank you for attending my party last night. Your presence made the event even more special, and I truly appreciate you taking the time to join me.\n\nBest regards,\nOkey"
-            }}
-
-            Example Input:
-            {{
-                "type": "casual",
-                "user_message": "Thanks for coming to my party last night!",
-                "email": "alex@example.com",
-                "user_name": "Alex"
-            }}
-
-            Example Output:
-            {{
-                "subject": "Thanks for Coming to My Party",
-                "body": "Hey [Friend's Name],\n\nThanks for coming to my party last night! It was so much fun having you there, and I really appreciate it.\n\nCheers,\nAlex"
-            }}
-
-            CRITICAL NOTES:
-            - Do NOT respond to the message - format it into an email
-            - Use the provided email and name exactly as given
-            - Ensure valid JSON with all required fields
-            - The original message must be the central content of the body
-            - Keep the email structure natural and conversational
-            """
-            
+            with AI_STAGE_DURATION.time("write_message", "prompt_build"):
+                template = self._get_message_template(message_type)
+                email_generation_prompt = WRITE_MESSAGE.render(
+                    prompt=template.format(custom_message=ORIGINAL_MESSAGE_REFERENCE),
+                    user_message=user_message,
+                    email=email,
+                    user_name=user_name,
+                    message_type=message_type
+                )
+
             # Generate content with safety settings
             safety_settings = [
                 {"category": "HARM_CATEGORY_HARASSMENT", "threshold": "BLOCK_NONE"},
@@ -137,24 +465,12 @@ class AIService:
                 {"category": "HARM_CATEGORY_DANGEROUS_CONTENT", "threshold": "BLOCK_NONE"}
             ]
 
-            response = self.model.generate_content(email_generation_prompt, safety_settings=safety_settings)
-            logger.debug(f"Raw Response: {response.text}")
-            
-            # Clean and parse JSON response
-            json_str = response.text.strip().replace('```json', '').replace('```', '').strip()
-            logger.debug(f"JSON String: {json_str}")
-
-            try:
-                email_data = json.loads(json_str)
-            except json.JSONDecodeError as e:
-                logger.error(f"JSON Decode Error: {e}")
-                raise HTTPException(status_code=400, detail=f"Invalid JSON response: {str(e)}")
-
-            # Validate required fields
-            required_fields = ["subject", "body"]
-            for field in required_fields:
-                if field not in email_data:
-                    raise ValueError(f"Missing required field: {field}")
+            email_data = await self._cached(
+                "write_message",
+                email_generation_prompt,
+                lambda: self._compose_email(email_generation_prompt, safety_settings, message_type),
+                use_cache
+            )
 
             # Ensure proper email handling
             final_email = email or "user@example.com"
@@ -165,84 +481,451 @@ class AIService:
                 "body": email_data["body"]
             }
 
+        except HTTPException:
+            raise
         except json.JSONDecodeError as e:
-            logger.error(f"JSON Decode Error: {e}")
+            logger.error("JSON Decode Error: %s", e)
             raise HTTPException(status_code=400, detail=f"Invalid JSON response: {str(e)}")
         except ValueError as e:
-            logger.error(f"Validation Error: {e}")
+            logger.error("Validation Error: %s", e)
             raise HTTPException(status_code=422, detail=str(e))
         except Exception as e:
-            logger.error(f"Unexpected Error: {e}")
+            logger.error("Unexpected Error: %s", e)
             raise HTTPException(status_code=500, detail=f"AI generation error: {str(e)}")
 
+    def _json_generation_config(self) -> Optional[dict]:
+        if not self.structured_output:
+            return None
+        return {
+            "response_mime_type": "application/json",
+            "response_schema": EmailWriter.response_schema(),
+        }
+
+    async def _compose_email(
+        self,
+        email_generation_prompt: RenderedPrompt,
+        safety_settings: list,
+        tone: Optional[str] = None
+    ) -> dict:
+        """
+        Call the model and parse its reply into validated subject/body fields.
+
+        The reply is requested as schema-constrained JSON. If it still does not
+        parse, the first JSON object is extracted from the text, and only if
+        that fails is a single small repair call made instead of regenerating.
+        """
+        generation_config = self._json_generation_config()
+        response = await self._generate(
+            email_generation_prompt,
+            priority=Priority.BULK,
+            tone=tone,
+            safety_settings=safety_settings,
+            generation_config=generation_config
+        )
+        logger.debug("Raw Response: %s", Payload(response.text))
+
+        required_fields = EmailWriter.GENERATED_FIELDS
+        started = time.perf_counter()
+        try:
+            email_data, extracted = extract_json_object(response.text)
+            problem = None
+        except json.JSONDecodeError as e:
+            email_data, problem = None, f"invalid JSON: {e}"
+        parsed = time.perf_counter()
+        AI_STAGE_DURATION.observe(parsed - started, "write_message", "parse")
+
+        if problem is None:
+            missing = missing_fields(email_data, required_fields)
+            if missing:
+                problem = f"missing required fields: {', '.join(missing)}"
+        AI_STAGE_DURATION.observe(time.perf_counter() - parsed, "write_message", "validate")
+
+        if problem is None:
+            AI_JSON_PARSE.inc("write_message", "extracted" if extracted else "direct")
+            return {field: email_data[field] for field in required_fields}
+
+        logger.warning("Unusable JSON reply (%s)", problem)
+        if self.json_repair:
+            repaired = await self._repair_json(response.text, problem, required_fields, generation_config)
+            if repaired is not None:
+                AI_JSON_PARSE.inc("write_message", "repaired")
+                return {field: repaired[field] for field in required_fields}
+
+        AI_JSON_PARSE.inc("write_message", "failed")
+        if email_data is None:
+            AI_ERRORS.inc("write_message", "json_decode")
+            raise HTTPException(status_code=400, detail=f"Invalid JSON response: {problem}")
+        AI_ERRORS.inc("write_message", "validation")
+        raise ValueError(f"Missing required field: {', '.join(missing_fields(email_data, required_fields))}")
+
+    async def _repair_json(
+        self,
+        text: str,
+        problem: str,
+        required_fields: tuple,
+        generation_config: Optional[dict]
+    ) -> Optional[dict]:
+        """Ask the model once to fix a malformed reply; returns None if the repair is unusable."""
+        repair_prompt = JSON_REPAIR.render(fields=", ".join(required_fields), error=problem, text=text)
+        try:
+            response = await self._generate(
+                repair_prompt,
+                priority=Priority.BULK,
+                generation_config=generation_config
+            )
+            email_data, _ = extract_json_object(response.text)
+        except json.JSONDecodeError as e:
+            logger.error("JSON repair failed: %s", e)
+            return None
+        if missing_fields(email_data, required_fields):
+            logger.error("JSON repair returned incomplete fields")
+            return None
+        return email_data
+
     async def email_responder(
         self,
         email_address: str,
         email: str,
         prompt: str,
         message_type: str,
-        user_name: Optional[str] = None
+        user_name: Optional[str] = None,
+        use_cache: bool = True,
+        thread_id: Optional[str] = None
     ) -> str:
         try:
-            # Get the message template based on the message type
-            message_template = self._get_message_template(message_type)
-
-            # Construct a detailed, context-aware prompt
-            detailed_prompt = f"""Task: Generate a Precise Email Response
-
-Response Generation Criteria:
-1. Input Context:
-   - Original Email: "{email}"
-   - User Prompt: "{prompt}"
-   - Desired Tone: {message_type}
-   - Sender's Name Reference: {user_name}
-
-2. Structural Requirements:
-   - Omit any "Subject:" line
-   - Begin with an appropriate, context-specific greeting
-   - Directly address the content of the original email
-   - Incorporate the user's prompt seamlessly
-   - Conclude with a professional sign-off
-
-3. Signature Guidelines:
-   - Prioritize detecting a name from the original email
-   - If no name is detected, use "{user_name}" as the signature
-   - If no user name is available, use a generic "Team" signature
-
-4. Tone Adaptation:
-   - Maintain a {message_type.lower()} communication style
-   - Ensure professional and clear language
-   - Match the emotional tenor of the original email
-
-5. Response Template:
-   [Greeting],
-
-   [Response Content Addressing Original Email and Prompt]
-
-   Best regards,
-   [Signature Name]
-
-Practical Example:
-Original Email: "Hi Okey, I need an update on the project status."
-Prompt: "AI integration is complete, preparing for GitHub push"
-Response: "Hi Okey,
-
-Thanks for checking in about the project status. The AI integration is now complete, and I'm currently preparing for the GitHub repository push. I'll send a detailed update once everything is live.
-
-Best regards,
-{user_name or 'Team'}"""
-
-            # Generate the response using the model
-            response = self.model.generate_content(detailed_prompt)
-
-            return response.text.strip()
-
+            if thread_id is not None:
+                return await self._thread_reply(thread_id, email, prompt, message_type, user_name, use_cache)
+
+            with AI_STAGE_DURATION.time("respond_message", "prompt_build"):
+                email = self._fit_email(email)
+                detailed_prompt = self._email_response_prompt(email, prompt, message_type, user_name)
+
+            # Generate the response using the model, reusing a near-duplicate's reply if cached
+            return await self._cached(
+                "respond_message",
+                detailed_prompt,
+                lambda: self._generate_reply(detailed_prompt, email, prompt, message_type, user_name, use_cache),
+                use_cache
+            )
+
+        except HTTPException:
+            raise
         except Exception as e:
-            logger.error(f"Email response generation error: {str(e)}")
+            logger.error("Email response generation error: %s", e)
             raise HTTPException(status_code=500, detail=f"Email response generation error: {str(e)}")
 
-    def _get_message_template(self, message_type: str) -> str:
-        try:
-            return MESSAGE_TEMPLATES[MessageType(message_type)]
-        except ValueError:
-            return MESSAGE_TEMPLATES[MessageType.CUSTOM]
+    async def stream_email_responder(
+        self,
+        email_address: str,
+        email: str,
+        prompt: str,
+        message_type: str,
+        user_name: Optional[str] = None,
+        use_cache: bool = True,
+        thread_id: Optional[str] = None
+    ) -> AsyncIterator[str]:
+        """
+        Stream an email response as it is generated.
+
+        A cached reply is emitted as a single chunk; a freshly streamed reply
+        is stored in the cache once complete so non-streaming calls reuse it.
+        In thread mode the turn is stored once the reply is complete.
+        """
+        if thread_id is not None:
+            async for chunk in self._stream_thread_reply(
+                thread_id, email, prompt, message_type, user_name, use_cache
+            ):
+                yield chunk
+            return
+
+        email = self._fit_email(email)
+        detailed_prompt = self._email_response_prompt(email, prompt, message_type, user_name)
+        key = self._cache_key("respond_message", detailed_prompt)
+        if use_cache and self.cache is not None:
+            cached = await self.cache.get(key)
+            if cached is not None:
+                yield cached
+                return
+
+        partition, text = self._semantic_key(email, prompt, message_type, user_name)
+        if use_cache and self.semantic_cache is not None:
+            similar = self.semantic_cache.get(partition, text)
+            if similar is not None:
+                yield similar[0]
+                return
+
+        chunks = []
+        async for chunk in self._generate_stream(detailed_prompt, tone=message_type):
+            chunks.append(chunk)
+            yield chunk
+
+        reply = "".join(chunks).strip()
+        if use_cache and self.cache is not None:
+            await self.cache.set(key, reply)
+        if use_cache and self.semantic_cache is not None:
+            self.semantic_cache.set(partition, text, reply)
+
+    async def _generate_reply(
+        self,
+        detailed_prompt: RenderedPrompt,
+        email: str,
+        prompt: str,
+        message_type: str,
+        user_name: Optional[str],
+        use_cache: bool = True
+    ) -> str:
+        """Reply to an email, reusing the reply to a near-identical earlier request when possible."""
+        if not use_cache or self.semantic_cache is None:
+            return await self._generate_text(detailed_prompt, tone=message_type)
+
+        partition, text = self._semantic_key(email, prompt, message_type, user_name)
+        similar = self.semantic_cache.get(partition, text)
+        if similar is not None:
+            logger.debug("Semantic cache hit (similarity %.2f)", similar[1])
+            return similar[0]
+        reply = await self._generate_text(detailed_prompt, tone=message_type)
+        self.semantic_cache.set(partition, text, reply)
+        return reply
+
+    @staticmethod
+    def _semantic_key(email: str, prompt: str, message_type: str, user_name: Optional[str]) -> tuple:
+        # Tone, signature name and the (normalized) prompt must match exactly: a short
+        # prompt barely moves the fingerprint, yet a different one needs a different
+        # reply. Only the original email has to be similar.
+        return f"{message_type.lower()}|{user_name or ''}|{' '.join(normalize(prompt))}", email
+
+    def _thread_key(self, thread_id: str) -> str:
+        if self.threads is None:
+            raise HTTPException(status_code=400, detail="Thread mode is disabled (THREAD_BACKEND=none)")
+        # Thread IDs are chosen by clients, so each tenant has its own namespace
+        return f"{tenant_var.get()}:{thread_id}"
+
+    async def _thread_turn(
+        self,
+        thread_id: str,
+        email: Optional[str],
+        prompt: str,
+        message_type: str,
+        user_name: Optional[str],
+        use_cache: bool = True
+    ) -> tuple:
+        """
+        Load a thread and build the prompt for its next reply from the
+        rolling summary, the unsummarized messages and the new email.
+        Returns (key, fitted email, prompt or None, repeated reply or None,
+        turn fingerprint).
+        """
+        key = self._thread_key(thread_id)
+        with AI_STAGE_DURATION.time("respond_message", "prompt_build"):
+            email = self._fit_email(email) or ""
+            fingerprint = turn_fingerprint(email, prompt, message_type, user_name)
+            state = await self.threads.load(key)
+            # A client retrying a turn that already succeeded gets the stored reply
+            # instead of a second reply to the same request
+            repeated = self._repeated_turn(state, fingerprint) if use_cache else None
+            if repeated is not None:
+                return key, email, None, repeated, fingerprint
+            detailed_prompt = RESPOND_THREAD.render(
+                summary=state.summary or "None",
+                history=recent_history(state.messages, self.email_token_budget),
+                email=email,
+                prompt=prompt,
+                message_type=message_type.lower(),
+                user_name=user_name or "Team"
+            )
+        return key, email, detailed_prompt, None, fingerprint
+
+    @staticmethod
+    def _repeated_turn(state: ThreadState, fingerprint: str) -> Optional[str]:
+        """The stored reply when the thread's last turn answered the same request."""
+        if not state.messages:
+            return None
+        last = state.messages[-1]
+        if last.role == SENT and last.fingerprint == fingerprint:
+            return last.text
+        return None
+
+    async def _thread_reply(
+        self,
+        thread_id: str,
+        email: Optional[str],
+        prompt: str,
+        message_type: str,
+        user_name: Optional[str],
+        use_cache: bool = True
+    ) -> str:
+        key, email, detailed_prompt, repeated, fingerprint = await self._thread_turn(
+            thread_id, email, prompt, message_type, user_name, use_cache
+        )
+        if repeated is not None:
+            return repeated
+        # Only the exact cache applies: the prompt includes the thread so far,
+        # which the semantic cache's email-only fingerprint would ignore
+        reply = await self._cached(
+            "respond_message",
+            detailed_prompt,
+            lambda: self._generate_text(detailed_prompt, tone=message_type),
+            use_cache
+        )
+        await self.threads.record_turn(key, email, reply, fingerprint)
+        return reply
+
+    async def _stream_thread_reply(
+        self,
+        thread_id: str,
+        email: Optional[str],
+        prompt: str,
+        message_type: str,
+        user_name: Optional[str],
+        use_cache: bool = True
+    ) -> AsyncIterator[str]:
+        key, email, detailed_prompt, repeated, fingerprint = await self._thread_turn(
+            thread_id, email, prompt, message_type, user_name, use_cache
+        )
+        if repeated is not None:
+            yield repeated
+            return
+        chunks = []
+        async for chunk in self._generate_stream(detailed_prompt, tone=message_type):
+            chunks.append(chunk)
+            yield chunk
+        await self.threads.record_turn(key, email, "".join(chunks).strip(), fingerprint)
+
+    async def _summarize_thread(self, summary: str, messages: List[ThreadMessage]) -> str:
+        """Fold older thread messages into the thread's running summary."""
+        prompt = THREAD_SUMMARY.render(
+            words=self.thread_summary_words,
+            summary=summary or "None",
+            messages=format_messages(messages)
+        )
+        return await self._generate_text(prompt, priority=Priority.BULK)
+
+    async def thread(self, thread_id: str) -> ThreadState:
+        return await self.threads.load(self._thread_key(thread_id))
+
+    async def delete_thread(self, thread_id: str) -> bool:
+        return await self.threads.delete(self._thread_key(thread_id))
+
+    def _fit_email(self, email: Optional[str]) -> Optional[str]:
+        """Trim an email thread to EMAIL_TOKEN_BUDGET before it is used in a prompt or cache key."""
+        fitted = fit_email(email, self.email_token_budget)
+        for reason in fitted.trimmed:
+            AI_INPUT_TRIMMED.inc("respond_message", reason)
+        if fitted.trimmed:
+            logger.info(
+                "Trimmed email from ~%d to ~%d tokens (%s)",
+                estimate_tokens(email), estimate_tokens(fitted.text), ", ".join(fitted.trimmed)
+            )
+        return fitted.text
+
+    def _email_response_prompt(
+        self,
+        email: str,
+        prompt: str,
+        message_type: str,
+        user_name: Optional[str] = None
+    ) -> RenderedPrompt:
+        return RESPOND_MESSAGE.render(
+            email=email,
+            prompt=prompt,
+            message_type=message_type.lower(),
+            user_name=user_name or "Team"
+        )
+
+    async def _generate_text(self, prompt, **kwargs) -> str:
+        response = await self._generate(prompt, **kwargs)
+        return response.text.strip()
+
+    def register_metrics(self, registry: MetricsRegistry = METRICS) -> None:
+        """Expose cache, resilience and admission state through the metrics registry."""
+        def cache_events():
+            stats = self.cache.stats() if self.cache is not None else {}
+            return {(result,): count for result, count in stats.items()}
+
+        def resilience_events():
+            samples = {}
+            for target in self.router:
+                stats = target.resilience.stats()
+                for event in ("calls", "retries", "timeouts", "failures", "breaker_opened"):
+                    samples[(target.name, event)] = stats[event]
+            return samples
+
+        def breaker_state():
+            samples = {}
+            for target in self.router:
+                state = target.resilience.breaker.state
+                for name in ("closed", "open", "half_open"):
+                    samples[(target.name, name)] = int(name == state)
+            return samples
+
+        def admission_events():
+            stats = self.admission.stats()
+            return {(event,): stats[event] for event in ("admitted", "rejected", "queued_total")}
+
+        registry.callback("ai_cache_events_total", "Response cache lookups by result", "counter", ("result",), cache_events)
+        registry.callback("ai_upstream_events_total", "Upstream call, retry and failure counts per model", "counter", ("model", "event"), resilience_events)
+        registry.callback("ai_circuit_breaker_state", "1 for each model's current circuit breaker state", "gauge", ("model", "state"), breaker_state)
+        registry.callback("ai_admission_events_total", "Admission control decisions", "counter", ("event",), admission_events)
+        if self.hedger is not None:
+            def hedge_events():
+                return {(event,): count for event, count in self.hedger.stats().items()}
+
+            registry.callback("ai_hedge_events_total", "Hedged model calls: calls, hedged, hedge_wins, budget_exhausted, not_admitted", "counter", ("event",), hedge_events)
+        if self.threads is not None:
+            registry.callback(
+                "ai_thread_summaries_total", "Thread summary updates by result", "counter", ("result",),
+                lambda: {("success",): self.threads.summaries, ("failure",): self.threads.summary_failures}
+            )
+        def model_requests():
+            samples = {}
+            for target in self.router:
+                samples[(target.name, "success")] = target.calls - target.failures
+                samples[(target.name, "failure")] = target.failures
+                samples[(target.name, "fallback")] = target.fallbacks
+            return samples
+
+        def model_tokens():
+            samples = {}
+            for target in self.router:
+                samples[(target.name, "prompt")] = target.prompt_tokens
+                samples[(target.name, "response")] = target.response_tokens
+            return samples
+
+        registry.callback("ai_model_requests_total", "Model calls by outcome", "counter", ("model", "outcome"), model_requests)
+        registry.callback(
+            "ai_model_latency_seconds_total", "Summed latency of successful calls per model", "counter", ("model",),
+            lambda: {(target.name,): target.latency_total for target in self.router}
+        )
+        registry.callback("ai_model_tokens_total", "Tokens per model", "counter", ("model", "kind"), model_tokens)
+        registry.callback(
+            "ai_model_cost_usd_total", "Estimated spend per model from MODEL_PRICING", "counter", ("model",),
+            lambda: {(target.name,): target.cost for target in self.router}
+        )
+        registry.callback(
+            "ai_model_in_flight", "Calls in flight per model", "gauge", ("model",),
+            lambda: {(target.name,): target.in_flight for target in self.router}
+        )
+        registry.callback(
+            "ai_greeting_pool_total", "Greeting requests served from the pool or live", "counter", ("result",),
+            lambda: {("hit",): self.greetings.hits, ("miss",): self.greetings.misses}
+        )
+        def semantic_cache_events():
+            if self.semantic_cache is None:
+                return {}
+            return {("hit",): self.semantic_cache.hits, ("miss",): self.semantic_cache.misses}
+
+        registry.callback(
+            "ai_semantic_cache_events_total", "Near-duplicate cache lookups by result", "counter", ("result",),
+            semantic_cache_events
+        )
+        registry.callback(
+            "ai_semantic_cache_lookup_seconds_total", "Time spent in near-duplicate cache lookups", "counter", (),
+            lambda: {(): self.semantic_cache.lookup_seconds if self.semantic_cache is not None else 0.0}
+        )
+        registry.callback(
+            "ai_admission_queue_depth", "Requests waiting for admission", "gauge", (),
+            lambda: {(): self.admission.stats()["queue_depth"]}
+        )
+
+    def _get_message_template(self, message_type: str) -> PromptTemplate:
+        return get_tone_template(message_type)
@@ -0,0 +1,234 @@
+"""
+State shared between the worker processes of one deployment.
+
+Running several server processes multiplies per-process state: each has its
+own rate-limit buckets and its own metrics, so a quota is exceeded N-fold
+and a scrape of /metrics sees whichever worker happened to answer. A
+SharedState backend decides where that state lives:
+
+- ``local``: in the process. The upstream quota is split evenly between
+  the WEB_CONCURRENCY workers so that together they stay within it, and
+  /metrics reports the answering worker only.
+- ``redis``: on a Redis-compatible server. Rate-limit buckets are refilled
+  and consumed atomically by a server-side script, and every worker
+  publishes a snapshot of its metrics that /metrics sums into one view.
+
+Response caches and job queues are shared through their own ``redis``
+backends (CACHE_BACKEND, JOB_QUEUE_BACKEND).
+"""
+
+import asyncio
+import json
+import logging
+import os
+import socket
+import time
+from typing import Dict, Optional, Tuple
+
+from app.services.admission import LocalBuckets
+from app.services.metrics import MetricsRegistry, merge_expositions
+
+logger = logging.getLogger(__name__)
+
+# Refill, check and take from every bucket in one atomic step. KEYS are the
+# bucket hashes; ARGV holds rate, capacity and amount per bucket. Returns the
+# seconds to wait (0 when taken) followed by each bucket's level, as strings
+# because Lua numbers are truncated to integers on the way out.
+_ACQUIRE_SCRIPT = """
+local now_parts = redis.call('TIME')
+local now = tonumber(now_parts[1]) + tonumber(now_parts[2]) / 1000000
+local levels = {}
+local wait = 0
+for i, key in ipairs(KEYS) do
+    local rate = tonumber(ARGV[i * 3 - 2])
+    local capacity = tonumber(ARGV[i * 3 - 1])
+    local amount = math.min(tonumber(ARGV[i * 3]), capacity)
+    local state = redis.call('HMGET', key, 'tokens', 'updated')
+    local tokens = tonumber(state[1]) or capacity
+    local updated = tonumber(state[2]) or now
+    tokens = math.min(capacity, tokens + math.max(0, now - updated) * rate)
+    levels[i] = tokens
+    if tokens < amount then
+        wait = math.max(wait, (amount - tokens) / rate)
+    end
+end
+local result = {tostring(wait)}
+for i, key in ipairs(KEYS) do
+    local rate = tonumber(ARGV[i * 3 - 2])
+    local capacity = tonumber(ARGV[i * 3 - 1])
+    if wait == 0 then
+        levels[i] = levels[i] - math.min(tonumber(ARGV[i * 3]), capacity)
+    end
+    redis.call('HSET', key, 'tokens', tostring(levels[i]), 'updated', tostring(now))
+    redis.call('EXPIRE', key, math.ceil(capacity / rate) * 2 + 1)
+    result[i + 1] = tostring(levels[i])
+end
+return result
+"""
+
+
+class RedisBuckets:
+    """
+    Named token buckets on a Redis-compatible server, shared by every worker.
+
+    Same interface as ``LocalBuckets``. ``levels`` reports the state seen by
+    the last acquire. If the server is unreachable, calls are admitted
+    rather than blocked, as the response cache bypasses a failing backend.
+    """
+
+    def __init__(self, client, prefix: str, limits: Dict[str, Tuple[float, float]]):
+        self._limits = limits
+        self._keys = [f"{prefix}:{name}" for name in limits]
+        self._levels = {name: (capacity, rate) for name, (rate, capacity) in limits.items()}
+        self._script = client.register_script(_ACQUIRE_SCRIPT)
+
+    def __len__(self) -> int:
+        return len(self._limits)
+
+    async def acquire(self, amounts: Dict[str, float]) -> float:
+        args = []
+        for name, (rate, capacity) in self._limits.items():
+            args.extend((rate, capacity, amounts[name]))
+        try:
+            result = await self._script(keys=self._keys, args=args)
+        except Exception as e:
+            logger.warning("Shared rate limit unavailable, admitting locally: %s", e)
+            return 0.0
+        for (name, (rate, _)), level in zip(self._limits.items(), result[1:]):
+            self._levels[name] = (float(level), rate)
+        return float(result[0])
+
+    def levels(self) -> Dict[str, Tuple[float, float]]:
+        return dict(self._levels)
+
+
+class SharedState:
+    """Interface for where cross-worker state lives."""
+
+    def buckets(self, name: str, limits: Dict[str, Tuple[float, float]]):
+        """Token buckets for ``limits`` (name -> (rate per second, capacity))."""
+        raise NotImplementedError
+
+    async def render_metrics(self, registry: MetricsRegistry) -> str:
+        """Metrics exposition for the whole deployment, as far as this backend can see it."""
+        return registry.render()
+
+    def start(self) -> None:
+        pass
+
+    async def stop(self) -> None:
+        pass
+
+
+class LocalState(SharedState):
+    """
+    Per-process state, with quotas divided between ``workers`` processes.
+
+    Attributes:
+        workers (int): Server processes sharing the upstream quota.
+    """
+
+    def __init__(self, workers: int = 1):
+        self.workers = max(1, workers)
+
+    def buckets(self, name: str, limits: Dict[str, Tuple[float, float]]) -> LocalBuckets:
+        return LocalBuckets({
+            bucket: (rate / self.workers, capacity / self.workers)
+            for bucket, (rate, capacity) in limits.items()
+        })
+
+
+class RedisState(SharedState):
+    """
+    State on a Redis-compatible server.
+
+    Requires the optional ``redis`` package. Each worker publishes its
+    metrics every ``publish_interval`` seconds; snapshots from workers that
+    stop publishing are dropped after three intervals.
+    """
+
+    def __init__(
+        self,
+        url: str,
+        registry: MetricsRegistry,
+        publish_interval: float = 5.0,
+        prefix: str = "telegence:state"
+    ):
+        try:
+            import redis.asyncio as redis
+        except ImportError as e:
+            raise ImportError("SHARED_STATE_BACKEND=redis requires the 'redis' package") from e
+        self._client = redis.from_url(url)
+        self.registry = registry
+        self.publish_interval = publish_interval
+        self.prefix = prefix
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}"
+        self._task: Optional[asyncio.Task] = None
+
+    def buckets(self, name: str, limits: Dict[str, Tuple[float, float]]) -> RedisBuckets:
+        return RedisBuckets(self._client, f"{self.prefix}:buckets:{name}", limits)
+
+    async def publish_metrics(self) -> None:
+        snapshot = json.dumps({"at": time.time(), "text": self.registry.render()})
+        await self._client.hset(f"{self.prefix}:metrics", self.worker_id, snapshot)
+
+    async def render_metrics(self, registry: MetricsRegistry) -> str:
+        try:
+            await self.publish_metrics()
+            snapshots = await self._client.hgetall(f"{self.prefix}:metrics")
+        except Exception as e:
+            logger.warning("Shared metrics unavailable, reporting this worker only: %s", e)
+            return registry.render()
+
+        cutoff = time.time() - 3 * self.publish_interval
+        texts, stale = [], []
+        for worker_id, raw in snapshots.items():
+            snapshot = json.loads(raw)
+            if snapshot["at"] < cutoff:
+                stale.append(worker_id)
+            else:
+                texts.append(snapshot["text"])
+        if stale:
+            await self._client.hdel(f"{self.prefix}:metrics", *stale)
+        return merge_expositions(texts)
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self.publish_metrics()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning("Publishing metrics failed: %s", e)
+            await asyncio.sleep(self.publish_interval)
+
+    def start(self) -> None:
+        """Start publishing this worker's metrics on the running event loop."""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        try:
+            await self._client.hdel(f"{self.prefix}:metrics", self.worker_id)
+        except Exception as e:
+            logger.warning("Removing metrics snapshot failed: %s", e)
+        await self._client.aclose()
+
+
+def create_shared_state(settings, registry: MetricsRegistry) -> SharedState:
+    """Build the shared state backend configured in settings."""
+    backend_name = settings.SHARED_STATE_BACKEND.lower()
+    if backend_name == "redis":
+        if not settings.REDIS_URL:
+            raise ValueError("SHARED_STATE_BACKEND=redis requires REDIS_URL")
+        return RedisState(settings.REDIS_URL, registry, settings.METRICS_PUBLISH_SECONDS)
+    if backend_name == "local":
+        return LocalState(settings.WEB_CONCURRENCY or 1)
+    raise ValueError(f"Unknown SHARED_STATE_BACKEND: {settings.SHARED_STATE_BACKEND}")
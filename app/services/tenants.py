@@ -0,0 +1,349 @@
+"""
+Per-tenant identification, usage accounting and quotas.
+
+Callers identify themselves with an API key (the X-API-Key header) that maps
+to a tenant. Each tenant can have daily quotas on model calls and tokens and
+a cap on its model calls in flight, so one team's bulk job queues behind its
+own cap instead of taking every upstream slot from interactive traffic.
+
+Usage (model calls, prompt and response tokens from the model's usage
+metadata, upstream latency and failures) is counted in memory per tenant and
+UTC day and flushed to a UsageStore in one batched write every
+USAGE_FLUSH_SECONDS rather than once per request. Quotas are checked against
+the stored totals, which every worker process writing to the same store
+shares, plus this process's unflushed usage; other workers' traffic is
+therefore seen up to one flush interval late.
+"""
+
+import asyncio
+import logging
+import sqlite3
+import threading
+import time
+from contextlib import nullcontext
+from contextvars import ContextVar
+from typing import Dict, NamedTuple, Optional, Tuple
+
+from fastapi import HTTPException
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TENANT = "default"
+
+# Tenant the current request or job is accounted to. Work not started by a
+# caller, such as the greeting pool refresh, runs as the default tenant.
+tenant_var: ContextVar[str] = ContextVar("tenant", default=DEFAULT_TENANT)
+
+
+class QuotaExceededError(HTTPException):
+    def __init__(self, tenant: str, limit: str, retry_after: float):
+        super().__init__(
+            status_code=429,
+            detail=f"Quota exceeded for tenant {tenant}: {limit}",
+            headers={"Retry-After": str(max(1, int(retry_after + 0.999)))},
+        )
+
+
+class TenantLimits(NamedTuple):
+    """Per-tenant limits; 0 disables a limit."""
+    requests_per_day: int = 0
+    tokens_per_day: int = 0
+    max_concurrency: int = 0
+
+
+class Usage:
+    """Usage counters for one tenant over one day."""
+
+    FIELDS = ("requests", "errors", "prompt_tokens", "response_tokens", "latency_seconds")
+
+    def __init__(self, requests=0, errors=0, prompt_tokens=0, response_tokens=0, latency_seconds=0.0):
+        self.requests = requests
+        self.errors = errors
+        self.prompt_tokens = prompt_tokens
+        self.response_tokens = response_tokens
+        self.latency_seconds = latency_seconds
+
+    @property
+    def tokens(self) -> int:
+        return self.prompt_tokens + self.response_tokens
+
+    def add(self, other: Optional["Usage"]) -> "Usage":
+        if other is not None:
+            for field in self.FIELDS:
+                setattr(self, field, getattr(self, field) + getattr(other, field))
+        return self
+
+    def as_dict(self) -> dict:
+        return {field: getattr(self, field) for field in self.FIELDS}
+
+
+def today() -> str:
+    return time.strftime("%Y-%m-%d", time.gmtime())
+
+
+def _seconds_until_tomorrow() -> float:
+    return 86400 - time.time() % 86400
+
+
+class UsageStore:
+    """Interface for where flushed usage is kept. Methods are blocking and run off the event loop."""
+
+    def add(self, rows: Dict[Tuple[str, str], Usage]) -> None:
+        """Add usage keyed by (day, tenant) to the stored totals."""
+        raise NotImplementedError
+
+    def totals(self, day: str) -> Dict[str, Usage]:
+        """Stored usage per tenant for ``day``."""
+        raise NotImplementedError
+
+    def close(self) -> None:
+        pass
+
+
+class SQLiteUsageStore(UsageStore):
+    """
+    Usage totals in a local SQLite database, one row per tenant and day.
+
+    Each flush is a single transaction of upserts. The database is opened in
+    WAL mode so several worker processes on one host can share the file.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            conn = sqlite3.connect(self.path, timeout=30.0, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS tenant_usage ("
+                " day TEXT NOT NULL, tenant TEXT NOT NULL,"
+                " requests INTEGER NOT NULL DEFAULT 0, errors INTEGER NOT NULL DEFAULT 0,"
+                " prompt_tokens INTEGER NOT NULL DEFAULT 0, response_tokens INTEGER NOT NULL DEFAULT 0,"
+                " latency_seconds REAL NOT NULL DEFAULT 0,"
+                " PRIMARY KEY (day, tenant))"
+            )
+            self._conn = conn
+        return self._conn
+
+    def add(self, rows: Dict[Tuple[str, str], Usage]) -> None:
+        with self._lock:
+            conn = self._connect()
+            with conn:
+                conn.executemany(
+                    "INSERT INTO tenant_usage VALUES (?, ?, ?, ?, ?, ?, ?)"
+                    " ON CONFLICT (day, tenant) DO UPDATE SET"
+                    " requests = requests + excluded.requests,"
+                    " errors = errors + excluded.errors,"
+                    " prompt_tokens = prompt_tokens + excluded.prompt_tokens,"
+                    " response_tokens = response_tokens + excluded.response_tokens,"
+                    " latency_seconds = latency_seconds + excluded.latency_seconds",
+                    [
+                        (day, tenant, usage.requests, usage.errors, usage.prompt_tokens,
+                         usage.response_tokens, usage.latency_seconds)
+                        for (day, tenant), usage in rows.items()
+                    ],
+                )
+
+    def totals(self, day: str) -> Dict[str, Usage]:
+        with self._lock:
+            rows = self._connect().execute(
+                "SELECT tenant, requests, errors, prompt_tokens, response_tokens, latency_seconds"
+                " FROM tenant_usage WHERE day = ?",
+                (day,),
+            ).fetchall()
+        return {row[0]: Usage(*row[1:]) for row in rows}
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+class Tenants:
+    """
+    API-key authentication, per-tenant limits and usage accounting.
+
+    With no API keys configured, authentication is off and every caller is
+    the default tenant.
+
+    Attributes:
+        api_keys (Dict[str, str]): API key -> tenant name.
+        default_limits (TenantLimits): Limits for tenants without their own.
+        store (Optional[UsageStore]): Where usage is flushed; None keeps it in memory only.
+        flush_interval (float): Seconds between batched flushes.
+    """
+
+    def __init__(
+        self,
+        api_keys: Optional[Dict[str, str]] = None,
+        default_limits: TenantLimits = TenantLimits(),
+        limits: Optional[Dict[str, TenantLimits]] = None,
+        store: Optional[UsageStore] = None,
+        flush_interval: float = 10.0
+    ):
+        self.api_keys = dict(api_keys or {})
+        self.default_limits = default_limits
+        self._limits = dict(limits or {})
+        self.store = store
+        self.flush_interval = flush_interval
+        # Usage keyed by (day, tenant): not yet flushed, being flushed, and
+        # the store's totals for _stored_day as of the last flush
+        self._pending: Dict[Tuple[str, str], Usage] = {}
+        self._flushing: Dict[Tuple[str, str], Usage] = {}
+        self._stored: Dict[str, Usage] = {}
+        self._stored_day = today()
+        self._slots: Dict[str, asyncio.Semaphore] = {}
+        self._flush_lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+
+    @classmethod
+    def from_settings(cls, settings) -> "Tenants":
+        default_limits = TenantLimits(
+            settings.TENANT_REQUESTS_PER_DAY, settings.TENANT_TOKENS_PER_DAY, settings.TENANT_MAX_CONCURRENCY
+        )
+        limits = {
+            tenant: default_limits._replace(**overrides) for tenant, overrides in settings.TENANT_LIMITS.items()
+        }
+        return cls(
+            api_keys=settings.API_KEYS,
+            default_limits=default_limits,
+            limits=limits,
+            store=create_usage_store(settings),
+            flush_interval=settings.USAGE_FLUSH_SECONDS,
+        )
+
+    def authenticate(self, api_key: Optional[str]) -> str:
+        """The tenant owning ``api_key``; raises 401 for a missing or unknown key."""
+        if not self.api_keys:
+            return DEFAULT_TENANT
+        tenant = self.api_keys.get(api_key) if api_key else None
+        if tenant is None:
+            raise HTTPException(
+                status_code=401, detail="Missing or invalid API key", headers={"WWW-Authenticate": "X-API-Key"}
+            )
+        return tenant
+
+    def limits(self, tenant: str) -> TenantLimits:
+        return self._limits.get(tenant, self.default_limits)
+
+    def usage(self, tenant: str) -> Usage:
+        """The tenant's usage today: stored totals plus this process's unflushed usage."""
+        day = today()
+        usage = Usage()
+        if self._stored_day == day:
+            usage.add(self._stored.get(tenant))
+        usage.add(self._flushing.get((day, tenant)))
+        return usage.add(self._pending.get((day, tenant)))
+
+    def check(self, tenant: str) -> None:
+        """Raise QuotaExceededError if the tenant has used up a daily quota."""
+        limits = self.limits(tenant)
+        if not (limits.requests_per_day or limits.tokens_per_day):
+            return
+        usage = self.usage(tenant)
+        if limits.requests_per_day and usage.requests >= limits.requests_per_day:
+            raise QuotaExceededError(tenant, "requests_per_day", _seconds_until_tomorrow())
+        if limits.tokens_per_day and usage.tokens >= limits.tokens_per_day:
+            raise QuotaExceededError(tenant, "tokens_per_day", _seconds_until_tomorrow())
+
+    def slot(self, tenant: str):
+        """Async context manager holding one of the tenant's in-flight model call slots."""
+        limit = self.limits(tenant).max_concurrency
+        if limit <= 0:
+            return nullcontext()
+        slot = self._slots.get(tenant)
+        if slot is None:
+            slot = self._slots[tenant] = asyncio.Semaphore(limit)
+        return slot
+
+    def record(
+        self,
+        tenant: str,
+        prompt_tokens: int = 0,
+        response_tokens: int = 0,
+        latency: float = 0.0,
+        failed: bool = False,
+        requests: int = 1
+    ) -> None:
+        """Count a model call against the tenant; ``requests=0`` adds tokens to the last one."""
+        key = (today(), tenant)
+        usage = self._pending.get(key)
+        if usage is None:
+            usage = self._pending[key] = Usage()
+        usage.requests += requests
+        usage.errors += failed
+        usage.prompt_tokens += prompt_tokens
+        usage.response_tokens += response_tokens
+        usage.latency_seconds += latency
+
+    async def flush(self) -> None:
+        """Write unflushed usage to the store in one batch and refresh today's totals."""
+        day = today()
+        if self.store is None:
+            # Nothing to flush to; just forget previous days
+            self._pending = {key: usage for key, usage in self._pending.items() if key[0] == day}
+            return
+        async with self._flush_lock:
+            self._flushing, self._pending = self._pending, {}
+            try:
+                totals = await asyncio.to_thread(self._write, self._flushing, day)
+            except Exception as e:
+                logger.warning("Flushing tenant usage failed, keeping it for the next flush: %s", e)
+                for key, usage in self._flushing.items():
+                    self._pending[key] = usage.add(self._pending.get(key))
+                return
+            finally:
+                self._flushing = {}
+            self._stored, self._stored_day = totals, day
+
+    def _write(self, rows: Dict[Tuple[str, str], Usage], day: str) -> Dict[str, Usage]:
+        if rows:
+            self.store.add(rows)
+        return self.store.totals(day)
+
+    async def _run(self) -> None:
+        while True:
+            await self.flush()
+            await asyncio.sleep(self.flush_interval)
+
+    def start(self) -> None:
+        """Load today's stored usage and start periodic flushing on the running event loop."""
+        if self.store is not None and (self._task is None or self._task.done()):
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stop periodic flushing and write out the remaining usage."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+        if self.store is not None:
+            self.store.close()
+
+
+def tenants_configured(settings) -> bool:
+    """Whether any setting makes per-tenant usage worth persisting."""
+    return bool(
+        settings.API_KEYS or settings.TENANT_REQUESTS_PER_DAY or settings.TENANT_TOKENS_PER_DAY
+        or settings.TENANT_LIMITS
+    )
+
+
+def create_usage_store(settings) -> Optional[UsageStore]:
+    """Build the usage store configured in settings (None for "none", or "auto" without tenants)."""
+    backend_name = settings.USAGE_BACKEND.lower()
+    if backend_name == "auto":
+        backend_name = "sqlite" if tenants_configured(settings) else "none"
+    if backend_name == "sqlite":
+        return SQLiteUsageStore(settings.USAGE_DB_PATH)
+    if backend_name == "none":
+        return None
+    raise ValueError(f"Unknown USAGE_BACKEND: {settings.USAGE_BACKEND}")
@@ -0,0 +1,321 @@
+"""
+Thread memory for multi-turn email replies.
+
+In thread mode a client sends only the newest email of a conversation with
+a thread ID instead of the whole quoted thread. Each turn (the email
+received and the reply sent) is stored, and the prompt is built from a
+rolling summary of the older turns plus the last few messages verbatim, so
+its size stays bounded however long the thread gets.
+
+The summary is updated incrementally in the background after a reply: once
+more than ``recent_messages`` messages are unsummarized, the older ones are
+folded into the existing summary with one small model call and then
+deleted, which keeps the store compact. Until that call finishes, the
+unsummarized messages are sent verbatim, within the prompt token budget.
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import sqlite3
+import threading
+import time
+from typing import Awaitable, Callable, Dict, List, NamedTuple, Optional, Set
+
+from app.templates.prompts import estimate_tokens
+
+logger = logging.getLogger(__name__)
+
+RECEIVED = "received"
+SENT = "sent"
+
+
+class ThreadMessage(NamedTuple):
+    seq: int
+    role: str
+    text: str
+    created_at: float
+    # For a sent reply: fingerprint of the request it answered. The newest
+    # message is never summarized away, so a retry of the last turn is
+    # recognised however small the recent window is
+    fingerprint: str = ""
+
+
+class ThreadState(NamedTuple):
+    """A thread's summary of messages up to ``summarized_through`` and the messages after it."""
+    summary: str = ""
+    summarized_through: int = 0
+    messages: List[ThreadMessage] = []
+
+
+class ThreadStore:
+    """Interface for thread storage. Methods are blocking and run off the event loop."""
+
+    def load(self, thread_id: str) -> ThreadState:
+        raise NotImplementedError
+
+    def append(self, thread_id: str, messages: List[tuple]) -> None:
+        """Append (role, text, fingerprint) messages in order."""
+        raise NotImplementedError
+
+    def save_summary(self, thread_id: str, summary: str, through: int) -> None:
+        """Store the summary covering messages up to ``through`` and delete those messages."""
+        raise NotImplementedError
+
+    def delete(self, thread_id: str) -> bool:
+        raise NotImplementedError
+
+    def close(self) -> None:
+        pass
+
+
+class SQLiteThreadStore(ThreadStore):
+    """
+    Threads in a local SQLite database: one row per unsummarized message and
+    one per thread summary. Opened in WAL mode so worker processes on one
+    host can share the file.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            conn = sqlite3.connect(self.path, timeout=30.0, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS thread_messages ("
+                " thread_id TEXT NOT NULL, seq INTEGER NOT NULL, role TEXT NOT NULL,"
+                " text TEXT NOT NULL, created_at REAL NOT NULL, fingerprint TEXT NOT NULL DEFAULT '',"
+                " PRIMARY KEY (thread_id, seq))"
+            )
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(thread_messages)")}
+            if "fingerprint" not in columns:
+                # Databases created before turns were fingerprinted
+                conn.execute("ALTER TABLE thread_messages ADD COLUMN fingerprint TEXT NOT NULL DEFAULT ''")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS thread_summaries ("
+                " thread_id TEXT PRIMARY KEY, summary TEXT NOT NULL,"
+                " summarized_through INTEGER NOT NULL, updated_at REAL NOT NULL)"
+            )
+            self._conn = conn
+        return self._conn
+
+    def load(self, thread_id: str) -> ThreadState:
+        with self._lock:
+            conn = self._connect()
+            row = conn.execute(
+                "SELECT summary, summarized_through FROM thread_summaries WHERE thread_id = ?", (thread_id,)
+            ).fetchone()
+            messages = conn.execute(
+                "SELECT seq, role, text, created_at, fingerprint FROM thread_messages WHERE thread_id = ? ORDER BY seq",
+                (thread_id,),
+            ).fetchall()
+        summary, through = row or ("", 0)
+        return ThreadState(summary, through, [ThreadMessage(*message) for message in messages])
+
+    def append(self, thread_id: str, messages: List[tuple]) -> None:
+        with self._lock:
+            conn = self._connect()
+            with conn:
+                last = conn.execute(
+                    "SELECT MAX(seq) FROM thread_messages WHERE thread_id = ?", (thread_id,)
+                ).fetchone()[0]
+                if last is None:
+                    row = conn.execute(
+                        "SELECT summarized_through FROM thread_summaries WHERE thread_id = ?", (thread_id,)
+                    ).fetchone()
+                    last = row[0] if row else 0
+                now = time.time()
+                conn.executemany(
+                    "INSERT INTO thread_messages (thread_id, seq, role, text, created_at, fingerprint)"
+                    " VALUES (?, ?, ?, ?, ?, ?)",
+                    [
+                        (thread_id, last + index, role, text, now, fingerprint)
+                        for index, (role, text, fingerprint) in enumerate(messages, 1)
+                    ],
+                )
+
+    def save_summary(self, thread_id: str, summary: str, through: int) -> None:
+        with self._lock:
+            conn = self._connect()
+            with conn:
+                conn.execute(
+                    "INSERT INTO thread_summaries VALUES (?, ?, ?, ?)"
+                    " ON CONFLICT (thread_id) DO UPDATE SET summary = excluded.summary,"
+                    " summarized_through = excluded.summarized_through, updated_at = excluded.updated_at",
+                    (thread_id, summary, through, time.time()),
+                )
+                conn.execute("DELETE FROM thread_messages WHERE thread_id = ? AND seq <= ?", (thread_id, through))
+
+    def delete(self, thread_id: str) -> bool:
+        with self._lock:
+            conn = self._connect()
+            with conn:
+                deleted = conn.execute("DELETE FROM thread_messages WHERE thread_id = ?", (thread_id,)).rowcount
+                deleted += conn.execute("DELETE FROM thread_summaries WHERE thread_id = ?", (thread_id,)).rowcount
+        return deleted > 0
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+class MemoryThreadStore(ThreadStore):
+    """Threads in process memory; lost on restart and not shared between workers."""
+
+    def __init__(self):
+        self._threads: Dict[str, ThreadState] = {}
+
+    def load(self, thread_id: str) -> ThreadState:
+        state = self._threads.get(thread_id, ThreadState())
+        return state._replace(messages=list(state.messages))
+
+    def append(self, thread_id: str, messages: List[tuple]) -> None:
+        state = self._threads.get(thread_id, ThreadState())
+        last = state.messages[-1].seq if state.messages else state.summarized_through
+        now = time.time()
+        added = [
+            ThreadMessage(last + index, role, text, now, fingerprint)
+            for index, (role, text, fingerprint) in enumerate(messages, 1)
+        ]
+        self._threads[thread_id] = state._replace(messages=state.messages + added)
+
+    def save_summary(self, thread_id: str, summary: str, through: int) -> None:
+        state = self._threads.get(thread_id, ThreadState())
+        self._threads[thread_id] = ThreadState(
+            summary, through, [message for message in state.messages if message.seq > through]
+        )
+
+    def delete(self, thread_id: str) -> bool:
+        return self._threads.pop(thread_id, None) is not None
+
+
+def turn_fingerprint(email: str, prompt: str, message_type: str, user_name: Optional[str]) -> str:
+    """Identify a thread-mode request, so a retried turn can be told apart from a new one."""
+    payload = json.dumps([email, prompt, message_type.lower(), user_name or ""])
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def format_messages(messages: List[ThreadMessage]) -> str:
+    return "\n".join(f"[{message.role.title()}] {message.text.strip()}" for message in messages)
+
+
+def recent_history(messages: List[ThreadMessage], budget: int) -> str:
+    """The newest messages that fit in ``budget`` estimated tokens (0 for no limit), oldest first."""
+    kept, used = [], 0
+    for message in reversed(messages):
+        cost = estimate_tokens(message.text)
+        if budget and kept and used + cost > budget:
+            break
+        kept.append(message)
+        used += cost
+    omitted = len(messages) - len(kept)
+    text = format_messages(kept[::-1])
+    if omitted:
+        text = f"[{omitted} earlier message{'s' if omitted != 1 else ''} omitted]\n{text}"
+    return text or "None"
+
+
+class ThreadMemory:
+    """
+    Stored turns and rolling summaries for email threads.
+
+    Attributes:
+        store (ThreadStore): Where messages and summaries live.
+        recent_messages (int): Messages kept verbatim before older ones are summarized.
+    """
+
+    def __init__(
+        self,
+        store: ThreadStore,
+        summarize: Callable[[str, List[ThreadMessage]], Awaitable[str]],
+        recent_messages: int = 4
+    ):
+        self.store = store
+        self._summarize = summarize
+        self.recent_messages = max(1, recent_messages)
+        self._summarizing: Set[str] = set()
+        self._tasks: Set[asyncio.Task] = set()
+        self.summaries = 0
+        self.summary_failures = 0
+
+    @classmethod
+    def from_settings(cls, settings, summarize) -> Optional["ThreadMemory"]:
+        """The configured thread memory, or None when THREAD_BACKEND is "none"."""
+        store = create_thread_store(settings)
+        if store is None:
+            return None
+        return cls(store, summarize, settings.THREAD_RECENT_MESSAGES)
+
+    async def load(self, thread_id: str) -> ThreadState:
+        return await asyncio.to_thread(self.store.load, thread_id)
+
+    async def record_turn(self, thread_id: str, email: str, reply: str, fingerprint: str = "") -> None:
+        """
+        Store a received email and the reply sent to it, with the fingerprint
+        of the request it answered, then summarize in the background if due.
+        """
+        await asyncio.to_thread(
+            self.store.append, thread_id, [(RECEIVED, email, ""), (SENT, reply, fingerprint)]
+        )
+        self._schedule_summary(thread_id)
+
+    async def delete(self, thread_id: str) -> bool:
+        return await asyncio.to_thread(self.store.delete, thread_id)
+
+    def _schedule_summary(self, thread_id: str) -> None:
+        if thread_id in self._summarizing:
+            return
+        self._summarizing.add(thread_id)
+        task = asyncio.create_task(self.summarize(thread_id))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def summarize(self, thread_id: str) -> None:
+        """Fold the messages older than the recent window into the thread's summary."""
+        try:
+            state = await self.load(thread_id)
+            older = state.messages[:-self.recent_messages]
+            if not older:
+                return
+            summary = await self._summarize(state.summary, older)
+            await asyncio.to_thread(self.store.save_summary, thread_id, summary, older[-1].seq)
+            self.summaries += 1
+        except Exception as e:
+            # The messages stay verbatim and are retried after the next turn
+            self.summary_failures += 1
+            logger.warning("Summarizing thread %s failed: %s", thread_id, e)
+        finally:
+            self._summarizing.discard(thread_id)
+
+    async def settle(self, timeout: Optional[float] = None) -> bool:
+        """Wait up to ``timeout`` seconds for background summaries; False if some are still running."""
+        if self._tasks:
+            _, pending = await asyncio.wait(set(self._tasks), timeout=timeout)
+            return not pending
+        return True
+
+    async def stop(self, timeout: float = 5.0) -> None:
+        """Let running summaries finish for up to ``timeout`` seconds, then close the store."""
+        if not await self.settle(timeout):
+            for task in list(self._tasks):
+                task.cancel()
+        self.store.close()
+
+
+def create_thread_store(settings) -> Optional[ThreadStore]:
+    """Build the thread store configured in settings (None for "none")."""
+    backend_name = settings.THREAD_BACKEND.lower()
+    if backend_name == "sqlite":
+        return SQLiteThreadStore(settings.THREAD_DB_PATH)
+    if backend_name == "memory":
+        return MemoryThreadStore()
+    if backend_name == "none":
+        return None
+    raise ValueError(f"Unknown THREAD_BACKEND: {settings.THREAD_BACKEND}")
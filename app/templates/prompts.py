@@ -0,0 +1,390 @@
+"""
+Precompiled prompt registry for the AI Message Response System.
+
+Each prompt is split once, at import time, into a static prefix (task,
+instructions and examples, identical for every request) and a small body
+template whose slots are filled per request. Only the body is rendered on
+the request path; the prefix is sent as its own leading part so it can be
+served from the model's context cache.
+"""
+
+import hashlib
+from typing import Dict, List
+
+from app.templates.templates import MessageType, MESSAGE_TEMPLATES, PromptTemplate
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token estimate (about four characters per token)."""
+    return max(1, len(text) // 4)
+
+
+class RenderedPrompt:
+    """
+    A prompt ready to send: the template's static prefix plus a rendered body.
+
+    Attributes:
+        name (str): Registry name of the template.
+        prefix (str): Static instructions shared by every request.
+        body (str): Per-request portion.
+    """
+
+    __slots__ = ("template", "body")
+
+    def __init__(self, template: "CompiledPrompt", body: str):
+        self.template = template
+        self.body = body
+
+    @property
+    def name(self) -> str:
+        return self.template.name
+
+    @property
+    def prefix(self) -> str:
+        return self.template.prefix
+
+    @property
+    def operation(self) -> str:
+        return self.template.operation
+
+    @property
+    def contents(self) -> List[str]:
+        """Model contents with the static prefix as a separate leading part."""
+        return [self.prefix, self.body]
+
+    @property
+    def cache_text(self) -> str:
+        """Text identifying this prompt for response caching, without rehashing the prefix."""
+        return f"{self.name}:{self.template.fingerprint}\n{self.body}"
+
+    @property
+    def estimated_tokens(self) -> int:
+        return self.template.prefix_tokens + estimate_tokens(self.body)
+
+    def __str__(self) -> str:
+        return f"{self.prefix}\n\n{self.body}"
+
+
+class CompiledPrompt:
+    """
+    A registered prompt: static prefix plus a compiled body template.
+
+    Attributes:
+        name (str): Registry name.
+        prefix (str): Static instruction/example text.
+        body (PromptTemplate): Template for the per-request portion.
+        fingerprint (str): Short hash of the prefix, changing whenever it is edited.
+        prefix_tokens (int): Estimated token count of the prefix.
+        operation (str): Service operation the prompt belongs to, used as a metrics label.
+    """
+
+    def __init__(self, name: str, prefix: str, body: str, operation: str):
+        self.name = name
+        self.operation = operation
+        self.prefix = prefix.strip()
+        self.body = PromptTemplate(body.strip())
+        self.fingerprint = hashlib.sha256(self.prefix.encode("utf-8")).hexdigest()[:12]
+        self.prefix_tokens = estimate_tokens(self.prefix)
+
+    def render(self, **values) -> RenderedPrompt:
+        return RenderedPrompt(self, self.body.format(**values))
+
+
+class PromptRegistry:
+    """Holds every compiled prompt by name."""
+
+    def __init__(self):
+        self._prompts: Dict[str, CompiledPrompt] = {}
+
+    def register(self, name: str, prefix: str, body: str, operation: str) -> CompiledPrompt:
+        prompt = CompiledPrompt(name, prefix, body, operation)
+        self._prompts[name] = prompt
+        return prompt
+
+    def get(self, name: str) -> CompiledPrompt:
+        return self._prompts[name]
+
+    def __iter__(self):
+        return iter(self._prompts.values())
+
+    def token_counts(self) -> Dict[str, dict]:
+        """Estimated prefix tokens and slots for every registered prompt."""
+        return {
+            prompt.name: {
+                "prefix_tokens": prompt.prefix_tokens,
+                "body_template_tokens": estimate_tokens(prompt.body.template),
+                "slots": list(prompt.body.input_variables),
+            }
+            for prompt in self
+        }
+
+
+def prompt_contents(prompt):
+    """Model contents for a prompt given either as a string or a RenderedPrompt."""
+    return prompt.contents if isinstance(prompt, RenderedPrompt) else prompt
+
+
+PROMPTS = PromptRegistry()
+
+GREETING_NAMED = PROMPTS.register(
+    "greeting_named",
+    operation="greet_user",
+    prefix="""
+Task: Generate a warm, friendly greeting
+
+Instructions:
+1. Create a personalized greeting that addresses the recipient directly by name
+2. The tone should be friendly and welcoming
+3. Offer assistance or ask how you can help
+4. Keep the response concise and natural
+
+Example format:
+"Hi [Name]! It's great to meet you. I'm here to help with [context]. What can I assist you with today?"
+""",
+    body="""
+Context:
+- Recipient's name: {user_name}
+- Initial message: {message}
+""",
+)
+
+GREETING_ANONYMOUS = PROMPTS.register(
+    "greeting_anonymous",
+    operation="greet_user",
+    prefix="""
+Task: Generate a warm, friendly greeting
+
+Instructions:
+1. Create a friendly, generic greeting
+2. Offer assistance or ask how you can help
+3. Keep the response concise and welcoming
+4. Do not mention a specific name
+
+Example format:
+"Hello there! I'm ready to help. What can I assist you with today?"
+""",
+    body="""
+Context:
+- Initial message: {message}
+""",
+)
+
+GREETING_TEMPLATE = PROMPTS.register(
+    "greeting_template",
+    operation="greet_user",
+    prefix="""
+Task: Write a reusable, warm, friendly greeting
+
+Instructions:
+1. Greet the recipient and offer assistance or ask how you can help
+2. Match the style given below
+3. Keep the response concise and natural, at most two sentences
+4. If a name placeholder is given, use it exactly once, character for character, where the recipient's name belongs
+5. If the name placeholder is "none", do not mention any name
+6. Output only the greeting text, without quotes
+
+Example format:
+"Hi {user_name}! It's great to meet you. What can I assist you with today?"
+""",
+    body="""
+Style: {style}
+Name placeholder: {placeholder}
+Initial message: {message}
+""",
+)
+
+WRITE_MESSAGE = PROMPTS.register(
+    "write_message",
+    operation="write_message",
+    prefix="""
+Task: Convert the Following Message into a Professional Email
+
+Instructions:
+1. Format the message into a complete email structure
+2. Maintain the message's core intent
+3. Use the sender's information given with the message
+4. Match the tone to the message type given with the message
+
+Email Requirements:
+- Include a subject line that reflects the message's intent
+- Body must:
+   - Start with a greeting (e.g., "Dear Team,")
+   - Include the original message as the core content
+   - End with a professional sign-off using the sender's name
+- Output strictly in JSON format with these keys: "email", "subject", "body"
+
+Example Input:
+{
+    "type": "formal",
+    "user_message": "Thank you for attending my party last night.",
+    "email": "okey@example.com",
+    "user_name": "Okey"
+}
+
+Example Output:
+{
+    "subject": "Appreciation for Attending My Party",
+    "body": "Dear Friend,\\n\\nThank you for attending my party last night. Your presence made the event even more special, and I truly appreciate you taking the time to join me.\\n\\nBest regards,\\nOkey"
+}
+
+Example Input:
+{
+    "type": "casual",
+    "user_message": "Thanks for coming to my party last night!",
+    "email": "alex@example.com",
+    "user_name": "Alex"
+}
+
+Example Output:
+{
+    "subject": "Thanks for Coming to My Party",
+    "body": "Hey [Friend's Name],\\n\\nThanks for coming to my party last night! It was so much fun having you there, and I really appreciate it.\\n\\nCheers,\\nAlex"
+}
+
+CRITICAL NOTES:
+- Do NOT respond to the message - format it into an email
+- Use the provided email and name exactly as given
+- Ensure valid JSON with all required fields
+- The original message must be the central content of the body
+- Keep the email structure natural and conversational
+""",
+    body="""
+With this prompt: {prompt}
+Original Message: "{user_message}"
+
+Sender's information:
+- Email: {email}
+- Sender's Name: {user_name} (if provided)
+Message type: {message_type}
+""",
+)
+
+RESPOND_MESSAGE = PROMPTS.register(
+    "respond_message",
+    operation="respond_message",
+    prefix="""
+Task: Generate a Precise Email Response
+
+Response Generation Criteria:
+1. Input Context:
+   - The original email, user prompt, desired tone and sender's name are given below
+
+2. Structural Requirements:
+   - Omit any "Subject:" line
+   - Begin with an appropriate, context-specific greeting
+   - Directly address the content of the original email
+   - Incorporate the user's prompt seamlessly
+   - Conclude with a professional sign-off
+
+3. Signature Guidelines:
+   - Prioritize detecting a name from the original email
+   - If no name is detected, use the sender's name given below as the signature
+   - If no user name is available, use a generic "Team" signature
+
+4. Tone Adaptation:
+   - Maintain the desired communication style given below
+   - Ensure professional and clear language
+   - Match the emotional tenor of the original email
+
+5. Response Template:
+   [Greeting],
+
+   [Response Content Addressing Original Email and Prompt]
+
+   Best regards,
+   [Signature Name]
+
+Practical Example:
+Original Email: "Hi Okey, I need an update on the project status."
+Prompt: "AI integration is complete, preparing for GitHub push"
+Response: "Hi Okey,
+
+Thanks for checking in about the project status. The AI integration is now complete, and I'm currently preparing for the GitHub repository push. I'll send a detailed update once everything is live.
+
+Best regards,
+[Signature Name]"
+""",
+    body="""
+Input Context:
+- Original Email: "{email}"
+- User Prompt: "{prompt}"
+- Desired Tone: {message_type}
+- Sender's Name Reference: {user_name}
+""",
+)
+
+# Thread mode reuses the respond_message instructions with the conversation
+# so far ahead of the email being answered
+RESPOND_THREAD = PROMPTS.register(
+    "respond_thread",
+    operation="respond_message",
+    prefix=RESPOND_MESSAGE.prefix + """
+
+Thread Context:
+- The email is the latest message in a thread; a summary of the earlier conversation and the most recent messages are given below, oldest first
+- "[Received]" messages were sent to the user and "[Sent]" messages are the user's own replies
+- Use the thread only as context: reply to the original email, stay consistent with what the user already said and do not repeat it
+""",
+    body="""
+Input Context:
+- Thread Summary: {summary}
+- Recent Messages:
+{history}
+- Original Email: "{email}"
+- User Prompt: "{prompt}"
+- Desired Tone: {message_type}
+- Sender's Name Reference: {user_name}
+""",
+)
+
+THREAD_SUMMARY = PROMPTS.register(
+    "thread_summary",
+    operation="summarize_thread",
+    prefix="""
+Task: Update the Running Summary of an Email Thread
+
+Instructions:
+1. Merge the new messages below into the current summary
+2. Keep who asked or promised what, decisions, dates, figures and open questions
+3. Drop greetings, sign-offs, pleasantries and anything already in the summary
+4. "[Received]" messages were sent to the user and "[Sent]" messages are the user's replies
+5. Write plain third-person prose within the word limit, and output only the summary
+""",
+    body="""
+Word limit: {words}
+Current summary: {summary}
+New messages:
+{messages}
+""",
+)
+
+JSON_REPAIR = PROMPTS.register(
+    "json_repair",
+    operation="json_repair",
+    prefix="""
+Task: Repair a Malformed JSON Reply
+
+Instructions:
+1. The text below was meant to be a single JSON object but could not be parsed or is missing fields
+2. Return that object as valid JSON with exactly the required keys
+3. Keep the original wording of every value; do not rewrite, shorten or add content
+4. Output only the JSON object, with no Markdown fences or commentary
+""",
+    body="""
+Required keys: {fields}
+Problem: {error}
+Text:
+{text}
+""",
+)
+
+# The tone instruction refers to the message instead of repeating it, so the
+# user's message appears in the write_message prompt exactly once
+ORIGINAL_MESSAGE_REFERENCE = 'the "Original Message" below'
+
+
+def get_tone_template(message_type: str) -> PromptTemplate:
+    try:
+        return MESSAGE_TEMPLATES[MessageType(message_type)]
+    except ValueError:
+        return MESSAGE_TEMPLATES[MessageType.CUSTOM]
@@ -3,7 +3,8 @@ Message templates and types for generating AI responses in the Message Response
 """
 
 from enum import Enum
-from langchain.prompts import PromptTemplate
+from string import Formatter
+from typing import List, Optional, Tuple
 
 # ... Define MessageType enum for different message styles
 class MessageType(str, Enum):
@@ -11,6 +12,46 @@ class MessageType(str, Enum):
     CASUAL = "casual"
     CUSTOM = "custom"
 
+
+class PromptTemplate:
+    """
+    Lightweight ``str.format``-style template, parsed once into literals and slots.
+
+    Mirrors the small part of LangChain's PromptTemplate this project used,
+    without importing LangChain on the request path.
+
+    Attributes:
+        template (str): The source template.
+        input_variables (List[str]): Names of the variable slots, in order.
+    """
+
+    def __init__(self, template: str, input_variables: Optional[List[str]] = None):
+        self.template = template
+        self._parts: List[str] = []
+        self._slot_positions: List[Tuple[int, str]] = []
+        for literal, field, spec, conversion in Formatter().parse(template):
+            if literal:
+                self._parts.append(literal)
+            if field is None:
+                continue
+            if not field or spec or conversion:
+                raise ValueError(f"Unsupported template field in: {template!r}")
+            self._slot_positions.append((len(self._parts), field))
+            self._parts.append("")
+        self.input_variables = [name for _, name in self._slot_positions]
+        if input_variables is not None and set(input_variables) != set(self.input_variables):
+            raise ValueError(
+                f"input_variables {input_variables} do not match template slots {self.input_variables}"
+            )
+
+    def format(self, **values) -> str:
+        parts = self._parts.copy()
+        for position, name in self._slot_positions:
+            value = values[name]
+            parts[position] = value if isinstance(value, str) else str(value)
+        return "".join(parts)
+
+
 # ... Define message templates for each message type
 MESSAGE_TEMPLATES = {
     MessageType.FORMAL: PromptTemplate(
@@ -25,4 +66,4 @@ MESSAGE_TEMPLATES = {
         input_variables=["custom_message"],
         template="{custom_message}"
     )
-}
\ No newline at end of file
+}
@@ -0,0 +1,80 @@
+"""
+Standalone job worker for the submit/poll job queue.
+
+Consumes jobs submitted through the `/write_message/jobs` and
+`/respond_message/jobs` endpoints and runs them through AIService, so
+generation can be scaled independently of the API tier. Needs a queue
+shared between processes (JOB_QUEUE_BACKEND=redis); set JOB_WORKERS=0 on
+the API processes to leave all jobs to the workers.
+
+Usage:
+    python -m app.worker --concurrency 8
+"""
+
+import argparse
+import asyncio
+import logging
+import signal
+from typing import Awaitable, Callable
+
+from app.cli import run_request
+from app.config import get_settings
+from app.logging_config import configure_logging
+from app.services.jobs import JobWorkerPool, create_job_queue
+from app.services.services import AIService
+
+logger = logging.getLogger(__name__)
+
+
+def job_handler(service: AIService) -> Callable[[dict], Awaitable[dict]]:
+    """Run a job's request through the service method matching its kind."""
+    async def handle(job: dict) -> dict:
+        return await run_request(service, {**job["request"], "kind": job["kind"]}, job["use_cache"])
+    return handle
+
+
+async def run_worker(concurrency: int) -> None:
+    settings = get_settings()
+    if settings.JOB_QUEUE_BACKEND.lower() == "memory":
+        raise SystemExit("A separate worker process needs a shared queue: set JOB_QUEUE_BACKEND=redis")
+
+    service = AIService()
+    service.load_model()
+    if settings.UPSTREAM_WARMUP:
+        await service.warmup(settings.UPSTREAM_TIMEOUT_SECONDS)
+    service.state.start()
+    service.tenants.start()
+    queue = create_job_queue(settings)
+    pool = JobWorkerPool.from_settings(settings, queue, job_handler(service), concurrency=concurrency)
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+
+    pool.start()
+    logger.info("Job worker started with %d workers", pool.concurrency)
+    await stop.wait()
+    logger.info("Job worker stopping, letting running jobs finish")
+    await pool.stop(settings.SHUTDOWN_GRACE_SECONDS)
+    await queue.close()
+    await service.close()
+    await service.tenants.stop()
+    await service.state.stop()
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Run queued generation jobs.")
+    parser.add_argument("--concurrency", type=int, default=None,
+                        help="Jobs processed at once (default: JOB_WORKERS, or 4 if that is 0)")
+    args = parser.parse_args(argv)
+
+    settings = get_settings()
+    configure_logging(settings)
+    concurrency = args.concurrency or settings.JOB_WORKERS or 4
+    asyncio.run(run_worker(concurrency))
+    logger.info("Job worker stopped")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""
+Campaign mode versus one model call per recipient for bulk /write_message.
+
+Generates the same message for N recipients against the fake backend, once
+through ``run_batch`` with a ``generate_response`` call per recipient and
+once through ``run_campaign``, and reports model calls, wall time and the
+local rendering cost per recipient.
+
+Usage:
+    python -m benchmarks.bench_campaign --recipients 2000 --latency-ms 800
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import time
+
+os.environ.setdefault("GOOGLE_API_KEY", "benchmark")
+os.environ.setdefault("RATE_LIMIT_RPM", "0")
+os.environ.setdefault("RATE_LIMIT_TPM", "0")
+os.environ.setdefault("USAGE_BACKEND", "none")
+
+from app.services.backends import FakeBackend
+from app.services.batch import run_batch
+from app.services.campaigns import personalize, run_campaign
+from app.services.services import AIService
+
+
+def recipients(count: int) -> list:
+    return [{"email": f"user{i}@example.com", "user_name": f"User {i}"} for i in range(count)]
+
+
+async def per_recipient(service: AIService, people: list, concurrency: int) -> float:
+    started = time.perf_counter()
+    async for result in run_batch(
+        people,
+        lambda person: service.generate_response(
+            "formal", "Our office is closed on Monday", person["email"], person["user_name"], use_cache=False
+        ),
+        concurrency
+    ):
+        if result.error is not None:
+            raise result.error
+    return time.perf_counter() - started
+
+
+async def campaign(service: AIService, people: list) -> float:
+    started = time.perf_counter()
+    await run_campaign(
+        service.generate_response, "formal", "Our office is closed on Monday", people, use_cache=False
+    )
+    return time.perf_counter() - started
+
+
+def render_cost(people: list, repeat: int = 5) -> float:
+    draft = {"subject": "Office closed Monday", "body": "Dear Team,\n\nOur office is closed on Monday.\n\nBest regards,\n{user_name}"}
+    started = time.perf_counter()
+    for _ in range(repeat):
+        for person in people:
+            personalize(draft, person["email"], person["user_name"])
+    return (time.perf_counter() - started) / (repeat * len(people))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Campaign mode versus a model call per recipient.")
+    parser.add_argument("--recipients", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=64, help="Parallel calls in per-recipient mode")
+    parser.add_argument("--latency-ms", type=float, default=800.0, help="Fake backend median latency")
+    args = parser.parse_args()
+    logging.disable(logging.WARNING)
+
+    people = recipients(args.recipients)
+    for name in ("per-recipient", "campaign"):
+        backend = FakeBackend(latency_ms=args.latency_ms, latency_sigma=0.3, tokens_per_second=1000.0, seed=7)
+        service = AIService(backend=backend, cache=None, max_concurrency=args.concurrency)
+        if name == "campaign":
+            elapsed = asyncio.run(campaign(service, people))
+        else:
+            elapsed = asyncio.run(per_recipient(service, people, args.concurrency))
+        print(f"{name:>14}: {backend.calls:>6} model calls, {elapsed:>7.2f}s for {args.recipients} recipients")
+    print(f"local rendering: {render_cost(people) * 1e6:.1f} us per recipient")
+
+
+if __name__ == "__main__":
+    main()
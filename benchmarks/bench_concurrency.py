@@ -0,0 +1,74 @@
+"""
+Load benchmark for AIService concurrency.
+
+Drives AIService with a stubbed model that injects a fixed latency per call
+and reports throughput for several concurrency caps. With a non-blocking
+backend, throughput should scale roughly linearly with the cap until the
+number of in-flight requests is reached.
+
+Usage:
+    python -m benchmarks.bench_concurrency --requests 512 --latency 0.2
+"""
+
+import argparse
+import asyncio
+import os
+import time
+
+os.environ.setdefault("GOOGLE_API_KEY", "benchmark")
+
+from app.services.services import AIService
+
+
+class _StubResponse:
+    def __init__(self, text: str):
+        self.text = text
+
+
+class AsyncStubModel:
+    """Stub exposing the SDK's async generation path."""
+
+    def __init__(self, latency: float):
+        self.latency = latency
+
+    async def generate_content_async(self, prompt, **kwargs):
+        await asyncio.sleep(self.latency)
+        return _StubResponse("Hello there! What can I help you with today?")
+
+
+class SyncStubModel:
+    """Stub exposing only blocking generation, exercising the executor fallback."""
+
+    def __init__(self, latency: float):
+        self.latency = latency
+
+    def generate_content(self, prompt, **kwargs):
+        time.sleep(self.latency)
+        return _StubResponse("Hello there! What can I help you with today?")
+
+
+async def _run(model, cap: int, total: int) -> float:
+    service = AIService(model=model, max_concurrency=cap)
+    started = time.perf_counter()
+    await asyncio.gather(*(service.greet_user("Hello", "Okey") for _ in range(total)))
+    return time.perf_counter() - started
+
+
+async def main(total: int, latency: float, caps):
+    for label, model in (("async", AsyncStubModel(latency)), ("executor", SyncStubModel(latency))):
+        print(f"{label} backend, {total} requests, {latency * 1000:.0f}ms per call")
+        for cap in caps:
+            elapsed = await _run(model, cap, total)
+            print(f"  cap={cap:<4} elapsed={elapsed:7.2f}s throughput={total / elapsed:8.1f} req/s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--requests", type=int, default=256)
+    parser.add_argument("--latency", type=float, default=0.2)
+    parser.add_argument("--caps", type=int, nargs="+", default=[1, 8, 64, 256])
+    args = parser.parse_args()
+
+    import logging
+    logging.disable(logging.CRITICAL)
+    asyncio.run(main(args.requests, args.latency, args.caps))
@@ -0,0 +1,110 @@
+"""
+Tail latency of email_responder with and without request hedging.
+
+Drives AIService in-process against the fake backend with a heavy-tailed
+latency distribution: log-normal around the median plus a fraction of calls
+that stall for many times as long, like occasional slow upstream replies.
+Each configuration first warms the latency histograms, then reports
+p50/p95/p99/p99.9 latency and the extra upstream calls hedging cost.
+
+Usage:
+    python -m benchmarks.bench_hedging --requests 4000 --slow-rate 0.03 --slow-multiplier 10
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import statistics
+import time
+
+os.environ.setdefault("GOOGLE_API_KEY", "benchmark")
+os.environ.setdefault("RATE_LIMIT_RPM", "0")
+os.environ.setdefault("RATE_LIMIT_TPM", "0")
+os.environ.setdefault("USAGE_BACKEND", "none")
+
+from app.services.backends import FakeBackend
+from app.services.hedging import Hedger
+from app.services.services import AIService
+
+
+def percentile(ordered: list, q: float) -> float:
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+async def drive(service: AIService, total: int, concurrency: int) -> list:
+    latencies = []
+    counter = iter(range(total))
+
+    async def client():
+        for i in counter:
+            started = time.perf_counter()
+            await service.email_responder(
+                "okey@example.com", f"Hi Okey, any update on ticket {i}?", "Fixed, deploying today",
+                "formal", "Okey", use_cache=False
+            )
+            latencies.append(time.perf_counter() - started)
+
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    return sorted(latencies)
+
+
+async def run(args, hedger) -> dict:
+    backend = FakeBackend(
+        latency_ms=args.latency_ms,
+        latency_sigma=args.sigma,
+        tokens_per_second=args.tokens_per_second,
+        output_tokens=60,
+        slow_rate=args.slow_rate,
+        slow_multiplier=args.slow_multiplier,
+        seed=7,
+    )
+    service = AIService(backend=backend, cache=None)
+    service.hedger = hedger
+    await drive(service, args.warmup, args.concurrency)
+    calls_before = backend.calls
+    latencies = await drive(service, args.requests, args.concurrency)
+    return {
+        "p50": statistics.median(latencies),
+        "p95": percentile(latencies, 0.95),
+        "p99": percentile(latencies, 0.99),
+        "p999": percentile(latencies, 0.999),
+        "extra": (backend.calls - calls_before) / args.requests - 1,
+        "stats": hedger.stats() if hedger else {},
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="email_responder tail latency with and without hedging.")
+    parser.add_argument("--requests", type=int, default=4000)
+    parser.add_argument("--warmup", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--latency-ms", type=float, default=50.0, help="Fake backend median first-token latency")
+    parser.add_argument("--sigma", type=float, default=0.3, help="Log-normal spread of normal calls")
+    parser.add_argument("--slow-rate", type=float, default=0.03, help="Fraction of calls that stall")
+    parser.add_argument("--slow-multiplier", type=float, default=10.0)
+    parser.add_argument("--tokens-per-second", type=float, default=6000.0)
+    parser.add_argument("--percentile", type=float, default=0.95, help="Hedge after this latency quantile")
+    parser.add_argument("--max-rate", type=float, default=0.1, help="Hedge budget per call")
+    args = parser.parse_args()
+    logging.disable(logging.WARNING)
+
+    configs = [
+        ("off", None),
+        ("hedged", Hedger(percentile=args.percentile, max_rate=args.max_rate, min_samples=50)),
+    ]
+    print(f"{args.requests} requests, {args.concurrency} clients, {args.slow_rate:.0%} of calls "
+          f"{args.slow_multiplier:.0f}x slower")
+    print(f"{'hedging':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'p99.9 ms':>9} {'extra calls':>12}")
+    for name, hedger in configs:
+        result = asyncio.run(run(args, hedger))
+        print(
+            f"{name:>8} {result['p50'] * 1000:>8.1f} {result['p95'] * 1000:>8.1f} "
+            f"{result['p99'] * 1000:>8.1f} {result['p999'] * 1000:>9.1f} {result['extra']:>11.1%}"
+        )
+        if result["stats"]:
+            print(f"{'':>8} {result['stats']}")
+
+
+if __name__ == "__main__":
+    main()
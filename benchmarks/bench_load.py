@@ -0,0 +1,130 @@
+"""
+Endpoint load benchmark against the in-process fake backend.
+
+Drives the FastAPI app through httpx's ASGI transport with a fixed number of
+concurrent clients per endpoint and reports throughput and p50/p99 latency.
+The FakeBackend is seeded, so runs with the same arguments are repeatable
+and need neither an API key nor network access. Admission limits and the
+response cache are disabled so every request reaches the backend.
+
+Usage:
+    python -m benchmarks.bench_load --requests 500 --concurrency 50 --latency-ms 200
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import statistics
+import time
+
+os.environ.setdefault("GOOGLE_API_KEY", "benchmark")
+
+import httpx
+
+import app.main as main
+from app.services.admission import AdmissionController
+from app.services.backends import FakeBackend
+from app.services.services import AIService
+
+ENDPOINTS = {
+    "/greet_user": lambda i: {"params": {"user_name": f"user{i}"}},
+    "/write_message": lambda i: {
+        "params": {"use_cache": "false"},
+        "json": {"type": "formal", "user_message": f"Thanks for the meeting #{i}", "user_name": "Okey"},
+    },
+    "/respond_message": lambda i: {
+        "params": {"use_cache": "false"},
+        "json": {
+            "email_address": "okey@example.com",
+            "email": f"Hi Okey, any update on ticket {i}?",
+            "prompt": "Fixed, deploying today",
+            "type": "formal",
+        },
+    },
+    "/respond_message/stream": lambda i: {
+        "params": {"use_cache": "false"},
+        "json": {
+            "email_address": "okey@example.com",
+            "email": f"Hi Okey, any update on ticket {i}?",
+            "prompt": "Fixed, deploying today",
+            "type": "casual",
+        },
+    },
+}
+
+
+def percentile(values, fraction: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+async def run_endpoint(client: httpx.AsyncClient, path: str, requests: int, concurrency: int) -> dict:
+    latencies = []
+    errors = 0
+    counter = iter(range(requests))
+
+    async def worker():
+        nonlocal errors
+        for i in counter:
+            started = time.perf_counter()
+            async with client.stream("POST", path, **ENDPOINTS[path](i)) as response:
+                await response.aread()
+            latencies.append(time.perf_counter() - started)
+            if response.status_code >= 400:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    return {
+        "rps": requests / elapsed,
+        "p50": statistics.median(latencies),
+        "p99": percentile(latencies, 0.99),
+        "errors": errors,
+    }
+
+
+async def run(args) -> None:
+    backend = FakeBackend(
+        latency_ms=args.latency_ms,
+        latency_sigma=args.latency_sigma,
+        tokens_per_second=args.tokens_per_second,
+        output_tokens=args.output_tokens,
+        error_rate=args.error_rate,
+        malformed_json_rate=args.malformed_json_rate,
+        seed=args.seed,
+    )
+    main.ai_service = AIService(
+        backend=backend,
+        cache=None,
+        admission=AdmissionController(requests_per_minute=0, tokens_per_minute=0),
+    )
+
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        print(f"{'endpoint':<26} {'req/s':>8} {'p50 ms':>8} {'p99 ms':>8} {'errors':>7}")
+        for path in args.endpoints:
+            result = await run_endpoint(client, path, args.requests, args.concurrency)
+            print(
+                f"{path:<26} {result['rps']:>8.1f} {result['p50'] * 1000:>8.1f} "
+                f"{result['p99'] * 1000:>8.1f} {result['errors']:>7}"
+            )
+    print(f"backend calls: {backend.calls}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--requests", type=int, default=500, help="Requests per endpoint")
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--latency-ms", type=float, default=200.0)
+    parser.add_argument("--latency-sigma", type=float, default=0.5)
+    parser.add_argument("--tokens-per-second", type=float, default=400.0)
+    parser.add_argument("--output-tokens", type=int, default=80)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--malformed-json-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--endpoints", nargs="+", default=list(ENDPOINTS), choices=list(ENDPOINTS))
+    args = parser.parse_args()
+    logging.disable(logging.CRITICAL)
+    asyncio.run(run(args))
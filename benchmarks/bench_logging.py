@@ -0,0 +1,99 @@
+"""
+Logging overhead benchmark.
+
+Replays the log calls a /write_message request makes and reports the time
+spent on the calling thread (the event loop, in the server) per request:
+
+- before: synchronous DEBUG logging with eager f-strings and full payloads
+- after: the queued pipeline from app.logging_config at INFO, lazy
+  formatting and sampled, truncated payloads
+
+The sink can be slowed down to mimic a congested stdout or log shipper.
+
+Usage:
+    python -m benchmarks.bench_logging --requests 5000 --sink-delay-us 50
+"""
+
+import argparse
+import io
+import logging
+import os
+import time
+from types import SimpleNamespace
+
+os.environ.setdefault("GOOGLE_API_KEY", "benchmark")
+
+from app.logging_config import Payload, configure_logging, shutdown_logging
+
+logger = logging.getLogger("benchmarks.bench_logging")
+
+USER_MESSAGE = "Thank you for attending my party last night. " * 20
+RAW_RESPONSE = '{"subject": "Appreciation for Attending My Party", "body": "' + "Dear Friend, " * 200 + '"}'
+
+
+class SlowSink(io.TextIOBase):
+    """Text stream whose writes take ``delay`` seconds."""
+
+    def __init__(self, delay: float):
+        self.delay = delay
+
+    def write(self, text: str) -> int:
+        if self.delay:
+            time.sleep(self.delay)
+        return len(text)
+
+
+def request_before() -> None:
+    logger.info(f"Received write_message request: type=formal, message={USER_MESSAGE}, user_name=Okey")
+    logger.debug(f"Raw Response: {RAW_RESPONSE}")
+    logger.debug(f"JSON String: {RAW_RESPONSE.strip()}")
+    logger.info("Generated email response with subject: Appreciation for Attending My Party")
+
+
+def request_after() -> None:
+    logger.info("Received write_message request: type=%s, user_name=%s", "formal", "Okey")
+    logger.debug("write_message user_message: %s", Payload(USER_MESSAGE))
+    logger.debug("Raw Response: %s", Payload(RAW_RESPONSE))
+    logger.info("Generated email response with subject: %s", "Appreciation for Attending My Party")
+
+
+def run(request, requests: int) -> float:
+    started = time.perf_counter()
+    for _ in range(requests):
+        request()
+    return (time.perf_counter() - started) / requests
+
+
+def main(requests: int, sink_delay_us: float) -> None:
+    sink = SlowSink(sink_delay_us / 1e6)
+
+    root = logging.getLogger()
+    handler = logging.StreamHandler(sink)
+    handler.setFormatter(logging.Formatter("%(asctime)s - %(levelname)s - %(message)s"))
+    root.handlers[:] = [handler]
+    root.setLevel(logging.DEBUG)
+    before = run(request_before, requests)
+
+    settings = SimpleNamespace(
+        LOG_LEVEL="INFO", LOG_FORMAT="json", LOG_PAYLOAD_MAX_CHARS=512, LOG_PAYLOAD_SAMPLE_RATE=0.01
+    )
+    configure_logging(settings, stream=sink)
+    after = run(request_after, requests)
+
+    debug_settings = SimpleNamespace(**{**vars(settings), "LOG_LEVEL": "DEBUG"})
+    configure_logging(debug_settings, stream=sink)
+    after_debug = run(request_after, requests)
+    shutdown_logging()
+
+    print(f"sink delay {sink_delay_us:.0f} us/write, {requests} requests")
+    print(f"{'before (sync, DEBUG, eager)':<34} {before * 1e6:>9.1f} us/request")
+    print(f"{'after (queued, INFO)':<34} {after * 1e6:>9.1f} us/request")
+    print(f"{'after (queued, DEBUG, sampled)':<34} {after_debug * 1e6:>9.1f} us/request")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--sink-delay-us", type=float, default=50.0)
+    args = parser.parse_args()
+    main(args.requests, args.sink_delay_us)
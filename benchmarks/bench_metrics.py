@@ -0,0 +1,66 @@
+"""
+Metrics recording overhead microbenchmark.
+
+Measures the cost of recording a histogram sample, incrementing a counter,
+rendering the registry, and the per-request overhead MetricsMiddleware adds
+around a trivial ASGI app.
+
+Usage:
+    python -m benchmarks.bench_metrics --iterations 200000
+"""
+
+import argparse
+import asyncio
+import time
+import timeit
+
+from app.services.metrics import Histogram, MetricsMiddleware, MetricsRegistry
+
+
+async def _noop_app(scope, receive, send):
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": b""})
+
+
+async def _noop_send(message):
+    pass
+
+
+async def _drive(app, iterations: int) -> float:
+    scope = {"type": "http", "method": "POST", "path": "/write_message"}
+    started = time.perf_counter()
+    for _ in range(iterations):
+        await app(scope, None, _noop_send)
+    return time.perf_counter() - started
+
+
+def main(iterations: int) -> None:
+    registry = MetricsRegistry()
+    histogram = registry.histogram("bench_seconds", "benchmark", ("operation", "stage"))
+    counter = registry.counter("bench_total", "benchmark", ("operation", "error"))
+
+    seconds = timeit.timeit(lambda: histogram.observe(0.012, "write_message", "upstream"), number=iterations)
+    print(f"histogram.observe      {seconds / iterations * 1e9:>8.0f} ns")
+    seconds = timeit.timeit(lambda: counter.inc("write_message", "timeout"), number=iterations)
+    print(f"counter.inc            {seconds / iterations * 1e9:>8.0f} ns")
+
+    def timed():
+        with histogram.time("write_message", "parse"):
+            pass
+    seconds = timeit.timeit(timed, number=iterations)
+    print(f"histogram.time         {seconds / iterations * 1e9:>8.0f} ns")
+
+    renders = max(1, iterations // 1000)
+    seconds = timeit.timeit(registry.render, number=renders)
+    print(f"registry.render        {seconds / renders * 1e6:>8.1f} us")
+
+    bare = asyncio.run(_drive(_noop_app, iterations))
+    wrapped = asyncio.run(_drive(MetricsMiddleware(_noop_app, Histogram("bench_http", "benchmark", ("m", "r", "s"))), iterations))
+    print(f"middleware overhead    {(wrapped - bare) / iterations * 1e9:>8.0f} ns/request")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=200000)
+    args = parser.parse_args()
+    main(args.iterations)
@@ -0,0 +1,59 @@
+"""
+Prompt rendering microbenchmark.
+
+Reports, for every registered prompt, the estimated token count of its static
+prefix, the time to render a request, and the bytes uploaded per request with
+the prefix sent inline versus served from the model-side context cache.
+
+Usage:
+    python -m benchmarks.bench_prompts --iterations 100000
+"""
+
+import argparse
+import timeit
+
+from app.templates.prompts import ORIGINAL_MESSAGE_REFERENCE, PROMPTS, get_tone_template
+
+SAMPLE_VALUES = {
+    "user_name": "Okey",
+    "message": "Hello",
+    "email": "Hi Okey, I need an update on the project status.",
+    "prompt": "AI integration is complete, preparing for GitHub push",
+    "user_message": "Thank you for attending my party last night.",
+    "message_type": "formal",
+    "style": "warm and welcoming",
+    "placeholder": "{user_name}",
+    "fields": "subject, body",
+    "error": "missing fields: body",
+    "text": '{"subject": "Thanks for coming"}',
+    "summary": "Alex asked for the project status; Okey promised an update after the integration work.",
+    "history": "[Received] Any news on the integration?\n[Sent] Almost done, I will confirm by Friday.",
+    "words": 120,
+    "messages": "[Received] Can we move the call?\n[Sent] Yes, Friday works.",
+}
+
+
+def main(iterations: int) -> None:
+    print(f"{'prompt':<20} {'prefix tok':>10} {'render us':>10} {'inline B':>9} {'cached B':>9}")
+    for template in PROMPTS:
+        # Slots added to later prompts fall back to a short placeholder value
+        values = {slot: SAMPLE_VALUES.get(slot, slot) for slot in template.body.input_variables}
+        seconds = timeit.timeit(lambda: template.render(**values), number=iterations)
+        rendered = template.render(**values)
+        inline_bytes = len(str(rendered).encode("utf-8"))
+        cached_bytes = len(rendered.body.encode("utf-8"))
+        print(
+            f"{template.name:<20} {template.prefix_tokens:>10} {seconds / iterations * 1e6:>10.2f} "
+            f"{inline_bytes:>9} {cached_bytes:>9}"
+        )
+
+    tone = get_tone_template("formal")
+    seconds = timeit.timeit(lambda: tone.format(custom_message=ORIGINAL_MESSAGE_REFERENCE), number=iterations)
+    print(f"{'tone template':<20} {'':>10} {seconds / iterations * 1e6:>10.2f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=100000)
+    args = parser.parse_args()
+    main(args.iterations)
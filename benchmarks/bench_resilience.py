@@ -0,0 +1,110 @@
+"""
+Fault-injection benchmark for the upstream resilience layer.
+
+Drives AIService with a fake model that injects latency, retryable errors
+(429/503), rate-limit retry-after hints and stuck calls, then reports the
+success rate, wall time and the retry / breaker metrics from
+``AIService.resilience.stats()``.
+
+Usage:
+    python -m benchmarks.bench_resilience --requests 200 --error-rate 0.3 --stuck-rate 0.02
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import time
+
+os.environ.setdefault("GOOGLE_API_KEY", "benchmark")
+
+from google.api_core import exceptions as google_exceptions
+
+from app.services.resilience import CircuitBreaker, Resilience
+from app.services.services import AIService
+
+
+class _StubResponse:
+    def __init__(self, text: str):
+        self.text = text
+
+
+class FlakyModel:
+    """Fake model injecting latency, transient errors and calls that never return."""
+
+    def __init__(self, latency: float, error_rate: float, stuck_rate: float, seed: int = 7):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.stuck_rate = stuck_rate
+        self.random = random.Random(seed)
+        self.outage = False
+
+    async def generate_content_async(self, prompt, **kwargs):
+        await asyncio.sleep(self.random.expovariate(1 / self.latency))
+        if self.outage:
+            raise google_exceptions.ServiceUnavailable("upstream outage")
+        roll = self.random.random()
+        if roll < self.stuck_rate:
+            await asyncio.sleep(3600)
+        if roll < self.stuck_rate + self.error_rate / 2:
+            raise google_exceptions.ServiceUnavailable("transient upstream error")
+        if roll < self.stuck_rate + self.error_rate:
+            error = google_exceptions.TooManyRequests("quota exceeded")
+            error.retry_after = 0.05
+            raise error
+        return _StubResponse("Hello there! What can I help you with today?")
+
+
+async def _drive(service: AIService, total: int) -> dict:
+    outcomes = {"ok": 0, "failed": 0}
+
+    async def one():
+        try:
+            await service.greet_user("Hello", "Okey")
+            outcomes["ok"] += 1
+        except Exception:
+            outcomes["failed"] += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(total)))
+    outcomes["elapsed"] = round(time.perf_counter() - started, 2)
+    return outcomes
+
+
+async def main(total: int, latency: float, error_rate: float, stuck_rate: float):
+    model = FlakyModel(latency, error_rate, stuck_rate)
+    resilience = Resilience(
+        timeout=latency * 10,
+        max_attempts=4,
+        base_delay=0.02,
+        max_delay=0.5,
+        breaker=CircuitBreaker(failure_threshold=20, reset_timeout=0.5),
+    )
+    service = AIService(model=model, cache=None, resilience=resilience)
+
+    print("transient faults:", await _drive(service, total))
+    print("  ", resilience.stats())
+
+    model.outage = True
+    print("full outage:     ", await _drive(service, total))
+    print("  ", resilience.stats())
+
+    model.outage = False
+    await asyncio.sleep(resilience.breaker.reset_timeout)
+    # The half-open breaker admits a single trial call before closing again
+    print("half-open probe: ", await _drive(service, 1))
+    print("after recovery:  ", await _drive(service, total))
+    print("  ", resilience.stats())
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--error-rate", type=float, default=0.3)
+    parser.add_argument("--stuck-rate", type=float, default=0.02)
+    args = parser.parse_args()
+
+    import logging
+    logging.disable(logging.CRITICAL)
+    asyncio.run(main(args.requests, args.latency, args.error_rate, args.stuck_rate))
@@ -0,0 +1,118 @@
+"""
+Near-duplicate cache benchmark.
+
+Fills a SemanticCache with synthetic support emails, then queries it with
+near-duplicates (whitespace, casing, greeting name and single-word edits)
+and with unrelated emails under the same tone, name and prompt. Reports
+insert cost, hit rate on near-duplicates, false hit rate on unrelated emails
+and lookup latency percentiles.
+
+Usage:
+    python -m benchmarks.bench_semantic_cache --entries 100000 --queries 2000
+"""
+
+import argparse
+import random
+import statistics
+import time
+
+from app.services.semantic_cache import SemanticCache, normalize
+
+NAMES = ["Okey", "Jane", "Alex", "Maria", "Chen", "Priya", "Tom", "Fatima", "Lars", "Ana"]
+GREETINGS = ["Hi", "Hello", "Hey", "Dear"]
+TONES = ["formal", "casual", "friendly"]
+PROMPTS = ["Fixed, deploying today", "Refund approved", "Escalated to engineering", "Scheduled for Friday"]
+SENTENCES = [
+    "I have a question about the {0} {1} for our {2}.",
+    "Since the {0} last week the {1} has shown a {2} issue.",
+    "Could you let me know when we can expect the {0} to be {1}?",
+    "It affects the {0} and the {1} for the whole {2} team.",
+    "We tried updating the {0} but the {1} still fails.",
+    "Our {0} deadline is next {1}, so this is fairly urgent.",
+    "Is there a way to move the {0} from {1} to {2}?",
+    "The {0} report shows the wrong {1} since the {2} change.",
+    "Please confirm whether the {0} includes the {1}.",
+    "We would like to add {0} more {1} to the {2} plan.",
+]
+
+
+def make_vocabulary(rng: random.Random, size: int = 3000) -> list:
+    letters = "abcdefghijklmnopqrstuvwxyz"
+    return ["".join(rng.choice(letters) for _ in range(rng.randint(4, 9))) for _ in range(size)]
+
+
+def make_email(rng: random.Random, vocabulary: list) -> str:
+    sentences = [
+        template.format(*rng.sample(vocabulary, 3))
+        for template in rng.sample(SENTENCES, rng.randint(3, 5))
+    ]
+    return (
+        f"{rng.choice(GREETINGS)} {rng.choice(NAMES)},\n\n"
+        + " ".join(sentences)
+        + f"\n\nThanks,\n{rng.choice(NAMES)}"
+    )
+
+
+def near_duplicate(email: str, rng: random.Random, vocabulary: list) -> str:
+    lines = email.split("\n")
+    lines[0] = f"{rng.choice(GREETINGS)} {rng.choice(NAMES)},"
+    text = "\n".join(lines)
+    edit = rng.randrange(3)
+    if edit == 0:
+        return text.replace(" ", "  ").upper()
+    words = text.split(" ")
+    position = rng.randrange(2, len(words) - 2)
+    if edit == 1:
+        words[position] = rng.choice(vocabulary)
+    else:
+        del words[position]
+    return " ".join(words)
+
+
+def main(entries: int, queries: int, threshold: float, seed: int) -> None:
+    rng = random.Random(seed)
+    vocabulary = make_vocabulary(rng)
+    cache = SemanticCache(threshold=threshold, max_entries=entries)
+    emails = [make_email(rng, vocabulary) for _ in range(entries)]
+    partitions = [
+        f"{rng.choice(TONES)}|{rng.choice(NAMES)}|{' '.join(normalize(rng.choice(PROMPTS)))}"
+        for _ in range(entries)
+    ]
+
+    started = time.perf_counter()
+    for index, (email, partition) in enumerate(zip(emails, partitions)):
+        cache.set(partition, email, f"reply {index}")
+    insert_seconds = time.perf_counter() - started
+
+    def measure(samples):
+        hits, latencies = 0, []
+        for partition, text in samples:
+            started = time.perf_counter()
+            result = cache.get(partition, text)
+            latencies.append(time.perf_counter() - started)
+            hits += result is not None
+        return hits / len(samples), latencies
+
+    picks = [rng.randrange(entries) for _ in range(queries)]
+    near = [(partitions[i], near_duplicate(emails[i], rng, vocabulary)) for i in picks]
+    unrelated = [(partitions[i], make_email(rng, vocabulary)) for i in picks]
+    hit_rate, near_latencies = measure(near)
+    false_rate, far_latencies = measure(unrelated)
+    latencies = sorted(near_latencies + far_latencies)
+
+    print(f"entries {len(cache)}, jaccard threshold {threshold}, candidate radius {cache.max_distance} bits")
+    print(f"insert             {insert_seconds / entries * 1e6:8.1f} us/entry")
+    print(f"near-duplicate hit {hit_rate * 100:8.1f} %")
+    print(f"unrelated hit      {false_rate * 100:8.1f} %")
+    print(f"lookup p50         {statistics.median(latencies) * 1e6:8.1f} us")
+    print(f"lookup p99         {latencies[int(len(latencies) * 0.99)] * 1e6:8.1f} us")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--entries", type=int, default=100000)
+    parser.add_argument("--queries", type=int, default=2000)
+    parser.add_argument("--threshold", type=float, default=0.85)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+    main(args.entries, args.queries, args.threshold, args.seed)
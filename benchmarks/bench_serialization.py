@@ -0,0 +1,139 @@
+"""
+Serialization throughput of API responses before and after the fast path.
+
+Serves prebuilt responses from minimal FastAPI apps, called directly over
+ASGI so no network or HTTP client cost is included:
+
+- "default": the route returns the model and FastAPI validates it against
+  response_model, dumps it back to plain data and renders that with the
+  stdlib json module, as the routes did before.
+- "fast": the route returns ``FastJSONResponse(model)``, which is dumped
+  once with orjson.
+- "fast+gzip" / "fast+br": the fast path behind CompressionMiddleware, for
+  a client that accepts gzip or brotli. brotli needs the package.
+
+Payloads are one large /respond_message reply and a /respond_message/batch
+result of many items. Reports responses per second, MB/s of JSON and bytes
+on the wire.
+
+Usage:
+    python -m benchmarks.bench_serialization --email-kb 40 --batch-items 1000
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import time
+
+os.environ.setdefault("GOOGLE_API_KEY", "benchmark")
+
+from fastapi import FastAPI
+
+from app.models.model import BatchItemResult, BatchResponse, Response
+from app.responses import CompressionMiddleware, FastJSONResponse, brotli
+
+WORDS = (
+    "thanks for the update on delivery plan revised dates work for us and finance has signed off please "
+    "confirm owner budget contract schedule second phase meeting tuesday invoice attached regards team "
+    "quarterly figures review notes follow up next week shipment customer support ticket resolved"
+).split()
+
+
+def text(rng: random.Random, chars: int) -> str:
+    words, size = [], 0
+    while size < chars:
+        words.append(rng.choice(WORDS))
+        size += len(words[-1]) + 1
+    return " ".join(words)[:chars]
+
+
+def payloads(email_kb: int, batch_items: int, item_chars: int) -> dict:
+    rng = random.Random(1)
+    body = text(rng, email_kb * 1024)
+    batch = BatchResponse(results=[
+        BatchItemResult(
+            index=index, status_code=200,
+            result=Response(email=f"user{index}@example.com", response=text(rng, item_chars), user_name="Okey"),
+            error=None
+        )
+        for index in range(batch_items)
+    ])
+    return {
+        f"email {email_kb} KB": (Response, Response(email="okey@example.com", response=body, user_name="Okey")),
+        f"batch x{batch_items}": (BatchResponse, batch),
+    }
+
+
+def build_app(model_type, model, variant: str, gzip_level: int):
+    app = FastAPI()
+    if variant == "default":
+        @app.get("/", response_model=model_type)
+        async def default_route():
+            return model
+    else:
+        @app.get("/", response_model=model_type)
+        async def fast_route():
+            return FastJSONResponse(model)
+    if variant != "default" and variant != "fast":
+        return CompressionMiddleware(app, minimum_size=1024, compresslevel=gzip_level)
+    return app
+
+
+async def call(app, encoding: bytes) -> int:
+    """One GET / straight over ASGI; returns the body size."""
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET", "scheme": "http",
+        "path": "/", "raw_path": b"/", "query_string": b"", "root_path": "",
+        "headers": [(b"accept-encoding", encoding)], "server": ("bench", 80), "client": ("bench", 1),
+    }
+    size = 0
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        nonlocal size
+        if message["type"] == "http.response.body":
+            size += len(message.get("body", b""))
+
+    await app(scope, receive, send)
+    return size
+
+
+async def measure(app, encoding: bytes, seconds: float) -> tuple:
+    await call(app, encoding)
+    count, started = 0, time.perf_counter()
+    while time.perf_counter() - started < seconds:
+        size = await call(app, encoding)
+        count += 1
+    return count / (time.perf_counter() - started), size
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="API response serialization throughput.")
+    parser.add_argument("--email-kb", type=int, default=40, help="Size of the large email reply")
+    parser.add_argument("--batch-items", type=int, default=1000)
+    parser.add_argument("--item-chars", type=int, default=1500, help="Reply length of each batch item")
+    parser.add_argument("--gzip-level", type=int, default=1)
+    parser.add_argument("--seconds", type=float, default=2.0, help="Time per measurement")
+    args = parser.parse_args()
+
+    variants = [("default", b"identity"), ("fast", b"identity"), ("fast+gzip", b"gzip")]
+    if brotli is not None:
+        variants.append(("fast+br", b"br"))
+
+    print(f"{'payload':>14} {'variant':>10} {'resp/s':>9} {'JSON MB/s':>10} {'wire bytes':>11} {'speedup':>8}")
+    for name, (model_type, model) in payloads(args.email_kb, args.batch_items, args.item_chars).items():
+        json_size = len(FastJSONResponse(model).body)
+        baseline = None
+        for variant, encoding in variants:
+            app = build_app(model_type, model, variant, args.gzip_level)
+            rate, size = asyncio.run(measure(app, encoding, args.seconds))
+            baseline = baseline or rate
+            print(f"{name:>14} {variant:>10} {rate:>9.0f} {rate * json_size / 1e6:>10.1f} {size:>11} "
+                  f"{rate / baseline:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
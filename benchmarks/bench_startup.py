@@ -0,0 +1,79 @@
+"""
+Startup time and baseline memory benchmark for a single worker.
+
+Each run starts a fresh interpreter, imports ``app.main`` and then creates
+the model client the way the lifespan hook does, recording wall time and
+peak RSS after each step. Medians over several runs are reported, and the
+script exits non-zero when a budget is exceeded so it can gate CI.
+
+Usage:
+    python -m benchmarks.bench_startup --runs 5 --max-import-ms 1500 --max-rss-mb 150
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+PROBE = r"""
+import json, resource, sys, time
+started = time.perf_counter()
+import app.main
+imported = time.perf_counter()
+import_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+app.main.ai_service.load_model()
+loaded = time.perf_counter()
+print(json.dumps({
+    "import_ms": (imported - started) * 1000,
+    "load_model_ms": (loaded - imported) * 1000,
+    "import_rss_kb": import_rss,
+    "ready_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+    "langchain_loaded": any(m.startswith("langchain") for m in sys.modules),
+}))
+"""
+
+
+def _run_once() -> dict:
+    env = dict(os.environ)
+    env.setdefault("GOOGLE_API_KEY", "benchmark")
+    env["PYTHONWARNINGS"] = "ignore"
+    output = subprocess.run(
+        [sys.executable, "-c", PROBE],
+        check=True,
+        capture_output=True,
+        text=True,
+        env=env,
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main(runs: int, max_import_ms: float, max_rss_mb: float) -> int:
+    samples = [_run_once() for _ in range(runs)]
+    median = {
+        key: statistics.median(sample[key] for sample in samples)
+        for key in ("import_ms", "load_model_ms", "import_rss_kb", "ready_rss_kb")
+    }
+    print(f"runs={runs}")
+    print(f"import app.main   {median['import_ms']:8.1f} ms   rss {median['import_rss_kb'] / 1024:6.1f} MB")
+    print(f"+ model client    {median['load_model_ms']:8.1f} ms   rss {median['ready_rss_kb'] / 1024:6.1f} MB")
+    print(f"langchain imported: {any(sample['langchain_loaded'] for sample in samples)}")
+
+    failed = False
+    if max_import_ms and median["import_ms"] > max_import_ms:
+        print(f"FAIL: import time exceeds {max_import_ms} ms")
+        failed = True
+    if max_rss_mb and median["ready_rss_kb"] / 1024 > max_rss_mb:
+        print(f"FAIL: ready RSS exceeds {max_rss_mb} MB")
+        failed = True
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--max-import-ms", type=float, default=0, help="Fail if median import time exceeds this")
+    parser.add_argument("--max-rss-mb", type=float, default=0, help="Fail if median ready RSS exceeds this")
+    args = parser.parse_args()
+    sys.exit(main(args.runs, args.max_import_ms, args.max_rss_mb))
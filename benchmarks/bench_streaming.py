@@ -0,0 +1,105 @@
+"""
+Time-to-first-byte benchmark for the streaming endpoints.
+
+Uses a fake streaming model that emits one token every ``--token-delay``
+seconds and compares when the first SSE event leaves the endpoint against
+when generation finishes. The first chunk must arrive well before the full
+completion does.
+
+Usage:
+    python -m benchmarks.bench_streaming --tokens 40 --token-delay 0.05
+"""
+
+import argparse
+import asyncio
+import os
+import time
+
+os.environ.setdefault("GOOGLE_API_KEY", "benchmark")
+
+import app.main as main
+from app.models.model import EmailRequest
+from app.services.services import AIService
+
+
+class _Chunk:
+    def __init__(self, text: str):
+        self.text = text
+
+
+class _FakeStream:
+    def __init__(self, tokens: int, delay: float):
+        self.tokens = tokens
+        self.delay = delay
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        for i in range(self.tokens):
+            await asyncio.sleep(self.delay)
+            yield _Chunk(f"word{i} ")
+
+
+class FakeStreamingModel:
+    def __init__(self, tokens: int, delay: float):
+        self.tokens = tokens
+        self.delay = delay
+
+    async def generate_content_async(self, prompt, stream=False, **kwargs):
+        if stream:
+            return _FakeStream(self.tokens, self.delay)
+        await asyncio.sleep(self.tokens * self.delay)
+        return _Chunk(" ".join(f"word{i}" for i in range(self.tokens)))
+
+
+async def _measure(call) -> tuple:
+    # The endpoint waits for the first chunk before it returns the response,
+    # so the clock starts before the call
+    started = time.perf_counter()
+    response = await call()
+    first = None
+    events = 0
+    async for event in response.body_iterator:
+        if first is None:
+            first = time.perf_counter() - started
+        events += 1
+    return first, time.perf_counter() - started, events
+
+
+async def main_async(tokens: int, delay: float):
+    main.ai_service = AIService(model=FakeStreamingModel(tokens, delay))
+
+    request = EmailRequest(
+        email_address="okey@example.com",
+        email="Hi Okey, I need an update on the project status.",
+        prompt="AI integration is complete",
+        type="formal",
+        user_name="Okey",
+    )
+    cases = (
+        ("/greet_user/stream", lambda: main.greeting_stream("Okey")),
+        ("/respond_message/stream", lambda: main.respond_to_email_stream(request, use_cache=False)),
+    )
+    for route, call in cases:
+        first, total, events = await _measure(call)
+        print(f"{route:<26} ttfb={first * 1000:7.1f}ms total={total * 1000:7.1f}ms events={events}")
+        assert first < total / 2, "first chunk should arrive before generation finishes"
+
+    started = time.perf_counter()
+    await main.ai_service.email_responder(
+        request.email_address, request.email, request.prompt, request.type, request.user_name,
+        use_cache=False
+    )
+    print(f"{'/respond_message':<26} ttfb={(time.perf_counter() - started) * 1000:7.1f}ms (non-streaming)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--tokens", type=int, default=40)
+    parser.add_argument("--token-delay", type=float, default=0.05)
+    args = parser.parse_args()
+
+    import logging
+    logging.disable(logging.CRITICAL)
+    asyncio.run(main_async(args.tokens, args.token_delay))
@@ -0,0 +1,137 @@
+"""
+Prompt size and latency of multi-turn replies versus thread length.
+
+Plays the same email conversation through email_responder against the
+fake backend three ways: the way a stateless client does it, resending the
+whole quoted thread every turn, with EMAIL_TOKEN_BUDGET off ("resent") and
+on ("trimmed", which keeps the size bounded by dropping quoted history),
+and in thread mode, sending only the newest email with a thread ID. The fake
+backend's first token waits for the prompt to be read
+(``--prefill-tokens-per-second``), so latency follows prompt size as with a
+hosted model. For selected turns it reports the reply call's prompt tokens
+and latency; the last line adds thread mode's background summary calls to
+its cost per turn. Summaries are allowed to finish between turns, as they
+do when replies are minutes apart.
+
+Usage:
+    python -m benchmarks.bench_threads --turns 32 --prefill-tokens-per-second 8000
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import random
+import tempfile
+import time
+
+os.environ.setdefault("GOOGLE_API_KEY", "benchmark")
+os.environ.setdefault("RATE_LIMIT_RPM", "0")
+os.environ.setdefault("RATE_LIMIT_TPM", "0")
+os.environ.setdefault("USAGE_BACKEND", "none")
+
+from app.config import get_settings
+from app.services.backends import FakeBackend
+from app.services.services import AIService
+from app.services.threads import SQLiteThreadStore, ThreadMemory
+
+WORDS = (
+    "the delivery schedule for the second phase depends on the signed contract and the updated budget "
+    "figures we discussed with finance last week so please confirm the revised dates and the owner"
+).split()
+
+
+def incoming_email(rng: random.Random, turn: int, words: int) -> str:
+    body = " ".join(rng.choice(WORDS) for _ in range(words))
+    return f"Hi Okey,\n\nFollowing up (message {turn}): {body}.\n\nThanks,\nAlex"
+
+
+def quote(history: list) -> str:
+    """The earlier messages as a mail client quotes them under a reply, newest first."""
+    parts = []
+    for sender, text in reversed(history):
+        quoted = "\n".join(f"> {line}" for line in text.splitlines())
+        parts.append(f"On Mon, 6 Jan 2025 at 09:00, {sender} wrote:\n{quoted}")
+    return "\n\n".join(parts)
+
+
+def prompt_tokens(service: AIService) -> int:
+    return sum(target.prompt_tokens for target in service.router)
+
+
+async def converse(service: AIService, args, thread_mode: bool) -> tuple:
+    """Play the conversation; returns per-turn (prompt tokens, latency) and total prompt tokens."""
+    rng = random.Random(3)
+    history, turns = [], []
+    started_tokens = prompt_tokens(service)
+    for turn in range(1, args.turns + 1):
+        email = incoming_email(rng, turn, args.email_words)
+        sent = email if thread_mode or not history else f"{email}\n\n{quote(history)}"
+        before = prompt_tokens(service)
+        started = time.perf_counter()
+        reply = await service.email_responder(
+            "alex@example.com", sent, "Confirm the dates and ask for the signed contract", "formal", "Okey",
+            use_cache=False, thread_id="bench" if thread_mode else None
+        )
+        turns.append((prompt_tokens(service) - before, time.perf_counter() - started))
+        history += [("Alex", email), ("Okey", reply)]
+        await service.threads.settle()
+    return turns, prompt_tokens(service) - started_tokens
+
+
+async def run(args, mode: str) -> tuple:
+    backend = FakeBackend(
+        latency_ms=args.latency_ms,
+        latency_sigma=0.0,
+        tokens_per_second=args.tokens_per_second,
+        output_tokens=args.reply_tokens,
+        prefill_tokens_per_second=args.prefill_tokens_per_second,
+        seed=7,
+    )
+    service = AIService(backend=backend, cache=None)
+    service.semantic_cache = None
+    if mode == "resent":
+        service.email_token_budget = 0
+    with tempfile.TemporaryDirectory() as directory:
+        service.threads = ThreadMemory(
+            SQLiteThreadStore(os.path.join(directory, "threads.db")),
+            service._summarize_thread,
+            get_settings().THREAD_RECENT_MESSAGES,
+        )
+        try:
+            return await converse(service, args, thread_mode=mode == "thread")
+        finally:
+            await service.threads.stop()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Multi-turn reply cost: resent quoted thread vs thread mode.")
+    parser.add_argument("--turns", type=int, default=32)
+    parser.add_argument("--email-words", type=int, default=120, help="Words in each incoming email")
+    parser.add_argument("--reply-tokens", type=int, default=120, help="Fake reply length in tokens")
+    parser.add_argument("--latency-ms", type=float, default=100.0, help="Fake first-token latency before prefill")
+    parser.add_argument("--prefill-tokens-per-second", type=float, default=8000.0)
+    parser.add_argument("--tokens-per-second", type=float, default=2000.0)
+    args = parser.parse_args()
+    logging.disable(logging.WARNING)
+
+    modes = ("resent", "trimmed", "thread")
+    results = {mode: asyncio.run(run(args, mode)) for mode in modes}
+
+    settings = get_settings()
+    print(f"{args.turns} turns, ~{args.email_words}-word emails, EMAIL_TOKEN_BUDGET={settings.EMAIL_TOKEN_BUDGET} "
+          f"when trimmed, THREAD_RECENT_MESSAGES={settings.THREAD_RECENT_MESSAGES}")
+    print(f"{'turn':>5}" + "".join(f" {mode + ' tokens':>15} {mode + ' ms':>11}" for mode in modes))
+    shown = sorted({turn for turn in (1, 2, 4, 8, 16, 32, 64, 128) if turn <= args.turns} | {args.turns})
+    for turn in shown:
+        row = "".join(
+            f" {results[mode][0][turn - 1][0]:>15} {results[mode][0][turn - 1][1] * 1000:>11.0f}" for mode in modes
+        )
+        print(f"{turn:>5}{row}")
+    print("prompt tokens per turn including summaries: " + ", ".join(
+        f"{mode} {results[mode][1] / args.turns:.0f}" for mode in modes
+    ))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+"""
+Throughput scaling of the production server from 1 to N worker processes.
+
+Starts `python -m app.server --workers K` against the fake backend for each
+K, drives `/respond_message` over real HTTP with a fixed number of
+concurrent clients for a fixed time, and reports requests per second and
+p50/p99 latency. Caches, the greeting pool and admission limits are off so
+every request does the full per-request work; with a short fake latency the
+run is CPU-bound and shows how throughput scales with cores.
+
+Usage:
+    python -m benchmarks.bench_workers --workers 1,2,4 --concurrency 64 --duration 10
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+import httpx
+
+SERVER_ENV = {
+    "GOOGLE_API_KEY": "benchmark",
+    "MODEL_BACKEND": "fake",
+    "FAKE_SEED": "7",
+    "FAKE_TOKENS_PER_SECOND": "1000000",
+    "CACHE_BACKEND": "none",
+    "SEMANTIC_CACHE": "false",
+    "GREETING_POOL_SIZE": "0",
+    "RATE_LIMIT_RPM": "0",
+    "RATE_LIMIT_TPM": "0",
+    "JOB_WORKERS": "0",
+    "LOG_LEVEL": "WARNING",
+}
+
+
+def request_body(i: int) -> dict:
+    return {
+        "email_address": "okey@example.com",
+        "email": f"Hi Okey, any update on ticket {i}?",
+        "prompt": "Fixed, deploying today",
+        "type": "formal",
+    }
+
+
+async def wait_ready(client: httpx.AsyncClient, timeout: float = 60.0) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if (await client.get("/")).status_code == 200:
+                return
+        except httpx.TransportError:
+            pass
+        await asyncio.sleep(0.2)
+    raise RuntimeError("server did not start")
+
+
+async def drive(base_url: str, concurrency: int, duration: float) -> dict:
+    latencies, errors = [], 0
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60.0) as client:
+        await wait_ready(client)
+        deadline = time.monotonic() + duration
+        counter = iter(range(10 ** 9))
+
+        async def worker():
+            nonlocal errors
+            while time.monotonic() < deadline:
+                started = time.perf_counter()
+                response = await client.post(
+                    "/respond_message", params={"use_cache": "false"}, json=request_body(next(counter))
+                )
+                latencies.append(time.perf_counter() - started)
+                errors += response.status_code != 200
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "rps": len(latencies) / elapsed,
+        "p50": statistics.median(latencies),
+        "p99": latencies[min(len(latencies) - 1, int(0.99 * len(latencies)))],
+        "errors": errors,
+    }
+
+
+def run(workers: int, port: int, concurrency: int, duration: float, latency_ms: int) -> dict:
+    env = {**os.environ, **SERVER_ENV, "FAKE_LATENCY_MS": str(latency_ms)}
+    server = subprocess.Popen(
+        [sys.executable, "-m", "app.server", "--workers", str(workers), "--port", str(port), "--host", "127.0.0.1"],
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    try:
+        return asyncio.run(drive(f"http://127.0.0.1:{port}", concurrency, duration))
+    finally:
+        server.terminate()
+        server.wait(timeout=60)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Server throughput from 1 to N worker processes.")
+    parser.add_argument("--workers", default=None,
+                        help="Comma-separated worker counts (default: 1, 2, 4 ... up to the CPU count)")
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--latency-ms", type=int, default=5, help="Fake backend median latency")
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+
+    if args.workers:
+        counts = [int(count) for count in args.workers.split(",")]
+    else:
+        cores = os.cpu_count() or 1
+        counts = sorted({1, cores} | {2 ** i for i in range(1, cores.bit_length()) if 2 ** i <= cores})
+
+    print(f"{os.cpu_count()} CPU cores, {args.concurrency} clients, {args.duration:.0f}s per run")
+    print(f"{'workers':>8} {'req/s':>9} {'speedup':>8} {'p50 ms':>8} {'p99 ms':>8} {'errors':>7}")
+    baseline = None
+    for workers in counts:
+        result = run(workers, args.port, args.concurrency, args.duration, args.latency_ms)
+        baseline = baseline or result["rps"]
+        print(
+            f"{workers:>8} {result['rps']:>9.1f} {result['rps'] / baseline:>7.2f}x "
+            f"{result['p50'] * 1000:>8.1f} {result['p99'] * 1000:>8.1f} {result['errors']:>7}"
+        )
+
+
+if __name__ == "__main__":
+    main()
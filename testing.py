@@ -3,7 +3,7 @@ Message templates and types for generating AI responses in the Message Response
 """
 
 from enum import Enum
-from langchain.prompts import PromptTemplate
+from app.templates.templates import PromptTemplate
 import json
 import logging
 
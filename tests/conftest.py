@@ -0,0 +1,12 @@
+import os
+
+# Settings are read when app.main is imported: run against the in-process
+# fake backend with nothing persisted to disk
+os.environ.setdefault("GOOGLE_API_KEY", "test")
+os.environ.setdefault("MODEL_BACKEND", "fake")
+os.environ.setdefault("FAKE_LATENCY_MS", "1")
+os.environ.setdefault("FAKE_TOKENS_PER_SECOND", "100000")
+os.environ.setdefault("USAGE_BACKEND", "none")
+os.environ.setdefault("THREAD_BACKEND", "memory")
+os.environ.setdefault("UPSTREAM_WARMUP", "false")
+os.environ.setdefault("GREETING_POOL_SIZE", "0")
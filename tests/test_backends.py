@@ -0,0 +1,34 @@
+import asyncio
+
+from app.services.backends import ModelBackend
+from app.templates.prompts import PROMPTS
+
+
+class CacheNotFound(Exception):
+    code = 404
+
+
+class RecordingModel:
+    def __init__(self, error=None):
+        self.error = error
+        self.contents = []
+
+    async def generate_content_async(self, contents, **kwargs):
+        self.contents.append(contents)
+        if self.error is not None:
+            raise self.error
+        return "reply"
+
+
+def test_rejected_context_cache_falls_back_to_inline_prefix():
+    inline, cached = RecordingModel(), RecordingModel(error=CacheNotFound("cached content not found"))
+    backend = ModelBackend(inline)
+    prompt = PROMPTS.get("respond_message").render(
+        email="Any update?", prompt="Shipped", message_type="formal", user_name="Okey"
+    )
+    backend._context_models[prompt.name] = cached
+
+    assert asyncio.run(backend.generate_async(prompt)) == "reply"
+    assert cached.contents == [prompt.body]
+    assert inline.contents[0][0] == prompt.prefix
+    assert prompt.name not in backend._context_models
@@ -0,0 +1,26 @@
+import asyncio
+
+from app.services.cache import InMemoryCache, ResponseCache
+
+
+def test_cancelled_leader_hands_the_call_to_a_waiter():
+    async def scenario():
+        cache = ResponseCache(InMemoryCache())
+        calls = []
+
+        async def factory():
+            calls.append(1)
+            await asyncio.sleep(0.05)
+            return "reply"
+
+        leader = asyncio.create_task(cache.get_or_set("key", factory))
+        await asyncio.sleep(0.01)
+        follower = asyncio.create_task(cache.get_or_set("key", factory))
+        await asyncio.sleep(0.01)
+        leader.cancel()
+        assert await follower == "reply"
+        assert leader.cancelled()
+        assert len(calls) == 2
+        assert await cache.get("key") == "reply"
+
+    asyncio.run(scenario())
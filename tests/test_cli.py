@@ -0,0 +1,55 @@
+import asyncio
+import json
+
+from app.cli import load_completed_lines, process_file
+from app.services.services import AIService
+
+
+def write_records(path, records, tail=b""):
+    with open(path, "wb") as f:
+        for record in records:
+            f.write(record if isinstance(record, bytes) else json.dumps(record).encode() + b"\n")
+        f.write(tail)
+
+
+def test_only_final_outcomes_are_checkpointed(tmp_path):
+    output = tmp_path / "out.jsonl"
+    write_records(output, [
+        {"line": 1, "status_code": 200},
+        {"line": 2, "status_code": 422},
+        {"line": 3, "status_code": 503},
+        {"line": 4, "status_code": 429},
+        {"line": 5, "status_code": 500},
+        {"line": 5, "status_code": 200},
+    ])
+    assert load_completed_lines(str(output)) == {1, 2, 5}
+
+
+def test_bad_records_are_skipped_and_only_a_torn_tail_is_truncated(tmp_path):
+    output = tmp_path / "out.jsonl"
+    write_records(output, [
+        {"line": 1, "status_code": 200},
+        b"not json\n",
+        {"status_code": 200},
+        {"line": 2, "status_code": 200},
+    ], tail=b'{"line": 3, "stat')
+    assert load_completed_lines(str(output)) == {1, 2}
+    assert output.read_bytes().endswith(b'"status_code": 200}\n')
+
+
+def test_process_file_writes_results_and_closes_the_service(tmp_path):
+    source, output = tmp_path / "in.jsonl", tmp_path / "out.jsonl"
+    source.write_text(json.dumps({"user_message": "Thanks for coming", "type": "casual", "id": "a"}) + "\n")
+    service = AIService()
+    stopped = []
+    original_stop = service.tenants.stop
+
+    async def stop():
+        stopped.append(True)
+        await original_stop()
+
+    service.tenants.stop = stop
+    counts = asyncio.run(process_file(str(source), str(output), 2, use_cache=False, service=service))
+    assert counts["processed"] == 1 and counts["failed"] == 0
+    assert json.loads(output.read_text())["id"] == "a"
+    assert stopped == [True]
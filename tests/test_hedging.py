@@ -0,0 +1,74 @@
+import asyncio
+
+from app.services.hedging import HedgeGate, Hedger
+from app.services.services import AIService, _HedgeAccounting
+from app.services.tenants import DEFAULT_TENANT
+
+
+class RecordingGate(HedgeGate):
+    def __init__(self, admitted: bool):
+        self.admitted = admitted
+        self.events = []
+
+    async def admit(self) -> bool:
+        self.events.append("admit")
+        return self.admitted
+
+    def release(self) -> None:
+        self.events.append("release")
+
+    def lost(self) -> None:
+        self.events.append("lost")
+
+
+def slow_then_fast_calls(hedger: Hedger, gate: HedgeGate) -> int:
+    async def scenario():
+        calls = []
+
+        async def operation():
+            calls.append(1)
+            await asyncio.sleep(0.2 if len(calls) == 1 else 0.001)
+            return len(calls)
+
+        hedger.histogram("model:op").observe(0.001)
+        await hedger.call("model:op", operation, gate)
+        # Let the cancelled copy's done callbacks run
+        await asyncio.sleep(0)
+        return len(calls)
+
+    return asyncio.run(scenario())
+
+
+def test_admitted_hedge_is_released_and_the_loser_reported():
+    hedger = Hedger(max_rate=1.0, min_samples=1)
+    gate = RecordingGate(admitted=True)
+    assert slow_then_fast_calls(hedger, gate) == 2
+    assert sorted(gate.events) == ["admit", "lost", "release"]
+    assert hedger.stats()["hedged"] == 1
+    assert hedger.stats()["hedge_wins"] == 1
+
+
+def test_hedge_is_skipped_when_not_admitted():
+    hedger = Hedger(max_rate=1.0, min_samples=1)
+    gate = RecordingGate(admitted=False)
+    assert slow_then_fast_calls(hedger, gate) == 1
+    assert gate.events == ["admit"]
+    assert hedger.stats()["not_admitted"] == 1
+    assert hedger.stats()["hedged"] == 0
+
+
+def test_service_hedge_needs_a_free_concurrency_slot():
+    async def scenario():
+        service = AIService(max_concurrency=1)
+        prompt = "Say hello"
+        async with service._semaphore:
+            assert not await _HedgeAccounting(service, prompt).admit()
+        gate = _HedgeAccounting(service, prompt)
+        assert await gate.admit()
+        assert service._semaphore.locked()
+        gate.release()
+        before = service.tenants.usage(DEFAULT_TENANT).prompt_tokens
+        gate.lost()
+        return service.tenants.usage(DEFAULT_TENANT).prompt_tokens - before
+
+    assert asyncio.run(scenario()) > 0
@@ -0,0 +1,63 @@
+import asyncio
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.services.jobs import check_callback_url, pinned_callback
+
+EMAIL = {"email_address": "okey@example.com", "email": "Any update?", "prompt": "Shipped today", "type": "formal"}
+
+
+@pytest.mark.parametrize("url", [
+    "ftp://93.184.216.34/hook",
+    "http://127.0.0.1:8000/admin",
+    "http://localhost/hook",
+    "http://10.0.0.5/hook",
+    "http://169.254.169.254/latest/meta-data/",
+    "http://[::1]/hook",
+    "http://[::ffff:192.168.1.1]/hook",
+])
+def test_callback_url_to_non_public_address_is_rejected(url):
+    with pytest.raises(ValueError):
+        asyncio.run(check_callback_url(url))
+
+
+def test_callback_url_to_public_address_is_accepted():
+    asyncio.run(check_callback_url("https://93.184.216.34/hook"))
+
+
+def test_callback_allowlist_replaces_address_check():
+    asyncio.run(check_callback_url("http://hooks.internal/done", ["hooks.internal"]))
+    with pytest.raises(ValueError):
+        asyncio.run(check_callback_url("https://93.184.216.34/hook", ["hooks.internal"]))
+
+
+def test_job_with_private_callback_is_refused():
+    with TestClient(app) as client:
+        response = client.post(
+            "/respond_message/jobs", json=EMAIL, params={"callback_url": "http://169.254.169.254/"}
+        )
+    assert response.status_code == 422
+
+
+def test_callback_connects_to_the_vetted_address():
+    url, headers, extensions = asyncio.run(pinned_callback("https://93.184.216.34:8443/hook?job=1"))
+    assert url == "https://93.184.216.34:8443/hook?job=1"
+    assert headers == {"Host": "93.184.216.34:8443"}
+    assert extensions == {"sni_hostname": "93.184.216.34"}
+
+
+def test_resolved_callback_host_is_pinned(monkeypatch):
+    async def getaddrinfo(host, port, **kwargs):
+        assert host == "hooks.example.com"
+        return [(None, None, None, "", ("93.184.216.34", port))]
+
+    async def scenario():
+        monkeypatch.setattr(asyncio.get_running_loop(), "getaddrinfo", getaddrinfo)
+        return await pinned_callback("https://hooks.example.com/done")
+
+    url, headers, extensions = asyncio.run(scenario())
+    assert url == "https://93.184.216.34/done"
+    assert headers == {"Host": "hooks.example.com"}
+    assert extensions == {"sni_hostname": "hooks.example.com"}
@@ -0,0 +1,12 @@
+from app.services.metrics import MetricsRegistry
+from app.services.services import AIService
+
+
+def test_resilience_metrics_are_labelled_by_model():
+    service = AIService()
+    registry = MetricsRegistry()
+    service.register_metrics(registry)
+    text = registry.render()
+    for target in service.router:
+        assert f'ai_upstream_events_total{{model="{target.name}",event="calls"}}' in text
+        assert f'ai_circuit_breaker_state{{model="{target.name}",state="closed"}} 1' in text
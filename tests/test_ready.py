@@ -0,0 +1,35 @@
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.config import get_settings
+from app.main import ai_service, app
+
+
+@pytest.fixture
+def failing_first_warmup(monkeypatch):
+    monkeypatch.setattr(get_settings(), "UPSTREAM_WARMUP", True)
+    attempts = []
+
+    async def warmup(timeout):
+        attempts.append(timeout)
+        return len(attempts) > 1
+
+    monkeypatch.setattr(ai_service, "warmup", warmup)
+    return attempts
+
+
+def test_not_ready_until_warmup_succeeds(failing_first_warmup):
+    with TestClient(app) as client:
+        assert client.get("/ready").status_code == 503
+        deadline = time.monotonic() + 5
+        while client.get("/ready").status_code != 200 and time.monotonic() < deadline:
+            time.sleep(0.1)
+        assert client.get("/ready").status_code == 200
+    assert len(failing_first_warmup) == 2
+
+
+def test_ready_after_startup_without_warmup():
+    with TestClient(app) as client:
+        assert client.get("/ready").status_code == 200
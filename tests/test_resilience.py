@@ -0,0 +1,42 @@
+import asyncio
+
+import pytest
+
+from app.services.resilience import Resilience, UpstreamThrottledError
+
+
+class RateLimited(Exception):
+    status_code = 429
+
+    def __init__(self, retry_after: float):
+        super().__init__("quota exhausted")
+        self.retry_after = retry_after
+
+
+def test_long_retry_after_hint_is_passed_on_instead_of_retried():
+    resilience = Resilience(max_attempts=3, base_delay=0.0, max_delay=1.0)
+    attempts = []
+
+    async def operation():
+        attempts.append(1)
+        raise RateLimited(retry_after=30.0)
+
+    with pytest.raises(UpstreamThrottledError) as raised:
+        asyncio.run(resilience.call(operation))
+    assert len(attempts) == 1
+    assert raised.value.status_code == 503
+    assert raised.value.headers["Retry-After"] == "30"
+
+
+def test_short_retry_after_hint_is_waited_out():
+    resilience = Resilience(max_attempts=3, base_delay=0.0, max_delay=1.0)
+    attempts = []
+
+    async def operation():
+        attempts.append(1)
+        if len(attempts) == 1:
+            raise RateLimited(retry_after=0.01)
+        return "ok"
+
+    assert asyncio.run(resilience.call(operation)) == "ok"
+    assert len(attempts) == 2
@@ -0,0 +1,21 @@
+from app.config import Settings
+from app.services.routing import FAST, STANDARD, ModelRouter
+from app.templates.prompts import PROMPTS
+
+
+def greeting():
+    return PROMPTS.get("greeting_named").render(**{
+        slot: "Okey" for slot in PROMPTS.get("greeting_named").body.input_variables
+    })
+
+
+def test_fast_model_routing_is_opt_in():
+    router = ModelRouter.from_settings(Settings())
+    assert list(router.targets) == [STANDARD]
+    assert router.candidates(greeting())[0] is router.primary
+
+
+def test_fast_model_gets_cheap_operations_when_configured():
+    router = ModelRouter.from_settings(Settings(FAST_MODEL_NAME="fast-model"))
+    assert router.tier_for(greeting()) == FAST
+    assert router.candidates(greeting())[0].name == "fast-model"
@@ -0,0 +1,21 @@
+import pytest
+
+from app import server
+
+
+@pytest.fixture
+def cgroup(tmp_path, monkeypatch):
+    cpu_max = tmp_path / "cpu.max"
+    monkeypatch.setattr(server, "CGROUP_V2_CPU_MAX", str(cpu_max))
+    monkeypatch.setattr(server.os, "sched_getaffinity", lambda pid: set(range(64)))
+    return cpu_max
+
+
+def test_cgroup_quota_limits_workers(cgroup):
+    cgroup.write_text("150000 100000\n")
+    assert server.available_cpus() == 2
+
+
+def test_unlimited_quota_uses_affinity(cgroup):
+    cgroup.write_text("max 100000\n")
+    assert server.available_cpus() == 64
@@ -0,0 +1,85 @@
+import asyncio
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+import app.main as main
+from app.main import ai_service, app
+from app.models.model import EmailRequest
+from app.services.backends import FakeBackend, FakeResponse
+from app.services.services import AIService
+from app.services.tenants import DEFAULT_TENANT, TenantLimits, Tenants
+
+EMAIL = {"email_address": "okey@example.com", "email": "Any update?", "prompt": "Shipped today", "type": "formal"}
+
+
+@pytest.fixture
+def client():
+    with TestClient(app) as client:
+        yield client
+
+
+@pytest.fixture
+def exhausted_quota():
+    original = ai_service.tenants
+    ai_service.tenants = Tenants(default_limits=TenantLimits(requests_per_day=1))
+    ai_service.tenants.record(DEFAULT_TENANT, 10, 10, 0.1, False)
+    yield
+    ai_service.tenants = original
+
+
+@pytest.mark.parametrize("path, body", [
+    ("/respond_message/stream", EMAIL),
+    ("/greet_user/stream?user_name=Okey", None),
+])
+def test_stream_over_quota_is_rejected_with_429(client, exhausted_quota, path, body):
+    response = client.post(path, json=body)
+    assert response.status_code == 429
+    assert int(response.headers["Retry-After"]) > 0
+
+
+def test_stream_relays_tokens_then_done(client):
+    response = client.post("/respond_message/stream", json=EMAIL, params={"use_cache": False})
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+    assert "event: token" in response.text
+    assert response.text.rstrip().split("\n\n")[-1].startswith("event: done")
+
+
+class SlowTailBackend(FakeBackend):
+    """Streams its first chunk at once, then stalls before the rest of the reply."""
+
+    def __init__(self, tail_seconds: float):
+        super().__init__(latency_ms=1, latency_sigma=0.0, tokens_per_second=100000, seed=1)
+        self.tail_seconds = tail_seconds
+        self.finished_at = None
+
+    async def _aiter_chunks(self, text, usage):
+        chunks = list(self._chunks(text))
+        yield FakeResponse(chunks[0], None)
+        await asyncio.sleep(self.tail_seconds)
+        for chunk in chunks[1:-1]:
+            yield FakeResponse(chunk, None)
+        self.finished_at = time.perf_counter()
+        yield FakeResponse(chunks[-1], usage)
+
+
+def test_first_token_event_arrives_before_generation_finishes(monkeypatch):
+    backend = SlowTailBackend(tail_seconds=0.3)
+    monkeypatch.setattr(main, "ai_service", AIService(backend=backend, cache=None))
+    request = EmailRequest(**EMAIL)
+
+    async def first_token_time():
+        response = await main.respond_to_email_stream(request, use_cache=False)
+        first_token = None
+        async for event in response.body_iterator:
+            text = event.decode() if isinstance(event, bytes) else event
+            if first_token is None and text.startswith("event: token"):
+                first_token = time.perf_counter()
+        return first_token
+
+    first_token = asyncio.run(first_token_time())
+    assert first_token is not None
+    assert backend.finished_at is not None
+    assert backend.finished_at - first_token > 0.2
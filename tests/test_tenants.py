@@ -0,0 +1,10 @@
+from app.config import Settings
+from app.services.tenants import SQLiteUsageStore, create_usage_store
+
+
+def test_usage_store_is_only_created_for_configured_tenants(tmp_path):
+    path = str(tmp_path / "usage.db")
+    assert create_usage_store(Settings(USAGE_BACKEND="auto", USAGE_DB_PATH=path)) is None
+    configured = Settings(USAGE_BACKEND="auto", USAGE_DB_PATH=path, API_KEYS={"key": "acme"})
+    assert isinstance(create_usage_store(configured), SQLiteUsageStore)
+    assert isinstance(create_usage_store(Settings(USAGE_BACKEND="sqlite", USAGE_DB_PATH=path)), SQLiteUsageStore)
@@ -0,0 +1,55 @@
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.main import ai_service, app
+
+TURN = {
+    "email_address": "alex@example.com", "email": "Can we move the call?", "prompt": "Yes, to Friday",
+    "type": "formal", "user_name": "Okey", "thread_id": "retry-test",
+}
+
+
+@pytest.fixture
+def client():
+    with TestClient(app) as client:
+        client.delete(f"/threads/{TURN['thread_id']}")
+        yield client
+        client.delete(f"/threads/{TURN['thread_id']}")
+
+
+def stored_messages(client) -> int:
+    return len(client.get(f"/threads/{TURN['thread_id']}").json()["messages"])
+
+
+def test_retried_turn_replays_the_stored_reply(client):
+    first = client.post("/respond_message", json=TURN)
+    retried = client.post("/respond_message", json=TURN)
+    assert retried.json()["response"] == first.json()["response"]
+    assert stored_messages(client) == 2
+
+
+def test_same_email_with_new_instructions_is_a_new_turn(client):
+    client.post("/respond_message", json=TURN)
+    client.post("/respond_message", json={**TURN, "prompt": "No, keep Thursday"})
+    assert stored_messages(client) == 4
+
+
+def test_retry_without_cache_generates_a_new_reply(client):
+    client.post("/respond_message", json=TURN)
+    client.post("/respond_message", json=TURN, params={"use_cache": False})
+    assert stored_messages(client) == 4
+
+
+def test_retry_is_recognised_after_the_email_was_summarized(client, monkeypatch):
+    monkeypatch.setattr(ai_service.threads, "recent_messages", 1)
+    first = client.post("/respond_message", json=TURN)
+    # The background summary folds the received email away, keeping the reply
+    deadline = time.monotonic() + 5
+    while stored_messages(client) != 1 and time.monotonic() < deadline:
+        time.sleep(0.05)
+    assert stored_messages(client) == 1
+    retried = client.post("/respond_message", json=TURN)
+    assert retried.json()["response"] == first.json()["response"]
+    assert stored_messages(client) == 1